@@ -0,0 +1,95 @@
+"""Time the removal of children from a huge, flat family: one HOG whose members all arose from the same duplication.
+
+    python benchmarks/bench_child_removal.py --members 50000
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+from pyham import ham, abstractgene
+from synthetic import balanced_tree
+
+
+def write_flat_family(directory, n_members, n_species=4):
+    """  Write a species tree and an OrthoXML file with a single family at the root level whose members are
+    paralogous HOGs of the first two species. Each member HOG nests a HOG of the same level (as in 'augmented' files),
+    the parser flattens it by removing it from the children of the family and adding its children instead.
+
+        Returns:
+            paths of the newick and the orthoxml files.
+    """
+    tree_str, (root_name, _) = balanced_tree(n_species)
+    nwk_path = os.path.join(directory, "flat_{}.nwk".format(n_members))
+    with open(nwk_path, "w") as fh:
+        fh.write(tree_str)
+
+    oxml_path = os.path.join(directory, "flat_{}.orthoxml".format(n_members))
+    with open(oxml_path, "w") as fh:
+        fh.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        fh.write('<orthoXML xmlns="http://orthoXML.org/2011/" version="0.3" origin="synthetic" originVersion="1">\n')
+        for species in (0, 1):
+            fh.write(' <species name="S{0:05d}" NCBITaxId="{1}">\n  <database name="synthetic" version="1">\n'
+                     '   <genes>\n'.format(species, species + 1))
+            for member in range(n_members):
+                fh.write('    <gene id="{0}" protId="S{1:05d}_{0}" geneId="S{1:05d}g{0}"/>\n'.format(
+                    2 * member + species + 1, species))
+            fh.write('   </genes>\n  </database>\n </species>\n')
+        fh.write(' <groups>\n  <orthologGroup id="HOG:0000001">\n   <property name="TaxRange" value="{}"/>\n'
+                 '   <paralogGroup>\n'.format(root_name))
+        for member in range(n_members):
+            fh.write('    <orthologGroup><property name="TaxRange" value="N00000"/>\n'
+                     '     <orthologGroup id="HOG:0000001.{0}"><property name="TaxRange" value="N00000"/>'
+                     '<geneRef id="{1}"/><geneRef id="{2}"/></orthologGroup>\n'
+                     '    </orthologGroup>\n'.format(member, 2 * member + 1, 2 * member + 2))
+        fh.write('   </paralogGroup>\n  </orthologGroup>\n </groups>\n</orthoXML>\n')
+    return nwk_path, oxml_path
+
+
+def _remove_and_add_back(children, members, order):
+    # what HOG.remove_child did before ChildList: a membership test then list.remove.
+    start = time.perf_counter()
+    for member in order:
+        if member in children:
+            children.remove(member)
+    for member in members:
+        children.append(member)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--members", type=int, default=50000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        nwk, oxml = write_flat_family(tmp, args.members)
+        start = time.perf_counter()
+        analysis = ham.Ham(tree_file=nwk, hog_file=oxml, tree_format="newick", use_internal_name=True,
+                           id_schema="GENERIC")
+        build = time.perf_counter() - start
+        family = analysis.get_list_top_level_hogs()[0]
+        print("{} members, build {:.2f}s, {} children below {}".format(
+            args.members, build, len(family.children), family.genome.name))
+
+    members = list(family.children)
+    order = members[:]
+    random.Random(1).shuffle(order)
+    print("remove all in random order and add back: list {:.2f}s | ChildList {:.3f}s".format(
+        _remove_and_add_back(list(members), members, order),
+        _remove_and_add_back(abstractgene.ChildList(members), members, order)))
+
+    start = time.perf_counter()
+    for member in order:
+        family.remove_child(member)
+    for member in members:
+        family.add_child(member)
+    print("HOG.remove_child and add_child of all members: {:.3f}s".format(time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
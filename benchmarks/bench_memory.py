@@ -0,0 +1,64 @@
+"""Measure the memory held by a Ham object built from a synthetic OrthoXML file, per Gene and per HOG.
+
+    python benchmarks/bench_memory.py --species 128 --families 2000
+"""
+
+import argparse
+import gc
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pyham import ham
+from synthetic import write_dataset
+
+
+def _deep_size(objects):
+    """Sum of sys.getsizeof of the objects and of what they own (__dict__, property and score dicts, children
+    and duplication lists)."""
+    total = 0
+    for obj in objects:
+        total += sys.getsizeof(obj)
+        for owned in (getattr(obj, '__dict__', None), obj._properties, getattr(obj, 'scores', None),
+                      getattr(obj, '_children', None), getattr(obj, '_duplications', None)):
+            if isinstance(owned, (dict, list)):
+                total += sys.getsizeof(owned)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--species", type=int, default=128)
+    parser.add_argument("--families", type=int, default=2000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        nwk, oxml = write_dataset(tmp, args.species, args.families)
+        print("{} species, {} families, {:.1f} MB".format(args.species, args.families, os.path.getsize(oxml) / 1e6))
+
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        analysis = ham.Ham(tree_file=nwk, hog_file=oxml, tree_format="newick", use_internal_name=True,
+                           id_schema="GENERIC")
+        build = time.perf_counter() - start
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        genes = analysis.get_list_extant_genes()
+        hogs = [hog for family in analysis.get_list_top_level_hogs() for hog in family.get_all_descendant_hogs()]
+        print("build {:.2f}s, {:.1f} MB held ({:.1f} MB peak)".format(build, current / 1e6, peak / 1e6))
+        print("{} genes, {:.0f} bytes each | {} HOGs, {:.0f} bytes each".format(
+            len(genes), _deep_size(genes) / len(genes), len(hogs), _deep_size(hogs) / len(hogs)))
+        print("__slots__: Gene {}, HOG {}".format(not hasattr(genes[0], '__dict__'),
+                                                   not hasattr(hogs[0], '__dict__')))
+        del genes, hogs, analysis
+
+
+if __name__ == "__main__":
+    main()
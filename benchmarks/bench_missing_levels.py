@@ -0,0 +1,65 @@
+"""Compare eager and lazy creation of the HOGs of the levels missing in an OrthoXML file (lazy_missing_levels).
+
+    python benchmarks/bench_missing_levels.py --species 256 --families 500 --skip-rate 0.5
+"""
+
+import argparse
+import gc
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from pyham import ham
+from synthetic import write_dataset
+
+
+def _number_of_hogs(ham_analysis):
+    return sum(len(node.props['genome']._genes) for node in ham_analysis.taxonomy.tree.traverse()
+               if not node.is_leaf and node.props.get('genome') is not None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--species", type=int, default=256)
+    parser.add_argument("--families", type=int, default=500)
+    parser.add_argument("--skip-rate", type=float, default=0.5)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        nwk, oxml = write_dataset(tmp, args.species, args.families, skip_rate=args.skip_rate)
+        print("{} species, {} families, {:.0%} of the levels left out, {:.1f} MB".format(
+            args.species, args.families, args.skip_rate, os.path.getsize(oxml) / 1e6))
+
+        for lazy in (False, True):
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter()
+            analysis = ham.Ham(tree_file=nwk, hog_file=oxml, tree_format="newick", use_internal_name=True,
+                               id_schema="GENERIC", lazy_missing_levels=lazy)
+            build = time.perf_counter() - start
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            hogs = _number_of_hogs(analysis)
+
+            # a query on one level only: the genes of the ancestral genome just below the root.
+            genome = analysis.taxonomy.tree.children[0].props['genome']
+            start = time.perf_counter()
+            n_genes = len(genome.genes)
+            query = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for hog in analysis.get_list_top_level_hogs():
+                hog.get_all_descendant_hogs()
+            everything = time.perf_counter() - start
+
+            print("{:5s} build {:.2f}s, {:.1f} MB, {} HOGs | {} genes at {} in {:.3f}s | all levels in {:.2f}s, "
+                  "{} HOGs".format("lazy" if lazy else "eager", build, memory / 1e6, hogs, n_genes, genome.name,
+                                    query, everything, _number_of_hogs(analysis)))
+            del analysis
+
+
+if __name__ == "__main__":
+    main()
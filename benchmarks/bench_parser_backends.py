@@ -0,0 +1,53 @@
+"""Compare the 'etree' and 'lxml' parser backends of Ham on a synthetic dataset.
+
+    python benchmarks/bench_parser_backends.py --species 64 --families 2000
+"""
+
+import argparse
+import gc
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from pyham import ham
+from synthetic import write_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--species", type=int, default=64)
+    parser.add_argument("--families", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        nwk, oxml = write_dataset(tmp, args.species, args.families)
+        print("{} species, {} families, {:.1f} MB".format(args.species, args.families,
+                                                           os.path.getsize(oxml) / 1e6))
+
+        def _filter():
+            f = ham.ParserFilter()
+            f.add_hogs_via_hogId(["HOG:{:07d}".format(i) for i in range(1, args.families + 1, 100)])
+            return f
+
+        for label, kwargs in (("full", {}), ("filter 1%", {"filter_object": None})):
+            timings = {"etree": [], "lxml": []}
+            # alternate the backends so that they share the noise of the machine.
+            for _ in range(args.repeat):
+                for backend in timings:
+                    if "filter_object" in kwargs:
+                        kwargs["filter_object"] = _filter()
+                    gc.collect()
+                    start = time.perf_counter()
+                    ham.Ham(tree_file=nwk, hog_file=oxml, tree_format="newick", use_internal_name=True,
+                            id_schema="GENERIC", parser_backend=backend, **kwargs)
+                    timings[backend].append(time.perf_counter() - start)
+            for backend, values in timings.items():
+                print("{:10s} {:6s} best {:.2f}s, median {:.2f}s over {} runs".format(
+                    label, backend, min(values), statistics.median(values), args.repeat))
+
+if __name__ == "__main__":
+    main()
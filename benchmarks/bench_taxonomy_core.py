@@ -0,0 +1,67 @@
+"""Time the array-based TaxonomyCore on an NCBI-scale taxonomy: a random tree of 2M nodes given as a parent array in
+random order, as read from an NCBI nodes.dmp file, and the Taxonomy built on top of it.
+
+    python benchmarks/bench_taxonomy_core.py --nodes 2000000 [--ete]
+"""
+
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from pyham import taxonomy
+
+
+def random_parents(n_nodes, seed=1):
+    """  Parent array of a random recursive tree (depth ~ e.ln(n), about 40 for 2M nodes like the NCBI taxonomy),
+    numbered in random order, and the numbers of the nodes."""
+    rng = np.random.default_rng(seed)
+    parent = (rng.random(n_nodes) * np.arange(n_nodes)).astype(np.int64)
+    parent[0] = -1
+    shuffled = rng.permutation(n_nodes)
+    rank = np.argsort(shuffled)
+    return np.where(parent[shuffled] >= 0, rank[parent[shuffled]], -1), shuffled
+
+
+def _timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print("{}: {:.2f}s".format(label, time.perf_counter() - start))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=2000000)
+    parser.add_argument("--pairs", type=int, default=1000000)
+    parser.add_argument("--ete", action="store_true", help="also build the Taxonomy from the ete4 tree")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    parent, taxids = random_parents(args.nodes)
+    names = ["taxon_{}".format(taxid) for taxid in taxids.tolist()]
+    core = _timed("TaxonomyCore of {} nodes".format(args.nodes), taxonomy.TaxonomyCore, parent, names, taxids)
+    arrays = sum(getattr(core, attr).nbytes for attr in ('parent', 'child_offsets', 'children', 'depth', 'post',
+                                                         'taxids'))
+    print("  max depth {}, arrays {:.0f} MB".format(core.depth.max(), arrays / 2 ** 20))
+
+    rng = np.random.default_rng(2)
+    first, second = rng.integers(args.nodes, size=(2, args.pairs))
+    _timed("sparse table ({:.0f} MB)".format(len(core).bit_length() * len(core) * 4 / 2 ** 20), core._build_sparse)
+    _timed("mrca_many of {} pairs".format(args.pairs), core.mrca_many, first, second)
+    pairs = list(zip(first[:100000].tolist(), second[:100000].tolist()))
+    _timed("mrca of 100000 pairs", lambda: [core.mrca(a, b) for a, b in pairs])
+    _timed("is_ancestor of 100000 pairs", lambda: [core.is_ancestor(a, b) for a, b in pairs])
+
+    # Taxonomy(core) still builds an ete4 node per taxon, time it apart from the rest of the Taxonomy set up.
+    _timed("ete4 nodes of the core", core._ete_nodes)
+    _timed("Taxonomy(core)", taxonomy.Taxonomy, core)
+
+    if args.ete:
+        tree = _timed("as_ete", core.as_ete)
+        _timed("Taxonomy of the ete4 tree", taxonomy.Taxonomy, tree)
+
+
+if __name__ == "__main__":
+    main()
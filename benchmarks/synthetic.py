@@ -0,0 +1,120 @@
+"""Generate synthetic species trees and OrthoXML files of arbitrary size for the benchmarks.
+
+The species tree is a balanced binary tree. Each family is a HOG nested along the species tree with TaxRange
+properties, random duplications (paralogGroups), random gene losses and, optionally, random levels left out of the
+file (their children are attached to the level above, as in files built on a coarser taxonomy).
+"""
+
+import argparse
+import os
+import random
+
+
+def balanced_tree(n_species):
+    """Return the newick string of a balanced binary tree with n_species leaves named S00000, S00001, ...
+    and internal nodes named N00000, N00001, ... and the nested (name, children) representation."""
+    leaves = [("S{:05d}".format(i), []) for i in range(n_species)]
+    counter = 0
+    level = leaves
+    while len(level) > 1:
+        nxt = []
+        for i in range(0, len(level) - 1, 2):
+            nxt.append(("N{:05d}".format(counter), [level[i], level[i + 1]]))
+            counter += 1
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+    root = level[0]
+
+    def newick(node):
+        name, children = node
+        if not children:
+            return name
+        return "({}){}".format(",".join(newick(c) for c in children), name)
+
+    return newick(root) + ";", root
+
+
+class _FamilyWriter(object):
+
+    def __init__(self, rng, dup_rate, loss_rate, skip_rate=0.0):
+        self.rng = rng
+        self.dup_rate = dup_rate
+        self.loss_rate = loss_rate
+        self.skip_rate = skip_rate
+        self.genes = {}
+        self.next_gene = 1
+
+    def gene(self, species):
+        gene_id = self.next_gene
+        self.next_gene += 1
+        self.genes.setdefault(species, []).append(gene_id)
+        return gene_id
+
+    def write(self, out, node, hog_id, indent, skippable=False):
+        name, children = node
+        if not children:
+            out.append('{}<geneRef id="{}"/>\n'.format(indent, self.gene(name)))
+            return
+        skip = skippable and self.rng.random() < self.skip_rate
+        if not skip:
+            out.append('{}<orthologGroup id="{}">\n'.format(indent, hog_id))
+            out.append('{} <property name="TaxRange" value="{}"/>\n'.format(indent, name))
+        for pos, child in enumerate(children):
+            if self.rng.random() < self.loss_rate:
+                continue
+            child_id = "{}.{}".format(hog_id, pos)
+            if self.rng.random() < self.dup_rate:
+                out.append('{} <paralogGroup>\n'.format(indent))
+                self.write(out, child, child_id + "a", indent + "  ")
+                self.write(out, child, child_id + "b", indent + "  ")
+                out.append('{} </paralogGroup>\n'.format(indent))
+            else:
+                self.write(out, child, child_id, indent + " ", skippable=True)
+        if not skip:
+            out.append('{}</orthologGroup>\n'.format(indent))
+
+
+def write_dataset(directory, n_species=64, n_families=1000, dup_rate=0.05, loss_rate=0.05, seed=1, skip_rate=0.0):
+    """  Write a synthetic species tree (newick) and OrthoXML file in directory.
+
+        Returns:
+            paths of the newick and the orthoxml files.
+    """
+    rng = random.Random(seed)
+    tree_str, root = balanced_tree(n_species)
+    writer = _FamilyWriter(rng, dup_rate, loss_rate, skip_rate)
+
+    groups = []
+    for fam in range(1, n_families + 1):
+        writer.write(groups, root, "HOG:{:07d}".format(fam), "  ")
+
+    nwk_path = os.path.join(directory, "synthetic_{}_{}.nwk".format(n_species, n_families))
+    with open(nwk_path, "w") as fh:
+        fh.write(tree_str)
+
+    oxml_path = os.path.join(directory, "synthetic_{}_{}.orthoxml".format(n_species, n_families))
+    with open(oxml_path, "w") as fh:
+        fh.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        fh.write('<orthoXML xmlns="http://orthoXML.org/2011/" version="0.3" origin="synthetic" originVersion="1">\n')
+        for species in sorted(writer.genes):
+            fh.write(' <species name="{}" NCBITaxId="{}">\n'.format(species, int(species[1:]) + 1))
+            fh.write('  <database name="synthetic" version="1">\n   <genes>\n')
+            for gene_id in writer.genes[species]:
+                fh.write('    <gene id="{0}" protId="{1}_{0}" geneId="{1}g{0}"/>\n'.format(gene_id, species))
+            fh.write('   </genes>\n  </database>\n </species>\n')
+        fh.write(' <groups>\n')
+        fh.writelines(groups)
+        fh.write(' </groups>\n</orthoXML>\n')
+    return nwk_path, oxml_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("directory")
+    parser.add_argument("--species", type=int, default=64)
+    parser.add_argument("--families", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    print(*write_dataset(args.directory, args.species, args.families, seed=args.seed, skip_rate=args.skip_rate))
@@ -55,18 +55,10 @@ class TreeProfile(object):
         for lvl in treeMap.traverse():
             levelGroups[lvl.name]=[]
 
-        # add all of subhog to the related level in levelGroups
-        for subhog in hog.get_all_descendant_hogs():
-            if subhog.genome.name in levelGroups:
-                levelGroups[subhog.genome.name].append(subhog)
-
-        # add empty extant genome to levelGroups
-        for extantGenome in treeMap.leaves():
-            levelGroups[extantGenome.name] = []
-
-        # add genes to related extant genome in levelGroups
-        for species, genes in hog.get_all_descendant_genes_clustered_by_species().items():
-            levelGroups[species.name] = genes
+        # add all of subhog and genes to the related level in levelGroups
+        for genome, members in hog.get_members_by_level().items():
+            if genome.name in levelGroups:
+                levelGroups[genome.name] = members
 
         for lvl in treeMap.traverse():
             lvl.add_prop("nbr_genes", len(levelGroups[lvl.name]))
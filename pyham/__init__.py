@@ -7,6 +7,9 @@ from .utils import *
 from .mapper import *
 from .TreeProfile import *
 from .iham import *
+from .family_index import *
+from .readers import *
+from .columnar import *
 
 try:
     from ._version import version as __version__
@@ -1,10 +1,155 @@
 import numbers
 import dataclasses
+import bisect
+import functools
+import types
+import weakref
+from array import array
+from collections import namedtuple, OrderedDict
+from collections.abc import Sequence
 from ete4 import Tree
 from .genome import ExtantGenome, AncestralGenome, Genome
 from .iham import IHAM
 import abc
 
+# properties of the genes and HOGs without any, shared and read-only: add_property gives them their own dict.
+_NO_PROPERTIES = types.MappingProxyType({})
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+@functools.lru_cache(maxsize=None)
+def _slot_names(cls):
+    return tuple(name for klass in cls.__mro__ for name in getattr(klass, '__slots__', ()) if name != '__weakref__')
+
+
+# marks the slot of a removed element in a ChildList until it is compacted.
+_REMOVED = object()
+
+
+class ChildList(object):
+    """
+    Insertion-ordered sequence of the children of a :obj:`HOG` or of a :obj:`DuplicationNode`, with constant time
+    append, membership test and removal.
+
+    The elements are kept in a list, a removed element leaves an empty slot behind that is dropped when half of the
+    slots are empty or when the elements are read again. Past a few elements, the position of each element is kept in
+    a dict, so that membership and removal no longer scan the list. It supports what the children lists were used for
+    (iteration, len, indexing, append, extend, remove, comparison with a list); an element is only held once.
+
+        Attributes:
+        | elements (iterable, optional): the initial elements.
+    """
+
+    __slots__ = ('_items', '_index', '_removed')
+
+    # size from which the positions of the elements are indexed.
+    _index_threshold = 8
+
+    def __init__(self, elements=()):
+        self._items = []
+        self._index = None
+        self._removed = 0
+        self.extend(elements)
+
+    def _compact(self):
+        # a new list, so that an iteration in progress continues over the old one.
+        self._items = [item for item in self._items if item is not _REMOVED]
+        self._removed = 0
+        if self._index is not None:
+            self._index = {item: pos for pos, item in enumerate(self._items)}
+
+    def _get_index(self):
+        if self._index is None:
+            if self._removed:
+                self._compact()
+            self._index = {item: pos for pos, item in enumerate(self._items)}
+        return self._index
+
+    def _get_items(self):
+        if self._removed:
+            self._compact()
+        return self._items
+
+    def append(self, element):
+        index = self._index
+        if index is None and len(self._items) >= self._index_threshold:
+            index = self._get_index()
+        if index is None:
+            if element in self._items:
+                return
+        elif element in index:
+            return
+        else:
+            index[element] = len(self._items)
+        self._items.append(element)
+
+    def extend(self, elements):
+        for element in elements:
+            self.append(element)
+
+    def remove(self, element):
+        if self._index is None and len(self._items) <= self._index_threshold:
+            self._items.remove(element)
+            return
+        try:
+            pos = self._get_index().pop(element)
+        except KeyError:
+            raise ValueError("{} not in ChildList".format(element)) from None
+        self._items[pos] = _REMOVED
+        self._removed += 1
+        if self._removed > self._index_threshold and 2 * self._removed > len(self._items):
+            self._compact()
+
+    def index(self, element):
+        if self._index is not None:
+            self._get_items()
+            try:
+                return self._index[element]
+            except KeyError:
+                raise ValueError("{} not in ChildList".format(element)) from None
+        return self._get_items().index(element)
+
+    def __contains__(self, element):
+        if self._index is None:
+            return element in self._items
+        return element in self._index
+
+    def __len__(self):
+        return len(self._items) - self._removed
+
+    def __iter__(self):
+        return iter(self._get_items())
+
+    def __reversed__(self):
+        return reversed(self._get_items())
+
+    def __getitem__(self, item):
+        return self._get_items()[item]
+
+    def __eq__(self, other):
+        if isinstance(other, ChildList):
+            other = other._get_items()
+        elif not isinstance(other, (list, tuple)):
+            return NotImplemented
+        return self._get_items() == list(other)
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __repr__(self):
+        return repr(self._get_items())
+
+    def __reduce__(self):
+        return ChildList, (list(self),)
+
+
 class AbstractGene(metaclass=abc.ABCMeta):
     """  
     AbstractGene is an abstract class representing extant or ancestral genes. An AbstractGene is defined by an unique
@@ -15,9 +160,19 @@ class AbstractGene(metaclass=abc.ABCMeta):
         attribute is set to  None.
         | genome (:obj:`pyham.genome.Genome`): Related Genome object.
         arose_by_duplication: pyham.abstractgene.DuplicationNode if this AbstractGene arose by a duplication from its parent otherwise False.
-        
+
+    AbstractGenes have no __dict__: their attributes are slots (they can't be given other attributes) and the
+    property dict is only allocated by the first call to add_property. They can be weakly referenced.
+
+    The AbstractGenes of a family are numbered in pre-order the first time an ancestry query needs it (see
+    :obj:`FamilyNumbering`); the numbering is dropped whenever a parent, children or duplication link of the family
+    changes and is rebuilt by the next query. The AbstractGenes of a family also share a :obj:`Family` handle, kept
+    up to date by the parent setter, that gives their top level HOG.
     """
 
+    __slots__ = ('_parent', 'genome', '_properties', 'arose_by_duplication', '_numbering', '_pre', '_family',
+                 '__weakref__')
+
     def __init__(self, arose_by_duplication=False, **kwargs):
 
         """
@@ -26,10 +181,119 @@ class AbstractGene(metaclass=abc.ABCMeta):
             | ** kwargs: dictionary of attribute and value required to create the: obj:`pyham.abstractgene.AbstractGene`.
         """
 
-        self.parent = None
+        self._parent = None
         self.genome = None
-        self._properties = {}
+        self._properties = _NO_PROPERTIES
         self.arose_by_duplication = arose_by_duplication
+        self._numbering = None
+        self._pre = -1
+        self._family = None
+
+    def __getstate__(self):
+        state = dict(getattr(self, '__dict__', ()))
+        for name in _slot_names(type(self)):
+            if name in ('_numbering', '_pre', '_family'):
+                # the numbering and the family handle are rebuilt on demand.
+                continue
+            try:
+                value = getattr(self, name)
+            except AttributeError:
+                # slot never set (e.g. the LOFT id of a Gene)
+                continue
+            if value is not _NO_PROPERTIES:
+                state[name] = value
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        if not hasattr(self, '_properties'):
+            self._properties = _NO_PROPERTIES
+        self._numbering = None
+        self._pre = -1
+        self._family = None
+
+    @property
+    def parent(self):
+        parent = self._parent
+        if parent is not None and parent._implicit_levels is not None:
+            # the levels missing in between are created, self may now hang below one of them.
+            parent.materialize_missing_levels()
+            parent = self._parent
+        return parent
+
+    @parent.setter
+    def parent(self, parent):
+        self._invalidate_numbering()
+        if parent is not None:
+            parent._invalidate_numbering()
+
+        family = self._family.find() if self._family is not None else None
+        if self._parent is not None and family is not None:
+            # the family loses the subtree of self, its AbstractGenes look their family up again.
+            family.invalidate()
+            family = None
+        self._parent = parent
+        if parent is not None:
+            target = parent.get_family()
+            target.add_member()
+            if family is not None:
+                # self was the root of its own family, which joins the one of its new parent.
+                family.merge_into(target)
+            self._family = target
+
+    def get_family(self):
+        """  Get the :obj:`Family` handle of the family of this AbstractGene (created for a new family).
+
+            Returns:
+                :obj:`Family`.
+        """
+        family = self._family
+        if family is not None:
+            family = family.find()
+            if family is not None:
+                self._family = family
+                return family
+
+        # unknown (e.g. an unpickled family) or invalidated: walk up to the first AbstractGene with a valid family.
+        path = [self]
+        node = self._parent
+        while node is not None:
+            family = node._family.find() if node._family is not None else None
+            if family is not None:
+                break
+            path.append(node)
+            node = node._parent
+        if family is None:
+            family = Family(path[-1])
+        for node in path:
+            node._family = family
+        return family
+
+    def _invalidate_numbering(self):
+        if self._numbering is not None and self._numbering.valid:
+            family_numberings.release(self._numbering)
+
+    def _get_numbering(self):
+        return family_numberings.get(self)
+
+    def is_descendant_of(self, hog):
+
+        """
+        Check whether this :obj:`AbstractGene` is nested (at any depth) in a given :obj:`HOG`, in constant time once
+        the family is numbered.
+
+            Args:
+                hog (:obj:`pyham.abstractgene.AbstractGene`): putative ancestor.
+
+            Returns:
+                :obj:`bool`, False if hog is self.
+        """
+
+        numbering = self._get_numbering()
+        if hog._numbering is not numbering:
+            return False
+        return numbering.is_ancestor(hog._pre, self._pre)
 
     @abc.abstractmethod
     def set_genome(self, genome):
@@ -56,18 +320,10 @@ class AbstractGene(metaclass=abc.ABCMeta):
 
         """
 
-        found = None
-        current_hog = self
-        paralog = current_hog.arose_by_duplication
-
-        # Until we reach the top level HOG or the ancestor HOG is founded
-        while current_hog.parent is not None and found is None:
-            current_hog = current_hog.parent
-            if current_hog.genome == ancestral_genome:
-                return current_hog, paralog
-            if current_hog.arose_by_duplication != False:
-                paralog = True
-        return found, paralog
+        if self._parent is None:
+            return None, self.arose_by_duplication
+        numbering = self._get_numbering()
+        return numbering.search_ancestor(self._pre, ancestral_genome)
 
     def get_top_level_hog(self):
 
@@ -78,12 +334,7 @@ class AbstractGene(metaclass=abc.ABCMeta):
                 return :obj:`pyham.abstractgene.HOG`.
         """
 
-        current_hog = self
-
-        while current_hog.parent is not None:
-            current_hog = current_hog.parent
-
-        return current_hog
+        return self.get_family().root
 
     def get_at_level(self, genome):
 
@@ -107,19 +358,7 @@ class AbstractGene(metaclass=abc.ABCMeta):
                             .format(Genome.__name__,
                                     type(genome).__name__))
 
-        tl = self.get_top_level_hog()
-
-        def pre(node, elem):
-            if node.genome == genome:
-                elem.append(node)
-            return elem
-
-        def leaf(node, leaf, elem):
-            if leaf.genome == genome:
-                elem.append(leaf)
-            return elem
-
-        rlist = tl.visit([], function_extant_gene=leaf, function_prefix=pre)
+        rlist = self._get_numbering().get_at_level(genome)
 
         if not rlist:
             raise KeyError("Level {} not found within this HOG".format(genome))
@@ -131,6 +370,8 @@ class AbstractGene(metaclass=abc.ABCMeta):
         return rlist
 
     def add_property(self, name, value):
+        if self._properties is _NO_PROPERTIES:
+            self._properties = {}
         self._properties[name] = value
 
     def __getitem__(self, item):
@@ -145,12 +386,19 @@ class HOG(AbstractGene):
 
     Attributes:
         | hog_id (:obj:`str`): hog id. Defaults is None.
-        | children (:obj:`list` of :obj:`pyham.abstractgene.AbstractGene`): A list of direct descendants AbstractGene.
+        | children (:obj:`ChildList` of :obj:`pyham.abstractgene.AbstractGene`): The direct descendants AbstractGene.
         | hogvis (:obj:`pyham.IHAM`): :obj:`pyham.IHAM` object of this HOG.
         | duplications (:obj:`list` of :obj:`pyham.abstractgene.DuplicationNode`): list of all duplication node child of this HOG.
+        | scores (:obj:`dict`): scores of this HOG, only set once a score is (see :obj:`HOG.score`).
 
     """
 
+    # _implicit_levels: levels of the species tree skipped between this HOG and some of its children, created on
+    # first access to children (see :obj:`pyham.parsers.MissingLevelBuilder`).
+    # _missing_in_xml: for the HOGs of levels missing in the orthoxml, genome of the HOG they were inserted below.
+    __slots__ = ('hog_id', 'og', 'taxon_id', '_children', 'hogvis', '_duplications', 'scores', '_implicit_levels',
+                 '_missing_in_xml')
+
     def __init__(self, id=None, **kwargs):
         super(HOG, self).__init__(**kwargs)
         self.hog_id = id
@@ -158,9 +406,44 @@ class HOG(AbstractGene):
             self.hog_id = kwargs.get('og', id) # If we have the gene named in og tag, use this.
         self.og = kwargs.get('og')
         self.taxon_id = int(kwargs['taxonId']) if 'taxonId' in kwargs else None
-        self.children = []
+        self._implicit_levels = None
+        self._children = ChildList()
         self.hogvis = None
-        self.duplications = []
+        self._duplications = None
+
+    @property
+    def children(self):
+        if self._implicit_levels is not None:
+            self.materialize_missing_levels()
+        return self._children
+
+    @children.setter
+    def children(self, children):
+        self._invalidate_numbering()
+        self._children = children if isinstance(children, ChildList) else ChildList(children)
+
+    @property
+    def duplications(self):
+        if self._duplications is None:
+            # most HOGs have none, the list is only allocated when needed.
+            self._duplications = []
+        return self._duplications
+
+    @duplications.setter
+    def duplications(self, duplications):
+        self._duplications = duplications
+
+    def materialize_missing_levels(self):
+
+        """
+        Create the HOGs of the taxonomic levels skipped between this HOG and its children when the Ham analysis was
+        built with lazy_missing_levels. Does nothing if there is none.
+        """
+
+        if self._implicit_levels is not None:
+            builder, edges = self._implicit_levels
+            self._implicit_levels = None
+            builder.materialize(self, edges)
 
     def add_child(self, child_to_add):
 
@@ -253,15 +536,87 @@ class HOG(AbstractGene):
 
         self.genome = genome
 
+    def traverse(self, prune=None):
+
+        """
+        Iterate over this HOG and all the :obj:`pyham.abstractgene.AbstractGene` nested in it, in pre-order (a HOG
+        before its children, the children in order). The traversal uses an explicit stack, so it is not bound by the
+        recursion limit, and can be stopped at any point.
+
+            Args:
+                prune (callback function, optional): called with each visited HOG, if it returns True the children of
+                this HOG are skipped. Defaults to None.
+
+            Returns:
+                generator of :obj:`pyham.abstractgene.AbstractGene`.
+        """
+
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            if isinstance(node, HOG) and (prune is None or not prune(node)):
+                stack.extend(reversed(node.children))
+
+    def iter_hogs(self, prune=None):
+
+        """
+        Iterate over this HOG and all the :obj:`pyham.abstractgene.HOG` nested in it, in pre-order.
+
+            Args:
+                prune (callback function, optional): see :obj:`traverse`.
+
+            Returns:
+                generator of :obj:`pyham.abstractgene.HOG`.
+        """
+
+        for node in self.traverse(prune):
+            if isinstance(node, HOG):
+                yield node
+
+    def iter_genes(self, prune=None):
+
+        """
+        Iterate over the :obj:`pyham.abstractgene.Gene` present in this HOG, in the order of the leaves.
+
+            Args:
+                prune (callback function, optional): see :obj:`traverse`.
+
+            Returns:
+                generator of :obj:`pyham.abstractgene.Gene`.
+        """
+
+        for node in self.traverse(prune):
+            if isinstance(node, Gene):
+                yield node
+
+    def iter_levels(self, prune=None):
+
+        """
+        Iterate over the :obj:`pyham.genome.Genome` of this HOG and of all the HOGs nested in it, in pre-order (a
+        genome is repeated for each HOG mapped to it).
+
+            Args:
+                prune (callback function, optional): see :obj:`traverse`.
+
+            Returns:
+                generator of :obj:`pyham.genome.Genome`.
+        """
+
+        for hog in self.iter_hogs(prune):
+            yield hog.genome
+
     def visit(self, elem, function_extant_gene=None, function_postfix=None, function_prefix=None):
 
         """  
-        Recursive function to traverse the HOG nested children hierarchy. 
+        Function to traverse the HOG nested children hierarchy. 
         
-        An arbitrary object "elem" is return at each visit() and is pass/returned from each recursive state function 
-        calls. 
+        An arbitrary object "elem" is return at each visit() and is pass/returned from each state function calls.
+        Each nested HOG is visited with the "elem" of its parent (the "elem" returned for a nested HOG is not
+        returned to its parent, so "elem" is expected to be mutable). The traversal uses an explicit stack and is not
+        bound by the recursion limit.
         
-        There is tree recursive state functions:
+        There is tree state functions:
             - function_extant_gene: Function called at each ExtantGene child. Its take as argument the child ExtantGene
              and the "elem" and return processed "elem".
             - function_postfix: Function called after each HOG child visit(). Its take as argument the child HOG and 
@@ -270,7 +625,7 @@ class HOG(AbstractGene):
              processed "elem".
 
         Attributes:
-            | elem (arbitrary object): object that is pass through visit recursive and recursive state functions calls.
+            | elem (arbitrary object): object that is pass through visit and state functions calls.
             | function_extant_gene (callback function): Callback function for ExtantGenes (leaves).
             | function_postfix (callback function): Callback function for after child visit current HOG.
             | function_prefix (callback function): Callback function for current HOG.
@@ -282,18 +637,26 @@ class HOG(AbstractGene):
         if function_prefix is not None:
             elem = function_prefix(self, elem)
 
-        for child in self.children:
-            if isinstance(child, Gene):
-                if function_extant_gene is not None:
-                    elem = function_extant_gene(self, child, elem)
+        # each frame holds a HOG, the iterator over its remaining children and its own "elem".
+        stack = [(self, iter(self.children), elem)]
+        while True:
+            hog, children, elem = stack[-1]
+            for child in children:
+                if isinstance(child, Gene):
+                    if function_extant_gene is not None:
+                        elem = function_extant_gene(hog, child, elem)
+                else:
+                    stack[-1] = (hog, children, elem)
+                    child_elem = function_prefix(child, elem) if function_prefix is not None else elem
+                    stack.append((child, iter(child.children), child_elem))
+                    break
             else:
-                child.visit(elem, function_extant_gene=function_extant_gene, function_postfix=function_postfix,
-                            function_prefix=function_prefix)
+                stack.pop()
+                if not stack:
+                    return elem
+                parent, siblings, parent_elem = stack[-1]
                 if function_postfix is not None:
-                    elem = function_postfix(self, child, elem)
-        return elem
-
-    #  TODO: UT
+                    stack[-1] = (parent, siblings, function_postfix(parent, hog, parent_elem))
 
     def get_all_descendant_genes(self):
 
@@ -305,11 +668,27 @@ class HOG(AbstractGene):
 
         """
 
-        def append_leaf(current, child, list):
-            list.append(child)
-            return list
+        return list(self.iter_genes())
+
+    def get_descendant_genes_view(self):
+
+        """
+        Get the same :obj:`Gene` as get_all_descendant_genes, as a view of the genes of the family in pre-order
+        shared by all its HOGs (the list isn't copied). The view is a snapshot: it doesn't follow later changes of
+        the family.
+
+            Returns:
+                :obj:`GeneSlice` of :obj:`pyham.abstractgene.Gene`
+
+        """
 
-        return self.visit([], function_extant_gene=append_leaf)
+        family = self.get_family()
+        if not family.has_gene_ranges():
+            # numbering the family may create its missing levels, and so a new family handle.
+            numbering = self._get_numbering()
+            family = self.get_family()
+            family.set_gene_ranges(numbering)
+        return family.get_descendant_genes(self._pre)
 
     def get_all_descendant_genes_clustered_by_species(self):
         """ 
@@ -319,12 +698,11 @@ class HOG(AbstractGene):
                 Dictionary of :obj:`pyham.genome.ExtantGenome` map their list of :obj:`pyham.abstractgene.Gene`.
 
         """
-  
-        def append_add_lead_with_genome(current, child, dict):
-            dict.setdefault(child.genome, []).append(child)
-            return dict
 
-        return self.visit({}, function_extant_gene=append_add_lead_with_genome)
+        clusters = {}
+        for gene in self.iter_genes():
+            clusters.setdefault(gene.genome, []).append(gene)
+        return clusters
 
     def get_all_descendant_hogs(self): # TODO: self is also returned with it
         
@@ -332,15 +710,11 @@ class HOG(AbstractGene):
         Get all :obj:`pyham.abstractgene.HOG` present in this HOG hierarchy.
 
             Returns:
-                Dictionary of :obj:`pyham.genomeExtantGenome` map their list of :obj:`pyham.abstractgene.Gene`.
+                list of :obj:`pyham.abstractgene.HOG`, in pre-order.
 
         """
 
-        def append_child(current, list):
-            list.append(current)
-            return list
-        
-        return self.visit([], function_prefix=append_child)
+        return list(self.iter_hogs())
 
     def get_all_descendant_hog_levels(self): # TODO: self is also returned with it
 
@@ -352,11 +726,32 @@ class HOG(AbstractGene):
 
         """
 
-        def append_current_genome(current,list):
-            list.append(current.genome)
-            return list
+        return list(self.iter_levels())
+
+    def get_members_by_level(self):
+
+        """
+        Get the :obj:`pyham.abstractgene.AbstractGene` of this HOG hierarchy (self included) grouped by genome, read
+        from the level index of the family (see :obj:`FamilyNumbering`).
+
+            Returns:
+                Dictionary of :obj:`pyham.genome.Genome` map their list of :obj:`pyham.abstractgene.AbstractGene`, in
+                pre-order.
+        """
+
+        numbering = self._get_numbering()
+        return numbering.get_subtree_levels(self._pre)
+
+    def get_level_counts(self):
+
+        """
+        Count the :obj:`pyham.abstractgene.AbstractGene` of each genome in this HOG hierarchy (self included).
+
+            Returns:
+                Dictionary of :obj:`pyham.genome.Genome` map their number of :obj:`pyham.abstractgene.AbstractGene`.
+        """
 
-        return self.visit([], function_prefix=append_current_genome)
+        return {genome: len(members) for genome, members in self.get_members_by_level().items()}
 
     def get_number_losses(self):
 
@@ -376,12 +771,10 @@ class HOG(AbstractGene):
                 :obj:`int`: number of implied Dollo loss events in this HOG's subtree.
         """
 
-        present_children_taxa = {child.genome.taxon for child in self.children}
-        losses = sum(1 for taxon in self.genome.taxon.children if taxon not in present_children_taxa)
-
-        for child in self.children:
-            if isinstance(child, HOG):
-                losses += child.get_number_losses()
+        losses = 0
+        for hog in self.iter_hogs():
+            present_children_taxa = {child.genome.taxon for child in hog.children}
+            losses += sum(1 for taxon in hog.genome.taxon.children if taxon not in present_children_taxa)
 
         return losses
 
@@ -428,32 +821,33 @@ class HOG(AbstractGene):
                     return str(xref[key])
             return str(gene.unique_id)
 
-        def build(hog):
-            node = Tree({"name": hog.hog_id})
-            node.add_prop("hog_id", hog.hog_id)
-            node.add_prop("taxon", hog.genome.name)
-            node.add_prop("duplicate", bool(hog.arose_by_duplication))
-            if hog.arose_by_duplication:
+        nodes = {}
+        for item in self.traverse():
+            if isinstance(item, Gene):
+                leaf = nodes[id(item.parent)].add_child(name=leaf_name(item))
+                for key, value in item.get_dict_xref().items():
+                    leaf.add_prop(key, value)
+                leaf.add_prop("taxon", item.genome.name)
+                continue
+            node = Tree({"name": item.hog_id})
+            node.add_prop("hog_id", item.hog_id)
+            node.add_prop("taxon", item.genome.name)
+            node.add_prop("duplicate", bool(item.arose_by_duplication))
+            if item.arose_by_duplication:
                 # identifies which sibling nodes share the same duplication event
                 # (hog.arose_by_duplication is a shared DuplicationNode instance);
                 # a plain object id is enough since this only needs to be stable
                 # within one export, not meaningful across separate runs.
-                node.add_prop("duplication_id", id(hog.arose_by_duplication))
-            for child in hog.children:
-                if isinstance(child, Gene):
-                    leaf = node.add_child(name=leaf_name(child))
-                    for key, value in child.get_dict_xref().items():
-                        leaf.add_prop(key, value)
-                    leaf.add_prop("taxon", child.genome.name)
-                else:
-                    node.add_child(build(child))
-            return node
+                node.add_prop("duplication_id", id(item.arose_by_duplication))
+            if item is not self:
+                nodes[id(item.parent)].add_child(node)
+            nodes[id(item)] = node
 
-        return build(self)
+        return nodes[id(self)]
 
     def find_by_id(self, hog_id: str, taxid: int = None):
         """
-        Recursive function to find a HOG by its id and optionally its taxid.
+        Find a HOG nested in this HOG by its id and optionally its taxid.
 
             Args:
                 | hog_id (:obj:`str`): HOG id to be found.
@@ -463,19 +857,19 @@ class HOG(AbstractGene):
                 :obj:`pyham.abstractgene.HOG` if found otherwise None.
         """
 
-        cur_hog_without_taxid = self.hog_id.split('_')[0]
-        if cur_hog_without_taxid == hog_id and (taxid is None or self.taxon_id == taxid or self.hog_id == f"{hog_id}_{taxid}"):
-            return self
-        elif not hog_id.startswith(cur_hog_without_taxid):
-            return None
+        if self._parent is None:
+            # whole family: hash lookup in the id index of its numbering.
+            return self._get_numbering().get_hog_by_id(hog_id, taxid)
 
-        for child in getattr(self, 'children', []):
-            if isinstance(child, HOG):
-                found = child.find_by_id(hog_id, taxid)
-                if found is not None:
-                    return found
-        return None
+        def prune(hog):
+            # HOG ids of nested HOGs extend the id of their parent, other subtrees cannot contain the query.
+            return not hog_id.startswith(hog.hog_id.split('_')[0])
 
+        for hog in self.iter_hogs(prune):
+            if hog.hog_id.split('_')[0] == hog_id and (taxid is None or hog.taxon_id == taxid
+                                                      or hog.hog_id == f"{hog_id}_{taxid}"):
+                return hog
+        return None
 
     def __repr__(self):
         ids = []
@@ -503,9 +897,12 @@ class Gene(AbstractGene):
         | gene_id    id used to mapped to external ids.
         | prot_id    id used to mapped to external ids.
         | transcript_id    id used to mapped to external ids.
+        | hog_id    LOFT id of the gene, only set by set_LOFT.
 
     """
 
+    __slots__ = ('unique_id', 'gene_id', 'prot_id', 'transcript_id', 'hog_id')
+
     def __init__(self, id, geneId=None, protId=None, transcriptId=None, **kwargs):
         super(Gene, self).__init__(**kwargs)
         self.unique_id = id
@@ -567,15 +964,343 @@ class Gene(AbstractGene):
         return xref
 
     def is_singleton(self):
-        if self.parent is None:
-            return True
-        else:
-            return False
+        # the parent link itself is enough, no need to create the missing levels above the gene.
+        return self._parent is None
 
     def __repr__(self):
         return "{}({})".format(self.__class__.__name__, self.unique_id)
 
 
+class GeneSlice(Sequence):
+    """
+    Read-only view of the genes[start:stop] slice of a list of genes, without copy. The descendant genes of an
+    AbstractGene are such a slice of the genes of its family in pre-order (see :obj:`Family.genes`).
+
+    Attributes:
+        | genes (:obj:`list` of :obj:`Gene`): viewed list.
+        | start (:obj:`int`): first position in genes.
+        | stop (:obj:`int`): position after the last one in genes.
+    """
+
+    __slots__ = ('genes', 'start', 'stop')
+
+    def __init__(self, genes, start, stop):
+        self.genes = genes
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.genes[self.start + i] for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("GeneSlice index out of range")
+        return self.genes[self.start + item]
+
+    def __iter__(self):
+        return map(self.genes.__getitem__, range(self.start, self.stop))
+
+    def __eq__(self, other):
+        if not isinstance(other, (GeneSlice, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a is b or a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.genes[self.start:self.stop])
+
+
+class FamilyNumbering(object):
+    """
+    Pre-order and post-order numbering of the :obj:`AbstractGene` of a family, built with a single traversal from the
+    top level HOG. Each AbstractGene of the family is stamped with the numbering and its pre-order index, the other
+    values are stored in arrays indexed by pre-order so the numbering stays compact.
+
+    An AbstractGene is an ancestor of another one if its pre-order index is lower and its post-order index higher. The
+    HOGs of a family mapped to one genome are not nested, so the ancestor of an AbstractGene at a genome is the last
+    HOG of this genome that precedes it in pre-order, found by bisection.
+
+    Attributes:
+        | root (:obj:`HOG`): top level HOG of the family.
+        | nodes (:obj:`list` of :obj:`AbstractGene`): AbstractGenes in pre-order.
+        | post (:obj:`array.array`): post-order index.
+        | depth (:obj:`array.array`): depth, 0 for the top level HOG.
+        | duplication_depth (:obj:`array.array`): depth of the deepest strict ancestor that arose by duplication, -1
+        if none.
+        | levels (:obj:`dict`): pre-order indexes (increasing) of the AbstractGenes of each genome.
+        | hog_ids (:obj:`dict`): first HOG in pre-order of each (id, taxid) and (id, None) key, where id is the HOG id
+        without its "_<taxid>" suffix. Built by the first id lookup.
+        | valid (:obj:`bool`): False once the family has been modified since the numbering, or the numbering
+        evicted from :obj:`FamilyNumberingCache`.
+    """
+
+    __slots__ = ('root', 'nodes', 'post', 'depth', 'duplication_depth', 'levels', 'hog_ids', 'valid',
+                 '__weakref__')
+
+    def __init__(self, root):
+        # not valid until complete, the levels created while numbering the family don't release it.
+        self.valid = False
+        self.root = root
+        self.hog_ids = None
+        self.nodes = nodes = []
+        self.levels = levels = {}
+        parents, depth, duplication_depth = [], [], []
+
+        # a parent is numbered before its children, which read its number from their parent link.
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            pre = len(nodes)
+            nodes.append(node)
+            node._numbering = self
+            node._pre = pre
+            levels.setdefault(node.genome, []).append(pre)
+            if pre:
+                parent = node._parent._pre
+                parents.append(parent)
+                depth.append(depth[parent] + 1)
+                duplication_depth.append(depth[parent] if nodes[parent].arose_by_duplication
+                                         else duplication_depth[parent])
+            else:
+                parents.append(-1)
+                depth.append(0)
+                duplication_depth.append(-1)
+            if isinstance(node, HOG):
+                # may create the missing levels below node, which are then numbered as its children.
+                stack.extend(reversed(node.children))
+
+        size = [1] * len(nodes)
+        for pre in range(len(nodes) - 1, 0, -1):
+            size[parents[pre]] += size[pre]
+        self.post = array('i', [pre + size[pre] - 1 - depth[pre] for pre in range(len(nodes))])
+        self.depth = array('i', depth)
+        self.duplication_depth = array('i', duplication_depth)
+        self.valid = True
+
+    def release(self):
+        """ Drop the numbering, the AbstractGenes of the family are numbered again by the next query."""
+        self.valid = False
+        self.root = self.nodes = self.levels = self.hog_ids = None
+        self.post = self.depth = self.duplication_depth = None
+
+    def is_ancestor(self, pre, other_pre):
+        """ True if the AbstractGene numbered pre is a strict ancestor of the one numbered other_pre."""
+        return pre < other_pre and self.post[pre] > self.post[other_pre]
+
+    def search_ancestor(self, pre, genome):
+        """ Same as :obj:`AbstractGene.search_ancestor_hog_in_ancestral_genome` for the AbstractGene numbered pre."""
+        candidates = self.levels.get(genome, ())
+        i = bisect.bisect_left(candidates, pre) - 1
+        ancestor_depth = -1
+        found = None
+        if i >= 0 and self.is_ancestor(candidates[i], pre):
+            found = self.nodes[candidates[i]]
+            ancestor_depth = self.depth[candidates[i]]
+        if self.duplication_depth[pre] > ancestor_depth:
+            return found, True
+        return found, self.nodes[pre].arose_by_duplication
+
+    def get_at_level(self, genome):
+        """ AbstractGenes of the family mapped to genome, in pre-order."""
+        return [self.nodes[pre] for pre in self.levels.get(genome, ())]
+
+    def get_hog_by_id(self, hog_id, taxid=None):
+        """ Same as :obj:`HOG.find_by_id` on the top level HOG, with a hash lookup."""
+        if self.hog_ids is None:
+            hog_ids = {}
+            for node in self.nodes:
+                if not isinstance(node, HOG) or node.hog_id is None:
+                    continue
+                base, _, suffix = node.hog_id.partition('_')
+                hog_ids.setdefault((base, None), node)
+                if node.taxon_id is not None:
+                    hog_ids.setdefault((base, node.taxon_id), node)
+                # "<id>_<taxid>" ids also match their taxid.
+                if suffix.lstrip('-').isdigit() and str(int(suffix)) == suffix:
+                    hog_ids.setdefault((base, int(suffix)), node)
+            self.hog_ids = hog_ids
+        return self.hog_ids.get((hog_id, taxid))
+
+    def get_subtree_levels(self, pre):
+        """ AbstractGenes of the subtree of the AbstractGene numbered pre (itself included) by genome, in pre-order."""
+        nodes = self.nodes
+        if pre == 0:
+            return {genome: [nodes[i] for i in members] for genome, members in self.levels.items()}
+        end = self.post[pre] + self.depth[pre] + 1
+        subtree_levels = {}
+        for genome, members in self.levels.items():
+            lo = bisect.bisect_left(members, pre)
+            hi = bisect.bisect_left(members, end, lo)
+            if hi > lo:
+                subtree_levels[genome] = [nodes[i] for i in members[lo:hi]]
+        return subtree_levels
+
+
+class Family(object):
+    """
+    Handle of a family (a top level HOG and all its descendants, or a singleton gene) shared by its AbstractGenes and
+    kept up to date by :obj:`AbstractGene.parent`: when the root of a family is attached below an AbstractGene its
+    family is merged into the family of its new parent, and a family that loses a subtree is invalidated, its
+    AbstractGenes then find their family again by walking up (see :obj:`AbstractGene.get_family`).
+
+    Attributes:
+        | root (:obj:`AbstractGene`): top level HOG of the family.
+        | epoch (:obj:`int`): number of AbstractGenes attached in the family since it was created, tells when data
+        built from the family is outdated.
+        | valid (:obj:`bool`): False once the family lost a subtree or has been merged into another one.
+        | changes (:obj:`int`): class attribute, number of modifications of all the families, tells cheaply whether
+        data built from many families may be outdated before looking at each of them.
+        | genes (:obj:`list` of :obj:`Gene`): Genes of the family in pre-order, the descendant genes of an
+        AbstractGene are a slice of it. Built by the first descendant genes query, as gene_starts and gene_stops.
+        | gene_starts, gene_stops (:obj:`array.array`): range in genes of the descendant genes of each pre-order
+        index of the :obj:`FamilyNumbering`.
+
+    The gene ranges belong to the family rather than to its numbering, so that they outlive the eviction of the
+    numbering from :obj:`FamilyNumberingCache`: the clusterings of all the ancestral genomes share them whatever the
+    number of families. They cost two integers per AbstractGene and a reference per Gene of each family queried, until
+    the family is modified.
+    """
+
+    __slots__ = ('root', 'epoch', 'valid', '_merged', 'genes', 'gene_starts', 'gene_stops', '_genes_epoch')
+
+    changes = 0
+
+    def __init__(self, root):
+        self.root = root
+        self.epoch = 0
+        self.valid = True
+        self._merged = None
+        self.genes = self.gene_starts = self.gene_stops = None
+        self._genes_epoch = -1
+
+    def find(self):
+        """  Return the family this one has been merged into (itself if none), None if it is no longer valid."""
+        family = self
+        while family._merged is not None:
+            family = family._merged
+        node = self
+        while node._merged is not None and node._merged is not family:
+            node._merged, node = family, node._merged
+        return family if family.valid else None
+
+    def add_member(self):
+        """  Record that an AbstractGene has been attached in the family."""
+        self.epoch += 1
+        Family.changes += 1
+
+    def merge_into(self, family):
+        Family.changes += 1
+        self._merged = family
+        self.valid = False
+        self.root = None
+        self.genes = self.gene_starts = self.gene_stops = None
+
+    def invalidate(self):
+        Family.changes += 1
+        self.valid = False
+        self.root = None
+        self.genes = self.gene_starts = self.gene_stops = None
+
+    def has_gene_ranges(self):
+        """  True if the gene ranges are built and the family not modified since."""
+        return self.genes is not None and self._genes_epoch == self.epoch
+
+    def set_gene_ranges(self, numbering):
+        """  Build genes, gene_starts and gene_stops from the current numbering of the family."""
+        nodes = numbering.nodes
+        genes = []
+        offsets = array('i', [0]) * (len(nodes) + 1)
+        for pre, node in enumerate(nodes):
+            offsets[pre] = len(genes)
+            if isinstance(node, Gene):
+                genes.append(node)
+        offsets[-1] = len(genes)
+        post, depth = numbering.post, numbering.depth
+        self.gene_starts = offsets[:-1]
+        self.gene_stops = array('i', [offsets[post[pre] + depth[pre] + 1] for pre in range(len(nodes))])
+        self.genes = genes
+        self._genes_epoch = self.epoch
+
+    def get_descendant_genes(self, pre):
+        """  Descendant genes of the AbstractGene numbered pre as a :obj:`GeneSlice` of genes."""
+        return GeneSlice(self.genes, self.gene_starts[pre], self.gene_stops[pre])
+
+
+class FamilyNumberingCache(object):
+    """
+    Bounded LRU cache of the :obj:`FamilyNumbering` of the families queried last. A numbering evicted from the cache
+    is released and rebuilt by the next query on its family, so the memory used by the numberings doesn't grow with
+    the number of families queried.
+
+    The cache only holds weak references to the numberings (their AbstractGenes hold them): the families of a Ham
+    analysis that is no longer used are collected with their numberings.
+
+    Attributes:
+        | maxsize (:obj:`int`): maximum number of numbered families (the family of the last query is always kept).
+        | hits (:obj:`int`): number of queries answered with an existing numbering.
+        | misses (:obj:`int`): number of families numbered.
+    """
+
+    def __init__(self, maxsize=1 << 12):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, node):
+        """  Return the numbering of the family of node, numbering it if it isn't (or no longer) numbered."""
+        numbering = node._numbering
+        if numbering is not None and numbering.valid:
+            self.hits += 1
+            self._entries.move_to_end(id(numbering))
+            return numbering
+        self.misses += 1
+        numbering = FamilyNumbering(node.get_top_level_hog())
+        key = id(numbering)
+        self._entries[key] = weakref.ref(numbering, functools.partial(self._discard, key))
+        while len(self._entries) > max(self.maxsize, 1):
+            evicted = self._entries.popitem(last=False)[1]()
+            if evicted is not None:
+                evicted.release()
+        return numbering
+
+    def release(self, numbering):
+        """  Release a numbering (e.g. once its family is modified) and remove it from the cache."""
+        self._entries.pop(id(numbering), None)
+        numbering.release()
+
+    def _discard(self, key, ref):
+        # the numbering was collected with its family.
+        if self._entries.get(key) is ref:
+            del self._entries[key]
+
+    def cache_info(self):
+        """  Return the statistics of the cache.
+
+            Returns:
+                :obj:`CacheInfo` (hits, misses, maxsize, currsize).
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        """  Release all the numberings and reset the statistics."""
+        for ref in list(self._entries.values()):
+            numbering = ref()
+            if numbering is not None:
+                numbering.release()
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+
+# numberings of the families of all the Ham analyses.
+family_numberings = FamilyNumberingCache()
+
+
 class EvolutionaryConceptError(Exception):
     pass
 
@@ -624,6 +1349,30 @@ class TaxonomicConflictError(Exception):
         super().__init__(message)
         self.conflicts = conflicts
 
+    def __reduce__(self):
+        # keep the conflicts when the error is raised in a worker process (see pyham.parallel)
+        return type(self), (str(self), self.conflicts)
+
+
+@dataclasses.dataclass
+class ValidationReport:
+    """Summary of a validation of an OrthoXML file against a species tree (see :obj:`pyham.ham.Ham.validate`).
+
+    Attributes:
+        | families (:obj:`int`): number of top-level HOGs checked.
+        | hogs (:obj:`int`): number of orthologGroups checked.
+        | n_conflicts (:obj:`int`): number of :obj:`TaxonomicConflict` found.
+        | conflicts (:obj:`list`): the :obj:`TaxonomicConflict` found, or None if they were written to a sink.
+    """
+    families: int
+    hogs: int
+    n_conflicts: int
+    conflicts: list = None
+
+    @property
+    def is_valid(self):
+        return self.n_conflicts == 0
+
 
 class DuplicationNode(object):
     """
@@ -633,15 +1382,16 @@ class DuplicationNode(object):
         
         Attributes:
         | parent (:obj:`pyham.abstractgene.HOG`): Direct parent HOG this DuplicationNode.
-        | children: List of all duplicated genes
+        | children (:obj:`ChildList`): All duplicated genes
         | MRCA: Parent of the MRCA of all children gene that contained the parent HOG.
             
     """
 
-    def __init__(self, parser, id=None):
-        self.parser = parser
+    __slots__ = ('MRCA', 'children', 'parent', 'id', '__weakref__')
+
+    def __init__(self, id=None):
         self.MRCA = None
-        self.children = []
+        self.children = ChildList()
         self.parent = None
         self.id = id
 
@@ -660,7 +1410,7 @@ class DuplicationNode(object):
         hog.duplications.append(self)
         self.parent = hog
 
-    def set_MRCA(self):
+    def set_MRCA(self, taxonomy):
         """
             Compute the MRCA of all genes genomes.
 
@@ -669,17 +1419,20 @@ class DuplicationNode(object):
             duplication event on the branch between Mammalia and Euchontoglires,
             the MRCA is set to Mammalia.
 
+                Args:
+                    | taxonomy (:obj:`pyham.taxonomy.Taxonomy`): taxonomy of the genomes of the children.
+
         """
 
         children_taxa = set([child.genome.taxon for child in self.children])
         if len(children_taxa) < 2:
             mrca = children_taxa.pop().up
         else:
-            mrca = self.parser.taxonomy.get_mrca_taxnode(*children_taxa)
+            mrca = taxonomy.get_mrca_taxnode(*children_taxa)
             if mrca.up is None:
                 raise EvolutionaryConceptError("MRCA of {} is prior to taxonomy root".format(self.id))
             mrca = mrca.up
-        self.MRCA = self.parser.taxonomy.get_genome_from_taxnode(mrca)
+        self.MRCA = taxonomy.get_genome_from_taxnode(mrca)
 
     def add_child(self, child):
         """
@@ -693,6 +1446,7 @@ class DuplicationNode(object):
 
         self.children.append(child)
         child.arose_by_duplication = self
+        child._invalidate_numbering()
 
     def remove_child(self, child_to_remove):
         """
@@ -707,6 +1461,7 @@ class DuplicationNode(object):
         if child_to_remove in self.children:
             self.children.remove(child_to_remove)
             child_to_remove.arose_by_duplication = False
+            child_to_remove._invalidate_numbering()
 
         else:
             raise ValueError("element not found in the duplication children")
@@ -0,0 +1,292 @@
+"""Columnar snapshot of the HOG forest of a Ham analysis.
+
+Every HOG and extant gene of the snapshotted families is a row of a few NumPy arrays, the rows of a family being laid
+out in pre-order: the subtree of a row is the contiguous range of rows [row, end[row]). The relations between rows
+(parent, level, duplication event, ancestor at a level, descendant genes) are then answered by array operations
+instead of walking the objects, and :obj:`ForestNode` views on the rows are only created on access.
+
+The snapshot is independent of the objects it was built from (unless keep_objects is set), so the families can be
+released once snapshotted, e.g. when built from :obj:`pyham.ham.Ham.iter_families`.
+"""
+
+import logging
+
+import numpy as np
+
+from . import abstractgene
+from .genome import Genome
+
+logger = logging.getLogger(__name__)
+
+
+class HOGForest(object):
+    """
+    HOGs and extant genes of a set of families stored as columns.
+
+    Attributes:
+        | taxonomy (:obj:`pyham.taxonomy.Taxonomy`): taxonomy of the Ham analysis.
+        | taxa (:obj:`list` of :obj:`ete4.Tree`): taxonomy nodes in pre-order, indexed by the taxon column.
+        | id_strings (:obj:`list` of :obj:`str`): interned HOG ids and gene unique ids, indexed by the ids column.
+        | parent (:obj:`numpy.ndarray`): row of the parent HOG, -1 for the top level HOGs.
+        | taxon (:obj:`numpy.ndarray`): index in taxa of the level (taxon of the genome) of the row.
+        | duplication (:obj:`numpy.ndarray`): id of the duplication event the row arose by, -1 if none.
+        | is_gene (:obj:`numpy.ndarray`): True for the extant genes, False for the HOGs.
+        | ids (:obj:`numpy.ndarray`): index in id_strings of the id of the row, -1 for the HOGs without id.
+        | depth (:obj:`numpy.ndarray`): depth of the row in its family, 0 for the top level HOGs.
+        | pre, post (:obj:`numpy.ndarray`): pre-order (the row itself) and post-order index of the row. A row is an
+        ancestor of another one if its pre index is lower and its post index is higher.
+        | end (:obj:`numpy.ndarray`): end (excluded) of the range of rows of the subtree of the row.
+        | roots (:obj:`numpy.ndarray`): rows of the top level HOGs.
+        | objects (:obj:`list`): :obj:`pyham.abstractgene.AbstractGene` of each row if keep_objects was set, else None.
+    """
+
+    def __init__(self, taxonomy, families, keep_objects=False):
+        """
+        Args:
+            | taxonomy (:obj:`pyham.taxonomy.Taxonomy`): taxonomy of the Ham analysis.
+            | families (iterable of :obj:`pyham.abstractgene.HOG`): top level HOGs to snapshot.
+            | keep_objects (:obj:`Boolean`, optional): keep a reference to the object of each row. Defaults to False.
+        """
+
+        self.taxonomy = taxonomy
+        self.taxa = list(taxonomy.tree.traverse('preorder'))
+        self._taxon_index = {id(node): i for i, node in enumerate(self.taxa)}
+        self.id_strings = []
+        self._id_index = {}
+        self.objects = [] if keep_objects else None
+
+        parent, taxon, duplication, is_gene, ids, depth = [], [], [], [], [], []
+        duplication_ids = {}
+        for family in families:
+            stack = [(family, -1, 0)]
+            while stack:
+                node, parent_row, node_depth = stack.pop()
+                row = len(parent)
+                gene = isinstance(node, abstractgene.Gene)
+                parent.append(parent_row)
+                taxon.append(self._taxon_index[id(node.genome.taxon)])
+                is_gene.append(gene)
+                depth.append(node_depth)
+                ids.append(self._intern(node.unique_id if gene else node.hog_id))
+                if node.arose_by_duplication:
+                    duplication.append(duplication_ids.setdefault(id(node.arose_by_duplication), len(duplication_ids)))
+                else:
+                    duplication.append(-1)
+                if self.objects is not None:
+                    self.objects.append(node)
+                if not gene:
+                    stack.extend((child, row, node_depth + 1) for child in reversed(node.children))
+
+        self.parent = np.array(parent, dtype=np.int32)
+        self.taxon = np.array(taxon, dtype=np.int32)
+        self.duplication = np.array(duplication, dtype=np.int32)
+        self.is_gene = np.array(is_gene, dtype=bool)
+        self.ids = np.array(ids, dtype=np.int32)
+        self.depth = np.array(depth, dtype=np.int32)
+        self.pre = np.arange(len(parent), dtype=np.int32)
+
+        # subtree sizes, accumulated from the deepest rows up.
+        size = np.ones(len(parent), dtype=np.int32)
+        for level in range(int(self.depth.max()) if len(parent) else 0, 0, -1):
+            rows = np.flatnonzero(self.depth == level)
+            np.add.at(size, self.parent[rows], size[rows])
+        self.end = self.pre + size
+        self.post = self.pre + size - 1 - self.depth
+        self.roots = np.flatnonzero(self.parent == -1)
+        logger.info('Columnar snapshot: {} families, {} rows, {:.1f} MB.'.format(
+            len(self.roots), len(self), self.nbytes / 1e6))
+
+    def _intern(self, key):
+        if key is None:
+            return -1
+        key = str(key)
+        idx = self._id_index.get(key)
+        if idx is None:
+            idx = self._id_index[key] = len(self.id_strings)
+            self.id_strings.append(key)
+        return idx
+
+    def __len__(self):
+        return len(self.parent)
+
+    @property
+    def nbytes(self):
+        """ Memory used by the columns (not counting the interned id strings)."""
+        return sum(column.nbytes for column in (self.parent, self.taxon, self.duplication, self.is_gene, self.ids,
+                                                self.depth, self.pre, self.post, self.end))
+
+    def get_taxon_index(self, level):
+        """  Get the index in taxa of a level.
+
+            Args:
+                level: :obj:`pyham.genome.Genome`, taxonomy node or name of the level.
+
+            Returns:
+                :obj:`int`
+
+            Raises:
+                KeyError: if the level is not in the taxonomy.
+        """
+
+        if isinstance(level, Genome):
+            level = level.taxon
+        elif isinstance(level, str):
+            level = self.taxonomy.get_node_by_name(level)
+        try:
+            return self._taxon_index[id(level)]
+        except KeyError:
+            raise KeyError("Level {} not found in the taxonomy".format(level))
+
+    def get_rows_by_id(self, id):
+        """  Get the rows of a HOG id or gene unique id (several for the HOG ids shared by different levels).
+
+            Returns:
+                :obj:`numpy.ndarray` of rows.
+        """
+
+        idx = self._id_index.get(str(id))
+        if idx is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.ids == idx)
+
+    def get_rows_at_level(self, level):
+        """  Get the rows (HOGs, or genes for an extant level) of a level, in increasing order.
+
+            Returns:
+                :obj:`numpy.ndarray` of rows.
+        """
+
+        return np.flatnonzero(self.taxon == self.get_taxon_index(level))
+
+    def get_ancestors_at_level(self, rows, level):
+        """  Get for each row the row of its ancestor (or itself) at a level, -1 if there is none. The HOGs of a
+        family at one level are never nested, so this is a binary search of each row in the rows of the level.
+
+            Args:
+                | rows (array-like of :obj:`int`): query rows.
+                | level: :obj:`pyham.genome.Genome`, taxonomy node or name of the level.
+
+            Returns:
+                :obj:`numpy.ndarray` of rows.
+        """
+
+        rows = np.asarray(rows, dtype=np.intp)
+        candidates = self.get_rows_at_level(level)
+        result = np.full(len(rows), -1, dtype=np.intp)
+        pos = np.searchsorted(candidates, rows, side='right') - 1
+        found = np.flatnonzero(pos >= 0)
+        ancestors = candidates[pos[found]]
+        inside = rows[found] < self.end[ancestors]
+        result[found[inside]] = ancestors[inside]
+        return result
+
+    def get_descendant_genes(self, row):
+        """  Get the rows of the extant genes of the subtree of a row.
+
+            Returns:
+                :obj:`numpy.ndarray` of rows.
+        """
+
+        return row + np.flatnonzero(self.is_gene[row:self.end[row]])
+
+    def get_children(self, row):
+        """  Get the rows of the direct children of a row.
+
+            Returns:
+                :obj:`numpy.ndarray` of rows.
+        """
+
+        return row + 1 + np.flatnonzero(self.parent[row + 1:self.end[row]] == row)
+
+    def get_level_counts(self, genes=False):
+        """  Count the HOGs (or, if genes is set, the extant genes) of each level.
+
+            Returns:
+                :obj:`numpy.ndarray` of counts indexed like taxa.
+        """
+
+        mask = self.is_gene if genes else ~self.is_gene
+        return np.bincount(self.taxon[mask], minlength=len(self.taxa))
+
+    def node(self, row):
+        """  Get a view on a row.
+
+            Returns:
+                :obj:`ForestNode`
+        """
+
+        if not -len(self) <= row < len(self):
+            raise IndexError("row {} out of range".format(row))
+        return ForestNode(self, int(row) % len(self))
+
+
+class ForestNode(object):
+    """
+    View on a row of a :obj:`HOGForest`, mirroring the attributes of :obj:`pyham.abstractgene.HOG` and
+    :obj:`pyham.abstractgene.Gene` that can be read from the columns.
+
+    Attributes:
+        | forest (:obj:`HOGForest`): the snapshot.
+        | row (:obj:`int`): the row.
+    """
+
+    __slots__ = ('forest', 'row')
+
+    def __init__(self, forest, row):
+        self.forest = forest
+        self.row = row
+
+    @property
+    def id(self):
+        """ HOG id or gene unique id (None for a HOG without id)."""
+        idx = self.forest.ids[self.row]
+        return self.forest.id_strings[idx] if idx >= 0 else None
+
+    @property
+    def is_gene(self):
+        return bool(self.forest.is_gene[self.row])
+
+    @property
+    def taxon(self):
+        return self.forest.taxa[self.forest.taxon[self.row]]
+
+    @property
+    def genome(self):
+        return self.forest.taxonomy.get_genome_from_taxnode(self.taxon)
+
+    @property
+    def parent(self):
+        parent = self.forest.parent[self.row]
+        return ForestNode(self.forest, int(parent)) if parent >= 0 else None
+
+    @property
+    def children(self):
+        return [ForestNode(self.forest, int(row)) for row in self.forest.get_children(self.row)]
+
+    @property
+    def arose_by_duplication(self):
+        """ id of the duplication event this row arose by, None if it didn't."""
+        duplication = self.forest.duplication[self.row]
+        return int(duplication) if duplication >= 0 else None
+
+    @property
+    def obj(self):
+        """ the :obj:`pyham.abstractgene.AbstractGene` of the row if the snapshot kept them, else None."""
+        return self.forest.objects[self.row] if self.forest.objects is not None else None
+
+    def get_all_descendant_genes(self):
+        return [ForestNode(self.forest, int(row)) for row in self.forest.get_descendant_genes(self.row)]
+
+    def get_ancestor_at_level(self, level):
+        row = self.forest.get_ancestors_at_level([self.row], level)[0]
+        return ForestNode(self.forest, int(row)) if row >= 0 else None
+
+    def __eq__(self, other):
+        return isinstance(other, ForestNode) and other.forest is self.forest and other.row == self.row
+
+    def __hash__(self):
+        return hash((id(self.forest), self.row))
+
+    def __repr__(self):
+        return "<{}({}={};level={})>".format(self.__class__.__name__, "gene" if self.is_gene else "hog", self.id,
+                                             self.taxon.name)
@@ -0,0 +1,353 @@
+"""Byte-offset index of the top-level families (orthologGroup elements) of an OrthoXML file.
+
+The index is built once with a single scan of the file and stored in a sidecar file next to it. It records the
+extent of the header (everything before the first family), the byte offset and length of every top-level
+orthologGroup together with its id and the ids of its member genes, and the offset of the closing tags. With it,
+:obj:`pyham.ham.Ham` can resolve a :obj:`pyham.ham.ParserFilter` without tokenizing the whole file, and parse only
+the header and the families that are actually needed, read straight from a memory-mapped file.
+
+For gzip compressed files, offsets refer to the decompressed stream. Selected families are read in file order so a
+gzip file is still decompressed at most once, but without the need to tokenize the skipped families.
+"""
+
+import collections
+import gzip
+import json
+import logging
+import mmap
+import os
+import xml.parsers.expat
+from xml.etree.ElementTree import ParseError
+
+from . import readers
+
+logger = logging.getLogger(__name__)
+
+_NS = "http://orthoXML.org/2011/}"
+_GROUPS = _NS + "groups"
+_HOG = _NS + "orthologGroup"
+_GENEREF = _NS + "geneRef"
+
+FamilyRecord = collections.namedtuple('FamilyRecord', ['hog_id', 'offset', 'length', 'gene_ids'])
+
+
+def _stat_signature(hog_file):
+    st = os.stat(hog_file)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class _IndexBuilder(object):
+    """expat handlers recording the byte extent of the top-level families while the file is scanned.
+
+    expat reports the offset of an end tag only for non-empty elements, so a family is closed at the offset of the
+    next event seen after its end (the next family or the closing groups tag); the whitespace in between is harmless.
+    """
+
+    def __init__(self, expat_parser):
+        self.parser = expat_parser
+        self.families = []
+        self.header_end = None
+        self.tail_offset = None
+
+        self._in_groups = False
+        self._depth = 0
+        self._current = None
+        self._close_pending = False
+        self._header_pending = False
+
+    def _on_event(self):
+        pos = self.parser.CurrentByteIndex
+        if self._header_pending:
+            self.header_end = pos
+            self._header_pending = False
+        if self._close_pending:
+            hog_id, offset, gene_ids = self._current
+            self.families.append(FamilyRecord(hog_id, offset, pos - offset, gene_ids))
+            self._current = None
+            self._close_pending = False
+        return pos
+
+    def start(self, tag, attrib):
+        pos = self._on_event()
+        if not self._in_groups:
+            if tag == _GROUPS:
+                self._in_groups = True
+                self._header_pending = True
+        elif tag == _HOG:
+            if self._depth == 0:
+                self._current = (attrib.get('id'), pos, [])
+            self._depth += 1
+        elif tag == _GENEREF and self._depth > 0:
+            self._current[2].append(attrib['id'])
+
+    def end(self, tag):
+        pos = self._on_event()
+        if not self._in_groups:
+            return
+        if tag == _HOG:
+            self._depth -= 1
+            if self._depth == 0:
+                self._close_pending = True
+        elif tag == _GROUPS:
+            self.tail_offset = pos
+            self._in_groups = False
+
+
+class FamilyIndex(object):
+    """
+    Index of the top-level families of an OrthoXML file, see the module documentation.
+
+    Attributes:
+        | hog_file (:obj:`str`): path to the indexed OrthoXML file.
+        | header_end (:obj:`int`): byte offset of the end of the header (i.e. after the opening groups tag).
+        | tail_offset (:obj:`int`): byte offset of the closing groups tag.
+        | families (:obj:`list`): list of :obj:`FamilyRecord` (hog_id, offset, length, gene_ids) in file order.
+        | source_signature (:obj:`list`): size and modification time of hog_file when the index was built.
+    """
+
+    VERSION = 1
+    SUFFIX = '.famidx'
+    BLOCK_SIZE = 1 << 20
+
+    def __init__(self, hog_file, header_end, tail_offset, families, source_signature=None):
+        self.hog_file = str(hog_file)
+        self.header_end = header_end
+        self.tail_offset = tail_offset
+        self.families = families
+        self.source_signature = source_signature
+
+        self._by_id = None
+        self._by_gene = None
+
+    # ... BUILD / LOAD / SAVE ... #
+
+    @classmethod
+    def build(cls, hog_file):
+        """  Scan the given OrthoXML file once and build its :obj:`FamilyIndex`.
+
+            Args:
+                hog_file (:obj:`str`): path to the OrthoXML file (optionally gzip compressed).
+
+            Returns:
+                :obj:`FamilyIndex`
+        """
+
+        expat_parser = xml.parsers.expat.ParserCreate(namespace_separator='}')
+        builder = _IndexBuilder(expat_parser)
+        expat_parser.StartElementHandler = builder.start
+        expat_parser.EndElementHandler = builder.end
+
+        try:
+            with readers.open_hog_file(hog_file, block_size=cls.BLOCK_SIZE) as blocks:
+                for block in blocks:
+                    expat_parser.Parse(block, False)
+            expat_parser.Parse(b'', True)
+        except xml.parsers.expat.ExpatError as e:
+            # raised as the parsers of the HOGs do.
+            parse_error = ParseError(str(e))
+            parse_error.code, parse_error.position = e.code, (e.lineno, e.offset)
+            raise parse_error from e
+
+        if builder.header_end is None or builder.tail_offset is None:
+            raise ValueError("No <groups> element found in {}, cannot index it.".format(hog_file))
+
+        logger.info('Family index built: {} families indexed in {}.'.format(len(builder.families), hog_file))
+        return cls(hog_file, builder.header_end, builder.tail_offset, builder.families,
+                   source_signature=_stat_signature(hog_file))
+
+    @classmethod
+    def load(cls, index_file, hog_file):
+        """  Load a :obj:`FamilyIndex` previously stored with :obj:`FamilyIndex.save`.
+
+            Args:
+                | index_file (:obj:`str`): path to the sidecar index file.
+                | hog_file (:obj:`str`): path to the indexed OrthoXML file.
+
+            Returns:
+                :obj:`FamilyIndex`
+
+            Raises:
+                ValueError: if the index file has not been written by a compatible version.
+        """
+
+        with gzip.open(index_file, 'rt') as fh:
+            meta = json.loads(fh.readline())
+            if meta.get('version') != cls.VERSION:
+                raise ValueError("Unsupported family index version in {}".format(index_file))
+            families = [FamilyRecord(*json.loads(line)) for line in fh]
+        return cls(hog_file, meta['header_end'], meta['tail_offset'], families,
+                   source_signature=meta['source_signature'])
+
+    def save(self, index_file):
+        """  Store this index as a (gzip compressed) JSON lines file.
+
+            Args:
+                index_file (:obj:`str`): path to the sidecar index file.
+        """
+
+        with gzip.open(index_file, 'wt') as fh:
+            fh.write(json.dumps({'version': self.VERSION, 'header_end': self.header_end,
+                                 'tail_offset': self.tail_offset,
+                                 'source_signature': self.source_signature}) + '\n')
+            for record in self.families:
+                fh.write(json.dumps(list(record)) + '\n')
+
+    @classmethod
+    def for_file(cls, hog_file, index_file=None):
+        """  Get the :obj:`FamilyIndex` of an OrthoXML file: the sidecar index is loaded if it exists and is up to
+        date, otherwise the index is built and stored in the sidecar file.
+
+            Args:
+                | hog_file (:obj:`str`): path to the OrthoXML file.
+                | index_file (:obj:`str`, optional): path to the sidecar index file. Defaults to hog_file + '.famidx'.
+
+            Returns:
+                :obj:`FamilyIndex`
+        """
+
+        if index_file is None:
+            index_file = str(hog_file) + cls.SUFFIX
+
+        if os.path.exists(index_file):
+            try:
+                index = cls.load(index_file, hog_file)
+            except (ValueError, KeyError, TypeError, OSError) as e:
+                logger.warning('Cannot use family index {}: {}'.format(index_file, e))
+            else:
+                if index.is_up_to_date():
+                    return index
+                logger.info('Family index {} is outdated, rebuilding it.'.format(index_file))
+
+        index = cls.build(hog_file)
+        index.save(index_file)
+        return index
+
+    def is_up_to_date(self):
+        """ Return True if the indexed file has not changed (size and modification time) since the index was built."""
+        return self.source_signature == _stat_signature(self.hog_file)
+
+    def is_index_of(self, hog_file):
+        """ Return True if this index was built from the given OrthoXML file."""
+        try:
+            return os.path.samefile(self.hog_file, hog_file)
+        except OSError:
+            return os.path.abspath(self.hog_file) == os.path.abspath(hog_file)
+
+    # ... QUERIES ... #
+
+    def get_family(self, hog_id):
+        """  Get the :obj:`FamilyRecord` of the top-level family with the given id.
+
+            Raises:
+                KeyError: if no family has this id.
+        """
+        if self._by_id is None:
+            self._by_id = {record.hog_id: record for record in self.families}
+        return self._by_id[str(hog_id)]
+
+    def get_families_by_gene(self, gene_ids):
+        """  Get the :obj:`FamilyRecord` of the families containing the given gene unique ids (genes that don't
+        belong to any family are ignored).
+
+            Returns:
+                list of :obj:`FamilyRecord` in file order.
+        """
+        if self._by_gene is None:
+            self._by_gene = {}
+            for pos, record in enumerate(self.families):
+                for gene_id in record.gene_ids:
+                    self._by_gene[gene_id] = pos
+        positions = {self._by_gene[g] for g in gene_ids if g in self._by_gene}
+        return [self.families[pos] for pos in sorted(positions)]
+
+    def apply_filter(self, filter_object, parser_backend='etree'):
+        """  Resolve a :obj:`pyham.ham.ParserFilter` with the index instead of a full scan of the file. Only the
+        header is tokenized, and only if the filter contains gene ids (to map them to gene unique ids).
+
+        This fills filter_object.geneUniqueId and filter_object.hogsId as
+        :obj:`pyham.ham.ParserFilter.buildFilter` does.
+
+            Args:
+                | filter_object (:obj:`pyham.ham.ParserFilter`): filter to resolve.
+                | parser_backend (:obj:`str`, optional): XML parser backend, 'etree' or 'lxml'. Defaults to 'etree'.
+
+            Returns:
+                list of the selected :obj:`FamilyRecord` in file order.
+        """
+
+        from .parsers import FilterOrthoXMLParser, create_xml_parser
+
+        matched_genes = set()
+        if filter_object.GeneIntId_filter or filter_object.GeneExtId_filter:
+            factory = FilterOrthoXMLParser(filter_object)
+            parser = create_xml_parser(factory, parser_backend)
+            for chunk in self.iter_chunks([]):
+                parser.feed(chunk)
+            parser.close()
+            matched_genes = set(factory.geneUniqueId)
+
+        selected = {record.offset: record for record in self.get_families_by_gene(matched_genes)}
+        for hog_id in filter_object.HOGId_filter:
+            try:
+                record = self.get_family(hog_id)
+            except KeyError:
+                continue
+            selected[record.offset] = record
+        families = [selected[offset] for offset in sorted(selected)]
+
+        filter_object.hogsId = {record.hog_id for record in families}
+        filter_object.geneUniqueId = matched_genes.union(*(record.gene_ids for record in families))
+        return families
+
+    # ... READING ... #
+
+    def iter_chunks(self, families, with_header=True, with_tail=True):
+        """  Yield the chunks of bytes of a valid OrthoXML document made of the header, the given families and
+        the closing tags. Uncompressed files are memory-mapped and the chunks are zero-copy views on them (only
+        valid until the next chunk is requested).
+
+            Args:
+                | families (:obj:`list`): list of :obj:`FamilyRecord` to read, in file order.
+                | with_header (:obj:`Boolean`, optional): whether to yield the header. Defaults to True.
+                | with_tail (:obj:`Boolean`, optional): whether to yield the closing tags. Defaults to True.
+        """
+
+        if str(self.hog_file).endswith('.gz'):
+            yield from self._iter_chunks_gzip(families, with_header, with_tail)
+            return
+
+        with open(self.hog_file, 'rb') as fh:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                with memoryview(mm) as view:
+                    for start in range(0, self.header_end if with_header else 0, self.BLOCK_SIZE):
+                        with view[start:min(start + self.BLOCK_SIZE, self.header_end)] as chunk:
+                            yield chunk
+                    for record in families:
+                        with view[record.offset:record.offset + record.length] as chunk:
+                            yield chunk
+                    if with_tail:
+                        with view[self.tail_offset:] as chunk:
+                            yield chunk
+            finally:
+                readers.close_mapping(mm)
+
+    def _iter_chunks_gzip(self, families, with_header, with_tail):
+        with gzip.open(self.hog_file, 'rb') as fh:
+            remaining = self.header_end if with_header else 0
+            while remaining > 0:
+                block = fh.read(min(self.BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                yield block
+            for record in families:
+                # forward seeks only: the gzip stream is decompressed once, but skipped families aren't tokenized.
+                fh.seek(record.offset)
+                yield fh.read(record.length)
+            if with_tail:
+                fh.seek(self.tail_offset)
+                yield fh.read()
+
+    def __len__(self):
+        return len(self.families)
@@ -1,4 +1,5 @@
 import abc
+from collections.abc import Mapping
 from ete4 import Tree
 
 
@@ -15,10 +16,18 @@ class Genome(metaclass=abc.ABCMeta):
     """
 
     def __init__(self):
-        self.genes = []
+        self._genes = []
         self.taxon = None
         self.name = None
 
+    @property
+    def genes(self):
+        return self._genes
+
+    @genes.setter
+    def genes(self, genes):
+        self._genes = genes
+
     def add_gene(self, gene):
 
         """  
@@ -38,7 +47,7 @@ class Genome(metaclass=abc.ABCMeta):
                             .format(AbstractGene.__name__,
                                     type(gene).__name__))
 
-        self.genes.append(gene)
+        self._genes.append(gene)
         gene.set_genome(self)
 
     def set_taxon(self, taxon):
@@ -77,34 +86,76 @@ class AncestralGenome(Genome):
     AncestralGenome class representing ancestral genomes.
 
     Attributes:
-        ancestral_clustering (dict): a dictionary that map each of this ancestral genome HOGs to its list of descendant
-        extant genes.
+        ancestral_clustering (:obj:`AncestralClustering`): mapping of each of this ancestral genome HOGs to its
+        descendant extant genes.
 
     """
 
     def __init__(self):
         super(AncestralGenome, self).__init__()
         self.ancestral_clustering = None
+        # HOGs with implicit levels at this genome (some may have been materialized since), see
+        # pyham.parsers.MissingLevelBuilder.
+        self._implicit_hogs = []
+
+    @property
+    def genes(self):
+        if self._implicit_hogs:
+            # create the HOGs of this level that were left implicit while parsing.
+            hogs, self._implicit_hogs = self._implicit_hogs, []
+            for hog in hogs:
+                hog.materialize_missing_levels()
+        return self._genes
+
+    @genes.setter
+    def genes(self, genes):
+        self._genes = genes
 
     def get_ancestral_clustering(self):
 
         """ Lazy getter of the ancestral_clustering attribute.
 
             Returns:
-                :obj:`dict`.
+                :obj:`AncestralClustering`.
 
         """
 
         if self.ancestral_clustering is None:
-            self.ancestral_clustering = {}
-            for hog in self.genes:
-                self.ancestral_clustering[hog] = hog.get_all_descendant_genes()
+            self.ancestral_clustering = AncestralClustering(self)
         return self.ancestral_clustering
 
     def get_number_genes(self):
         return len(self.genes)
 
 
+class AncestralClustering(Mapping):
+
+    """
+    Read-only mapping of the HOGs of an :obj:`AncestralGenome` to their descendant extant genes. Nothing is stored per
+    HOG: the genes of each family are listed once in pre-order by its :obj:`pyham.abstractgene.Family`, for all the
+    genomes, and the genes of a HOG are a :obj:`pyham.abstractgene.GeneSlice` of them (see
+    :obj:`pyham.abstractgene.HOG.get_descendant_genes_view`).
+
+    Attributes:
+        genome (:obj:`AncestralGenome`): the clustered genome.
+
+    """
+
+    def __init__(self, genome):
+        self.genome = genome
+
+    def __getitem__(self, hog):
+        if getattr(hog, 'genome', None) is not self.genome:
+            raise KeyError(hog)
+        return hog.get_descendant_genes_view()
+
+    def __iter__(self):
+        return iter(self.genome.genes)
+
+    def __len__(self):
+        return len(self.genome.genes)
+
+
 class ExtantGenome(Genome):
 
     """  
@@ -1,16 +1,25 @@
-import gzip
 import re
+import os
+import json
+import dataclasses
 from xml.etree.ElementTree import XMLParser
 from . import taxonomy as tax
 from .genome import Genome,AncestralGenome, ExtantGenome
 from . import parsers
+from . import parallel
 from . import mapper
 from . import abstractgene
 from . import id_formats
 from .TreeProfile import TreeProfile
+from .family_index import FamilyIndex
+from . import readers
+from . import columnar
 import logging
 import copy
-import io
+import contextlib
+import gc
+import numpy as np
+from collections import defaultdict
 
 
 
@@ -67,30 +76,32 @@ class ParserFilter(object):
                 """
         self.GeneIntId_filter = self.GeneIntId_filter | set(map(lambda x: str(x), list_id))
 
-    def buildFilter(self, file_object, type_hog_file="orthoxml"):
+    def buildFilter(self, file_object, type_hog_file="orthoxml", parser_backend='etree'):
         """ This function will use the FilterOrthoXMLParser with the *_filter queries to build geneUniqueId and
         hogsId.
 
         Args:
             | hog_file (:obj:`str`): Path to the file that contained the HOGs information.
             | type_hog_file (:obj:`str`):  File type of the hog_file. Can be "orthoxml or "hdf5". Defaults to "orthoxml".
+            | parser_backend (:obj:`str`): XML parser backend, 'etree' or 'lxml'. Defaults to 'etree'.
         """
 
         if type_hog_file == "orthoxml":
-            self.geneUniqueId, self.hogsId = self._filter_hogs_and_genes(file_object)
+            self.geneUniqueId, self.hogsId = self._filter_hogs_and_genes(file_object, parser_backend=parser_backend)
         elif type_hog_file == "hdf5":
             pass
 
         else:
             raise TypeError("Invalid type of hog file.")
 
-    def _filter_hogs_and_genes(self, file_object):
+    def _filter_hogs_and_genes(self, file_object, parser_backend='etree'):
 
         """ This function collect from an orthoxml file all data that is required to build Ham object based this filter
             object.
 
             Args:
-                | file_object (:obj:`FileObject`): File Object of the orthoxml to parse.
+                | file_object (:obj:`pyham.readers.BlockReader`): blocks of the orthoxml to parse.
+                | parser_backend (:obj:`str`): XML parser backend, 'etree' or 'lxml'. Defaults to 'etree'.
 
             Returns:
                 | :obj:`set` of gene unique ids, :obj:`set` of top level hog id.
@@ -98,10 +109,15 @@ class ParserFilter(object):
         """
 
         factory_filter = parsers.FilterOrthoXMLParser(self)
-        parser_filter = XMLParser(target=factory_filter)
+        parser_filter = parsers.create_xml_parser(factory_filter, parser_backend)
 
-        for line in file_object:
-            parser_filter.feed(line)
+        for block in file_object:
+            parser_filter.feed(block)
+            if factory_filter.done:
+                # every queried hog and gene has been found
+                break
+        else:
+            parser_filter.close()
 
         return set(factory_filter.geneUniqueId), set(factory_filter.hogsId)
 
@@ -119,19 +135,25 @@ class Ham(object):
         | HOGMaps (:obj:`dict`): Dictionary that map a :obj:`frozenset` of a pair of genomes to its :obj:`pyham.mapper.HOGsMap`.
         | filter_obj (:obj:`pyham.pyham.ParserFilter`): :obj:`ParserFilter` used during the instanciation of Ham. Defaults to None.
         | taxonomy: (:obj:`pyham.mapper.Taxonomy`): :obj:`pyham.pyham.Taxonomy` build and used by :obj:`pyham.pyham.Ham` instance.
-        | orthoXML_as_string (:obj:`Bool`) If set to true, hog_file is a string of an orthoxml file. Defaults to False.
+        | orthoXML_as_string (:obj:`Bool`) If set to true, hog_file is a string of an orthoxml file (always set for
+        bytes-like hog_file). Defaults to False.
+        | family_index (:obj:`pyham.family_index.FamilyIndex`): byte-offset index of the families of hog_file if one was requested, else None.
 
     """
 
     def __init__(self, tree_file=None, hog_file=None, type_hog_file="orthoxml", filter_object=None, use_internal_name=False,\
                  orthoXML_as_string=False, tree_format='newick_string', phyloxml_internal_name_tag='taxonomy_scientific_name', \
                  phyloxml_leaf_name_tag='taxonomy_scientific_name', use_data_from=None, query_database=None,
-                 species_resolve_mode=None, with_parser_progress=False, fail_fast=False, id_schema='auto'):
+                 species_resolve_mode=None, with_parser_progress=False, fail_fast=False, id_schema='auto',
+                 single_pass=False, family_index=None, processes=1, streaming=False, parser_backend='etree',
+                 lazy_missing_levels=False, level_cache_size=1 << 14, gc_freeze=False, internal_name_scheme='concat'):
         """
 
         Args:
             | tree_file (:obj:`str`): Path to the file that contained the taxonomy information.
-            | hog_file (:obj:`str`): Path to the file that contained the HOGs information.
+            | hog_file (:obj:`str`): Path to the file that contained the HOGs information, or the orthoxml document
+            itself as :obj:`str` (with orthoXML_as_string) or as :obj:`bytes`, :obj:`bytearray` or :obj:`memoryview`
+            (read without any copy).
             | type_hog_file (:obj:`str`, optional): File type of the hog_file. Can be "orthoxml or "hdf5". Defaults to "orthoxml".
             | filter_object (:obj:`pyham.pyham.ParserFilter`, optional): :obj:`pyham.pyham.ParserFilter` used during the instantiation of pyham.pyham.Ham. Defaults to None.
             | use_internal_name (:obj:`Boolean`, optional): Set to decide to use or not the internal naming of the given taxonomy. This should be set to False when support values are provided in the newick. Defaults to False.
@@ -154,9 +176,70 @@ class Ham(object):
             the species tree implies but the file doesn't explicitly encode. Defaults to 'auto', which
             samples the first few families of the file to detect the scheme automatically. The resolved
             value is available afterwards as `self.id_schema`.
+            | single_pass (:obj:`Boolean`, optional) if True, the orthoxml file is read only once: filtering,
+            id scheme detection and HOG construction are done in the same pass (see
+            :obj:`pyham.parsers.SinglePassOrthoXMLParser`). Families are buffered until they are complete, and
+            if a filter_object is given every event of the species header (one per species and gene) is buffered
+            until the end of the file, since the genes to keep are only known once all the families have been read:
+            the memory used then grows with the whole header. This is worth it for large (gzipped) files where each
+            extra read is expensive. Cannot be combined with streaming. Defaults to False.
+            | family_index (:obj:`pyham.family_index.FamilyIndex`, :obj:`str` or :obj:`Boolean`, optional) byte-offset
+            index of the top-level families of hog_file (see :obj:`pyham.family_index`). Either an index instance,
+            the path of its sidecar file or True to use (and build if missing or outdated) hog_file + '.famidx'.
+            An index instance must be the one of hog_file (else a ValueError is raised), it is rebuilt in memory if
+            it is outdated.
+            When a filter_object is given, the filter is resolved with the index and only the header and the
+            selected families are parsed; this takes precedence over single_pass. Defaults to None.
+            | processes (:obj:`int`, optional) number of processes used to build the HOGs. If greater than 1, the
+            families are split in chunks parsed by worker processes (see :obj:`pyham.parallel`); this requires a
+            tree_file and an orthoxml file (not a string), and uses family_index if given (otherwise the index is
+            built in memory, which costs an extra scan of the file). Defaults to 1.
+            | streaming (:obj:`Boolean`, optional) if True, only the header (genomes and genes) is parsed during the
+            instantiation and the families are built one at a time by :obj:`Ham.iter_families`, so that the HOGs of
+            a single family are kept in memory at a time. The genomes and every Gene of the header stay in
+            extant_gene_map for the whole analysis: the memory used is that of the header plus the largest family,
+            not of the largest family alone. top_level_hogs stays empty and the methods relying on it can't be used. Cannot be combined with processes > 1. Defaults to False.
+            | parser_backend (:obj:`str`, optional) XML parser driving the orthoxml parsers: 'etree' for the
+            :obj:`xml.etree.ElementTree.XMLParser` or 'lxml' for libxml2, which also accepts huge text nodes and
+            deeply nested files (see :obj:`pyham.parsers.LxmlTargetParser`). Both build the same HOGs without
+            keeping any element tree in memory. Defaults to 'etree'.
+            | lazy_missing_levels (:obj:`Boolean`, optional) if True, the HOGs of the levels implied by the species
+            tree between a HOG and its children but not encoded in the file are only recorded while parsing, and
+            created the first time a query needs them (access to the children or parent of a HOG, get_at_level,
+            HOGsMap, AncestralGenome.genes).
+            This spares most of these HOGs when the species tree is finely resolved and only a few levels are
+            queried. The order of AncestralGenome.genes may then differ. Cannot be combined with processes > 1.
+            Defaults to False.
+            | level_cache_size (:obj:`int`, optional) maximum number of ancestral level resolutions (claimed level and
+            children genomes of an orthologGroup) cached while parsing, 0 disables the cache (see
+            :obj:`Ham.get_level_cache_info`). Defaults to 16384.
+            | gc_freeze (:obj:`Boolean`, optional) if True, once built, the HOGs, genes and genomes are moved to the
+            permanent generation of the garbage collector (:func:`gc.freeze`), so that its later collections and the
+            memory pages of forked worker processes leave them untouched. The collector is paused while they are
+            built in any case. Frozen objects are only collected after a call to :func:`gc.unfreeze`. Defaults to
+            False.
+            | internal_name_scheme (:obj:`str`, optional) names generated for the internal nodes of the species tree
+            when use_internal_name is False: 'concat' joins the names of the children with '/' (the root is named
+            after all the species), 'compact' names them 'clade_' followed by a digest of the names of their
+            children (see :obj:`pyham.taxonomy.name_internal_nodes`), which keeps the names short for large trees.
+            The taxa and ancestral genomes can still be searched by their concatenated name. Defaults to 'concat'.
         """
         self.with_parser_progress = with_parser_progress
         self.fail_fast = fail_fast
+        self.single_pass = single_pass
+        self.processes = processes
+        self.streaming = streaming
+        self.lazy_missing_levels = lazy_missing_levels
+        self.level_cache = parsers.LevelResolutionCache(level_cache_size)
+
+        if parser_backend not in parsers.PARSER_BACKENDS:
+            raise TypeError("{} is not a valid option for parser_backend. Available options: {}."
+                            .format(parser_backend, ', '.join(parsers.PARSER_BACKENDS)))
+        self.parser_backend = parser_backend
+
+        if internal_name_scheme not in tax.INTERNAL_NAME_SCHEMES:
+            raise TypeError("{} is not a valid option for internal_name_scheme. Available options: {}."
+                            .format(internal_name_scheme, ', '.join(tax.INTERNAL_NAME_SCHEMES)))
 
         if id_schema != 'auto' and id_schema not in id_formats.SCHEMES:
             raise TypeError("{} is not a valid option for id_schema. Available options: 'auto', {}."
@@ -227,9 +310,9 @@ class Ham(object):
             self.hog_file_type = type_hog_file
             self.orthoXML_as_string = orthoXML_as_string
 
-        if self.orthoXML_as_string == True:
-            self.hog_file = self.hog_file.encode()
-            self.hog_file = self.hog_file.decode('utf-8')
+        if isinstance(self.hog_file, readers.BYTES_LIKE):
+            # the orthoxml document itself, read without any copy.
+            self.orthoXML_as_string = True
 
         # Filtering
         if isinstance(filter_object, ParserFilter) or filter_object is None:
@@ -239,6 +322,33 @@ class Ham(object):
                             .format(ParserFilter.__name__,
                                     type(filter_object).__name__))
 
+        if self.processes > 1 and (self.orthoXML_as_string or self.hog_file_type != "orthoxml"):
+            raise TypeError("processes > 1 can only be used with an orthoxml file.")
+        if self.processes > 1 and self.streaming:
+            raise TypeError("processes > 1 cannot be used in streaming mode.")
+        if self.processes > 1 and self.lazy_missing_levels:
+            raise TypeError("processes > 1 cannot be used with lazy_missing_levels.")
+        if self.single_pass and self.streaming:
+            raise TypeError("single_pass cannot be used in streaming mode, which only reads the header during the "
+                             "instantiation.")
+
+        # Family index
+        if family_index is None or family_index is False:
+            self.family_index = None
+        elif self.orthoXML_as_string or self.hog_file_type != "orthoxml":
+            raise TypeError("family_index can only be used with an orthoxml file.")
+        elif isinstance(family_index, FamilyIndex):
+            if not family_index.is_index_of(self.hog_file):
+                raise ValueError("family_index is the index of {}, not of {}.".format(family_index.hog_file,
+                                                                                    self.hog_file))
+            if not family_index.is_up_to_date():
+                logger.info('Family index of {} is outdated, rebuilding it.'.format(self.hog_file))
+                family_index = FamilyIndex.build(self.hog_file)
+            self.family_index = family_index
+        else:
+            self.family_index = FamilyIndex.for_file(self.hog_file,
+                                                     None if family_index is True else family_index)
+
         # Taxonomy
 
         accepted_tag_phyloxml = ['clade_name', 'taxonomy_scientific_name', 'taxonomy_code']
@@ -247,7 +357,8 @@ class Ham(object):
             raise TypeError("{} is an invalid type phyloxml tag name")
         self.species_resolve_mode = species_resolve_mode
         if self.tree_file is not None:
-            self.taxonomy = tax.Taxonomy(self.tree_file, tree_format=tree_format, use_internal_name=use_internal_name, phyloxml_leaf_name_tag=phyloxml_leaf_name_tag, phyloxml_internal_name_tag=phyloxml_internal_name_tag)
+            self.taxonomy = tax.Taxonomy(self.tree_file, tree_format=tree_format, use_internal_name=use_internal_name, phyloxml_leaf_name_tag=phyloxml_leaf_name_tag, phyloxml_internal_name_tag=phyloxml_internal_name_tag,
+                                         internal_name_scheme=internal_name_scheme)
         else:
             self.taxonomy = None
         logger.info('Build taxonomy: completed.')
@@ -257,14 +368,65 @@ class Ham(object):
         self.extant_gene_map = None
         self.external_id_mapper = None
         self.HOGMaps = {}
+        self._stream_families = None
+        self._gene_families = None
+        self._family_genes = {}
+        self._family_changes = None
 
         # Parsing of data
-        if self.hog_file_type == "orthoxml":
+        if self.hog_file_type == "orthoxml" and (self.processes > 1 or (self.family_index is not None and self.filter_obj is not None)):
+
+            # The index resolves the filter and gives the byte range of the selected families: only the header and
+            # these families are parsed.
+            index = self.family_index if self.family_index is not None else FamilyIndex.build(self.hog_file)
+            families = index.families
+            if self.filter_obj is not None:
+                families = index.apply_filter(self.filter_obj, parser_backend=self.parser_backend)
+                logger.info('Filtering of Orthoxml with the family index done: {} top level hogs and {} extant genes will be extract.'.format(
+                                len(self.filter_obj.hogsId),
+                                len(self.filter_obj.geneUniqueId)))
+
+            if self._requested_id_schema == 'auto':
+                sniffer = parsers.IDSchemeSniffer()
+                sniff_parser = XMLParser(target=sniffer)
+                sniff_parser.feed('<orthoXML xmlns="http://orthoXML.org/2011/"><groups>')
+                for chunk in index.iter_chunks(index.families, with_header=False, with_tail=False):
+                    sniff_parser.feed(chunk)
+                    if sniffer.done:
+                        break
+                self.id_schema = id_formats.detect_id_scheme(sniffer.samples)
+                logger.info('Auto-detected HOG id scheme: {}'.format(self.id_schema))
+
+            if self.processes > 1:
+                self.top_level_hogs, self.extant_gene_map, self.external_id_mapper, conflicts = \
+                    parallel.parse_families_in_parallel(self, index, families, self.processes,
+                                                        header_filter=self.filter_obj)
+                self._raise_taxonomic_conflicts(conflicts)
+            elif self.streaming:
+                self._stream_families = families
+                self._build_header(index.iter_chunks([]))
+            else:
+                self.top_level_hogs, self.extant_gene_map, self.external_id_mapper = self._build_hogs_and_genes(
+                    index.iter_chunks(families), filter_object=self.filter_obj)
+
+            logger.info('Parse Orthoxml: {} top level hogs and {} extant genes extract.'.format(len(self.top_level_hogs),len(self.extant_gene_map)))
+
+        elif self.hog_file_type == "orthoxml" and self.single_pass:
+
+            with self._open_hog_file() as orthoxml_file:
+                # filter, id scheme sniffer and HOG/Gene builder are all fed from the same read of the file.
+                self.top_level_hogs, self.extant_gene_map, self.external_id_mapper = self._build_hogs_and_genes(
+                    orthoxml_file, filter_object=self.filter_obj, single_pass=True)
+
+            logger.info('Parse Orthoxml in a single pass: {} top level hogs and {} extant genes extract.'.format(
+                len(self.top_level_hogs), len(self.extant_gene_map)))
+
+        elif self.hog_file_type == "orthoxml":
 
             #  If filter_object specified, pyham parse a first time to collect required information
             if self.filter_obj is not None:
                 with self._open_hog_file() as orthoxml_file:
-                    self.filter_obj.buildFilter(orthoxml_file, self.hog_file_type)
+                    self.filter_obj.buildFilter(orthoxml_file, self.hog_file_type, parser_backend=self.parser_backend)
 
                 logger.info('Filtering Indexing of Orthoxml done: {} top level hogs and {} extant genes will be extract.'.format(
                                 len(self.filter_obj.hogsId),
@@ -277,25 +439,23 @@ class Ham(object):
                 # <species>/<taxonomy> can dwarf <groups> in size (e.g. for large exports with
                 # a big embedded taxonomy); skip straight to <groups> via a cheap text search
                 # instead of XML-parsing that whole preamble just to sample a few HOG ids.
-                sniff_parser.feed('<orthoXML xmlns="http://orthoXML.org/2011/">')
                 with self._open_hog_file() as orthoxml_file:
-                    seen_groups = False
-                    for line in orthoxml_file:
-                        if not seen_groups:
-                            idx = line.find('<groups')
-                            if idx == -1:
-                                continue
-                            line = line[idx:]
-                            seen_groups = True
-                        sniff_parser.feed(line)
+                    for block in self._iter_groups_section(orthoxml_file):
+                        sniff_parser.feed(block)
+                        # a memory view on the file can't outlive the reader.
+                        del block
                         if sniffer.done:
                             break
                 self.id_schema = id_formats.detect_id_scheme(sniffer.samples)
                 logger.info('Auto-detected HOG id scheme: {}'.format(self.id_schema))
 
             with self._open_hog_file() as orthoxml_file:
-                # This is the actual parser to build HOG/Gene and related Genomes.
-                self.top_level_hogs, self.extant_gene_map, self.external_id_mapper = self._build_hogs_and_genes(orthoxml_file, filter_object=self.filter_obj)
+                if self.streaming:
+                    # families are built on demand by iter_families
+                    self._build_header(self._iter_header(orthoxml_file))
+                else:
+                    # This is the actual parser to build HOG/Gene and related Genomes.
+                    self.top_level_hogs, self.extant_gene_map, self.external_id_mapper = self._build_hogs_and_genes(orthoxml_file, filter_object=self.filter_obj)
 
             logger.info('Parse Orthoxml: {} top level hogs and {} extant genes extract.'.format(len(self.top_level_hogs),len(self.extant_gene_map)))
 
@@ -308,10 +468,76 @@ class Ham(object):
         else:
             raise TypeError("Invalid type of hog file")
 
+        if gc_freeze:
+            # the garbage of the build is dropped first, it would never be collected once frozen.
+            gc.collect()
+            gc.freeze()
+
         logger.info(
             'Set up Ham analysis: ready to go with {} hogs founded within {} species.'.format(
                 len(self.top_level_hogs), len(self.taxonomy.leaves)))
 
+    @staticmethod
+    def validate(tree_file=None, hog_file=None, sink=None, tree_format='newick_string', use_internal_name=False,
+                 orthoXML_as_string=False, phyloxml_internal_name_tag='taxonomy_scientific_name',
+                 phyloxml_leaf_name_tag='taxonomy_scientific_name', parser_backend='etree',
+                 level_cache_size=1 << 14, with_parser_progress=False, internal_name_scheme='concat'):
+        """  Check that the levels claimed by the HOGs of an orthoxml file (TaxRange/taxid properties) are consistent
+        with the species tree, without building the Ham object: only the checks done while building the HOGs are
+        run, and a family is released as soon as it is checked. Each :obj:`pyham.abstractgene.TaxonomicConflict`
+        is written to sink as soon as it is found.
+
+            Args:
+                | tree_file, hog_file, tree_format, use_internal_name, orthoXML_as_string, phyloxml_internal_name_tag,
+                phyloxml_leaf_name_tag, parser_backend, level_cache_size, with_parser_progress,
+                internal_name_scheme: see :obj:`Ham`.
+                | sink (optional): path or text file object to which each conflict is written as one JSON line.
+                Defaults to None (the conflicts are returned in the report).
+
+            Returns:
+                :obj:`pyham.abstractgene.ValidationReport`
+        """
+
+        if hog_file is None:
+            raise TypeError("Argument hog_file:{} should not be empty.".format(hog_file))
+        if parser_backend not in parsers.PARSER_BACKENDS:
+            raise TypeError("{} is not a valid option for parser_backend. Available options: {}."
+                            .format(parser_backend, ', '.join(parsers.PARSER_BACKENDS)))
+        if internal_name_scheme not in tax.INTERNAL_NAME_SCHEMES:
+            raise TypeError("{} is not a valid option for internal_name_scheme. Available options: {}."
+                            .format(internal_name_scheme, ', '.join(tax.INTERNAL_NAME_SCHEMES)))
+
+        taxonomy = None
+        if tree_file is not None:
+            taxonomy = tax.Taxonomy(tree_file, tree_format=tree_format, use_internal_name=use_internal_name,
+                                    phyloxml_leaf_name_tag=phyloxml_leaf_name_tag,
+                                    phyloxml_internal_name_tag=phyloxml_internal_name_tag,
+                                    internal_name_scheme=internal_name_scheme)
+
+        with contextlib.ExitStack() as stack:
+            conflicts = None
+            if sink is None:
+                conflicts = []
+                on_conflict = conflicts.append
+            else:
+                if isinstance(sink, (str, os.PathLike)):
+                    sink = stack.enter_context(open(sink, 'w'))
+                on_conflict = lambda conflict: sink.write(json.dumps(dataclasses.asdict(conflict)) + '\n')
+
+            factory = parsers.ConflictCheckParser(None, on_conflict, with_progress=with_parser_progress,
+                                                  taxonomy=taxonomy,
+                                                  level_cache=parsers.LevelResolutionCache(level_cache_size))
+            parser = parsers.create_xml_parser(factory, parser_backend)
+            in_memory = orthoXML_as_string or isinstance(hog_file, readers.BYTES_LIKE)
+            with readers.open_hog_file(hog_file, in_memory=in_memory) as orthoxml_file:
+                for block in orthoxml_file:
+                    parser.feed(block)
+            parser.close()
+
+        logger.info('Validation of the orthoxml: {} taxonomic conflicts found in {} families.'.format(
+            factory.n_conflicts, factory.families))
+        return abstractgene.ValidationReport(factory.families, factory.hogs, factory.n_conflicts, conflicts)
+
     # ... TOOLS ... #
 
     def compare_genomes_vertically(self, genome1, genome2):
@@ -514,10 +740,12 @@ class Ham(object):
 
     def get_hog_by_id(self, hog_id):
 
-        """ Get the top level :obj:`HOG` that match the hog id query.
+        """ Get the :obj:`HOG` that match the hog id query: a top level HOG id, or a nested HOG id made of the id of
+        its family, a sub-HOG part and/or a "_<taxid>" suffix (e.g. "HOG:0402997.2b.1a_47424"). Nested ids are
+        looked up in the id index of their family, built the first time one of its ids is queried.
 
             Args:
-                hog_id (:obj:`str` or :obj:`int`): Top level HOG id.
+                hog_id (:obj:`str` or :obj:`int`): HOG id.
 
             Returns:
                 :obj:`pyham.abstractgene.HOG`
@@ -564,6 +792,28 @@ class Ham(object):
 
         raise KeyError(' Id {} cannot match any HOG Id.'.format(hog_id))
 
+    def get_hogs_by_ids(self, hog_ids):
+
+        """ Get the :obj:`HOG` of many HOG ids (top level or nested ones, see get_hog_by_id) in one call. The nested ids
+        are resolved through the id index of their family, built the first time one of its ids is queried.
+
+            Args:
+                hog_ids (iterable of :obj:`str` or :obj:`int`): HOG ids.
+
+            Returns:
+                :obj:`dict` mapping each id found (as given) to its :obj:`pyham.abstractgene.HOG` and :obj:`list` of
+                the ids that match no HOG, in query order.
+        """
+
+        hogs = {}
+        misses = []
+        for hog_id in hog_ids:
+            try:
+                hogs[hog_id] = self.get_hog_by_id(hog_id)
+            except KeyError:
+                misses.append(hog_id)
+        return hogs, misses
+
     def get_hog_by_gene(self, gene):
 
         """  Get the top level :obj:`HOG` that contain the query :obj:`pyham.abstractgene.Gene`. If the :obj:`pyham.abstractgene.Gene` is a singleton it will 
@@ -585,6 +835,62 @@ class Ham(object):
 
         raise KeyError("expect a '{}' as query, got {}".format(abstractgene.Gene, type(gene).__name__))
 
+    def get_families_for_genes(self, gene_ids):
+
+        """  Get the id of the top level :obj:`HOG` of many genes at once. The genes of all the families are looked up
+        by a binary search in sorted arrays (taken from a columnar snapshot, see :obj:`to_columnar`) built by the
+        first call. Once families have been modified (see :obj:`pyham.abstractgene.Family`), only these families are
+        taken again and the arrays merged anew.
+
+            Args:
+                gene_ids (array-like of :obj:`str` or :obj:`int`): unique ids of the genes.
+
+            Returns:
+                :obj:`numpy.ndarray` of :obj:`str` (dtype object) with the top level HOG id of each gene, None for
+                the singletons and the unknown ids.
+        """
+
+        if self._family_changes != abstractgene.Family.changes:
+            self._update_gene_families()
+        gene_keys, family_ids = self._gene_families
+
+        query = np.asarray(gene_ids).astype(str).ravel()
+        result = np.full(len(query), None, dtype=object)
+        if len(gene_keys) == 0:
+            return result
+        pos = np.minimum(np.searchsorted(gene_keys, query), len(gene_keys) - 1)
+        found = gene_keys[pos] == query
+        result[found] = family_ids[pos[found]]
+        return result
+
+    def _update_gene_families(self):
+        # the families not modified since their snapshot (same handle and epoch) keep their arrays.
+        outdated = []
+        for hog_id, top in self.top_level_hogs.items():
+            snapshot = self._family_genes.get(hog_id)
+            family = top.get_family()
+            if snapshot is None or snapshot[0] is not family or snapshot[1] != family.epoch:
+                outdated.append((hog_id, top))
+
+        if outdated or self._gene_families is None:
+            forest = self.to_columnar(families=[top for _, top in outdated])
+            genes = np.flatnonzero(forest.is_gene)
+            family_rows = np.searchsorted(forest.roots, genes, side='right') - 1
+            family_ids = np.array(forest.id_strings + [None], dtype=object)[forest.ids[forest.roots[family_rows]]]
+            gene_keys = np.array(forest.id_strings, dtype=str)[forest.ids[genes]]
+            bounds = np.searchsorted(family_rows, np.arange(len(outdated) + 1))
+            for i, (hog_id, top) in enumerate(outdated):
+                family = top.get_family()
+                self._family_genes[hog_id] = (family, family.epoch, gene_keys[bounds[i]:bounds[i + 1]],
+                                              family_ids[bounds[i]:bounds[i + 1]])
+
+            snapshots = [self._family_genes[hog_id] for hog_id in self.top_level_hogs]
+            gene_keys = np.concatenate([np.array([], dtype=str)] + [snapshot[2] for snapshot in snapshots])
+            family_ids = np.concatenate([np.array([], dtype=object)] + [snapshot[3] for snapshot in snapshots])
+            order = np.argsort(gene_keys, kind='stable')
+            self._gene_families = (gene_keys[order], family_ids[order])
+        self._family_changes = abstractgene.Family.changes
+
     def get_list_top_level_hogs(self):
 
         """  Get the list of all the top level :obj:`pyham.abstractgene.HOG`.
@@ -607,8 +913,94 @@ class Ham(object):
 
         return self.top_level_hogs
 
+    def to_columnar(self, families=None, keep_objects=False):
+        """  Build a columnar snapshot of the HOG forest, where the HOGs and extant genes are rows of NumPy arrays
+        queried with vectorized operations (see :obj:`pyham.columnar.HOGForest`).
+
+            Args:
+                | families (iterable of :obj:`pyham.abstractgene.HOG`, optional): top level HOGs to snapshot, e.g.
+                :obj:`Ham.iter_families` in streaming mode. Defaults to all the top level HOGs.
+                | keep_objects (:obj:`Boolean`, optional): keep a reference to the object of each row. Defaults to
+                False.
+
+            Returns:
+                :obj:`pyham.columnar.HOGForest`
+        """
+
+        if families is None:
+            families = self.get_list_top_level_hogs()
+        return columnar.HOGForest(self.taxonomy, families, keep_objects=keep_objects)
+
+    def get_level_cache_info(self):
+        """  Get the statistics of the cache of ancestral level resolutions used while parsing the orthoxml.
+
+            Returns:
+                :obj:`pyham.parsers.CacheInfo` (hits, misses, maxsize, currsize).
+        """
+
+        return self.level_cache.cache_info()
+
     # ___ ExtantGenome ___ #
 
+    def iter_families(self):
+        """  Iterate over the top level :obj:`pyham.abstractgene.HOG` of this Ham analysis.
+
+        In streaming mode, each family is built when the previous one has been consumed: the file is parsed
+        incrementally and each top level HOG is yielded as soon as it is complete. Once the next family is
+        requested, the yielded one is removed from the ancestral genomes and its genes are detached from it, so a
+        family is only valid until the end of its iteration step. The same is done for the pending families when the
+        iteration is stopped early (break or close of the generator). Each call parses the groups section again.
+
+            Returns:
+                generator of top level :obj:`pyham.abstractgene.HOG`.
+
+            Raises:
+                TaxonomicConflictError: once all families have been yielded, if any conflict has been collected.
+        """
+
+        if not self.streaming:
+            yield from list(self.top_level_hogs.values())
+            return
+
+        factory = parsers.OrthoXMLParser(self, filterObject=self.filter_obj, with_progress=self.with_parser_progress,
+                                          fail_fast=self.fail_fast, id_schema=self.id_schema, streaming=True,
+                                          lazy_missing_levels=self.lazy_missing_levels)
+        # genomes and genes have been built from the header during the instantiation.
+        factory.extant_gene_map = self.extant_gene_map
+        parser = parsers.create_xml_parser(factory, self.parser_backend)
+
+        with contextlib.ExitStack() as stack:
+            if self._stream_families is not None:
+                parser.feed('<orthoXML xmlns="http://orthoXML.org/2011/"><groups>')
+                chunks = self.family_index.iter_chunks(self._stream_families, with_header=False)
+            else:
+                chunks = self._iter_groups_section(stack.enter_context(self._open_hog_file()))
+            # closed first: the memory views on the file held by chunks (and the last chunk) can't outlive the reader.
+            stack.enter_context(contextlib.closing(chunks))
+
+            hog = None
+            try:
+                for chunk in chunks:
+                    parser.feed(chunk)
+                    del chunk
+                    while factory.completed_families:
+                        hog = factory.completed_families.popleft()
+                        yield hog
+                        self._release_family(hog)
+                        hog = None
+                parser.close()
+            finally:
+                # also reached when the iteration is stopped early: release the yielded family, the ones already
+                # completed and the one being parsed.
+                if hog is not None:
+                    self._release_family(hog)
+                while factory.completed_families:
+                    self._release_family(factory.completed_families.popleft())
+                if factory.hog_stack and isinstance(factory.hog_stack[0], abstractgene.HOG):
+                    self._release_family(factory.hog_stack[0])
+
+        self._raise_taxonomic_conflicts(factory.taxonomic_conflicts)
+
     def get_list_extant_genomes(self):
 
         """  
@@ -634,10 +1026,9 @@ class Ham(object):
 
         """
 
-        for taxon in self.taxonomy.leaves:
-            if taxon.name == name:
-                if "genome" in taxon.props:
-                    return taxon.props['genome']
+        for taxon in self.taxonomy.nodes_by_attr(name=name):
+            if taxon in self.taxonomy.leaves and "genome" in taxon.props:
+                return taxon.props['genome']
 
         raise KeyError('No extant genomes match the query name: {}'.format(name))
 
@@ -713,7 +1104,7 @@ class Ham(object):
 
         genome_nodes = set([geno.taxon for geno in genome_set])
 
-        mrca_node = self.taxonomy.tree.common_ancestor(*genome_nodes)
+        mrca_node = self.taxonomy.get_mrca_taxnode(*genome_nodes)
 
         return self.get_ancestral_genome_by_taxon(mrca_node)
 
@@ -732,7 +1123,7 @@ class Ham(object):
 
         """
 
-        nodes_found = list(self.taxonomy.tree.search_nodes(name=name))
+        nodes_found = list(self.taxonomy.nodes_by_attr(name=name))
 
         if not nodes_found:
             raise KeyError('No node founded for the species name: {}'.format(name))
@@ -758,7 +1149,7 @@ class Ham(object):
 
         """
 
-        mrca = self.taxonomy.tree.common_ancestor(g1.taxon,g2.taxon)
+        mrca = self.taxonomy.get_mrca_taxnode(g1.taxon, g2.taxon)
 
         if g1.taxon == mrca:
             return g1, g2
@@ -808,21 +1199,81 @@ class Ham(object):
             return self.HOGMaps[f]
 
     def _open_hog_file(self):
-        """Return a context manager yielding a fresh, from-the-start file object for `self.hog_file`
-        (a `StringIO` if the orthoxml was given as a string, else a plain/gzip-decompressed file)."""
-        if self.orthoXML_as_string:
-            return io.StringIO(self.hog_file)
-        open_ = gzip.open if str(self.hog_file).endswith('.gz') else open
-        return open_(self.hog_file, 'rt')
+        """Return a fresh :obj:`pyham.readers.BlockReader` (a context manager iterating over blocks of str or
+        bytes) reading `self.hog_file` from the start."""
+        return readers.open_hog_file(self.hog_file, in_memory=self.orthoXML_as_string)
+
+    @staticmethod
+    def _iter_header(file_object):
+        """Yield the blocks of an orthoxml file object up to its <groups> element (excluded), followed by the closing
+        tag of the orthoXML root element so that they make a complete document."""
+        groups = yield from readers.iter_until(iter(file_object), '<groups')
+        if groups is not None:
+            closing = '</orthoXML>' if isinstance(groups, str) else b'</orthoXML>'
+            # a memory view on the file can't outlive the reader.
+            del groups
+            yield closing
+
+    @staticmethod
+    def _iter_groups_section(file_object):
+        """Yield the <groups> element of an orthoxml file object wrapped in an orthoXML root element.
+
+        <species>/<taxonomy> can dwarf <groups> in size (e.g. for large exports with a big embedded taxonomy);
+        skip straight to <groups> via a cheap text search instead of XML-parsing that whole preamble."""
+        blocks = iter(file_object)
+        groups = readers.skip_until(blocks, '<groups')
+        if groups is not None:
+            root = '<orthoXML xmlns="http://orthoXML.org/2011/">'
+            yield root if isinstance(groups, str) else root.encode()
+            yield groups
+            del groups
+            yield from blocks
+
+    def _build_header(self, file_object):
+        """ Build the genomes and genes (and the taxonomy if not given) from the header of the orthoxml, used in
+        streaming mode. file_object must be a document without the families."""
+
+        factory = parsers.OrthoXMLParser(self, filterObject=self.filter_obj, with_progress=self.with_parser_progress,
+                                          fail_fast=self.fail_fast, id_schema=self.id_schema, streaming=True)
+        parser = parsers.create_xml_parser(factory, self.parser_backend)
+        with parsers.paused_gc():
+            for block in file_object:
+                parser.feed(block)
+            parser.close()
+
+        if self.taxonomy is None:
+            self.taxonomy = factory.taxonomy
+
+        self.top_level_hogs = {}
+        self.extant_gene_map = factory.extant_gene_map
+        self.external_id_mapper = factory.external_id_mapper
+
+    def _release_family(self, hog):
+        """ Remove a streamed family from the ancestral genomes and detach its genes so it can be collected."""
 
-    def _build_hogs_and_genes(self, file_object, filter_object):
+        released = defaultdict(set)
+        for sub_hog in hog.get_all_descendant_hogs():
+            released[sub_hog.genome].add(id(sub_hog))
+        for genome, hog_ids in released.items():
+            if genome is None:
+                # HOG of a family whose parsing was stopped before it got its ancestral genome.
+                continue
+            genome.genes[:] = [g for g in genome.genes if id(g) not in hog_ids]
+        for gene in hog.get_all_descendant_genes():
+            gene.parent = None
+            gene.arose_by_duplication = False
+
+    def _build_hogs_and_genes(self, file_object, filter_object, single_pass=False):
 
         """ This function build from an orthoxml file all data that is required to build this Ham object (using the Ham
         filter object).
 
             Args:
-                file_object (:obj:`FileObject`): File Object of the orthoxml to parse.
+                file_object (:obj:`pyham.readers.BlockReader`): blocks of the orthoxml to parse (or any iterable of
+                str/bytes chunks).
                 filter_object (:obj:`ParserFilter`): :obj:`ParserFilter` use by OrthoXMLParser.
+                single_pass (:obj:`Boolean`, optional): if True, the filter_object is built and the id scheme is
+                detected (if requested) during the same read. Defaults to False.
 
             Returns:
                 :obj:`set` of top level :obj:`HOG` , :obj:`dict` of unique id with their :obj:`Gene`, :obj:`dict` of
@@ -830,26 +1281,40 @@ class Ham(object):
 
         """
 
-        factory = parsers.OrthoXMLParser(self, filterObject=filter_object, with_progress=self.with_parser_progress,
-                                          fail_fast=self.fail_fast, id_schema=self.id_schema)
-        parser = XMLParser(target=factory)
+        factory = parsers.OrthoXMLParser(self, filterObject=None if single_pass else filter_object,
+                                          with_progress=self.with_parser_progress,
+                                          fail_fast=self.fail_fast, id_schema=self.id_schema,
+                                          lazy_missing_levels=self.lazy_missing_levels)
+        target = factory
+        if single_pass:
+            target = parsers.SinglePassOrthoXMLParser(factory, filterObject=filter_object,
+                                                      sniff_id_schema=self._requested_id_schema == 'auto')
+        parser = parsers.create_xml_parser(target, self.parser_backend)
 
-        for line in file_object:
-            parser.feed(line)
+        with parsers.paused_gc():
+            for block in file_object:
+                parser.feed(block)
+            parser.close()
 
-        if factory.taxonomic_conflicts:
-            # fail_fast=True would already have raised inside the parser itself; reaching here means
-            # fail_fast=False, so every conflict found across the whole file is reported together.
-            raise abstractgene.TaxonomicConflictError(
-                parsers.format_taxonomic_conflicts(factory.taxonomic_conflicts),
-                factory.taxonomic_conflicts,
-            )
+        if single_pass:
+            self.id_schema = target.id_schema
+
+        self._raise_taxonomic_conflicts(factory.taxonomic_conflicts)
 
         if self.taxonomy is None:
             self.taxonomy = factory.taxonomy
 
         return factory.toplevel_hogs, factory.extant_gene_map, factory.external_id_mapper
 
+    def _raise_taxonomic_conflicts(self, conflicts):
+        if conflicts:
+            # fail_fast=True would already have raised inside the parser itself; reaching here means
+            # fail_fast=False, so every conflict found across the whole file is reported together.
+            raise abstractgene.TaxonomicConflictError(
+                parsers.format_taxonomic_conflicts(conflicts),
+                conflicts,
+            )
+
     def _get_ancestral_genome_by_name(self, name):
 
         """  
@@ -863,7 +1328,7 @@ class Ham(object):
 
         """
 
-        nodes_found = list(self.taxonomy.tree.search_nodes(name=name))
+        nodes_found = list(self.taxonomy.nodes_by_attr(name=name))
 
         if len(nodes_found) == 1:
 
@@ -893,7 +1358,7 @@ class Ham(object):
 
         """
 
-        nodes_found = list(self.taxonomy.tree.search_nodes(name=kwargs['name']))
+        nodes_found = list(self.taxonomy.nodes_by_attr(name=kwargs['name']))
 
         if len(nodes_found) == 1:
 
@@ -984,6 +1449,6 @@ class Ham(object):
 
         genome_nodes = set([gen.taxon for gen in genome_set])
 
-        mrca_node = self.taxonomy.tree.common_ancestor(*genome_nodes)
+        mrca_node = self.taxonomy.get_mrca_taxnode(*genome_nodes)
 
         return self._get_ancestral_genome_by_taxon(mrca_node)
@@ -0,0 +1,192 @@
+"""Parse the top-level families of an OrthoXML file in worker processes.
+
+Once the species tree is known, top-level families are independent from each other. The families selected in a
+:obj:`pyham.family_index.FamilyIndex` are split into contiguous chunks of similar size in bytes and each chunk is
+parsed by a worker with its own copy of the :obj:`pyham.taxonomy.Taxonomy` (only the genes referenced by the chunk
+are built from the header). Meanwhile the parent process parses the header to build the extant genomes and genes.
+
+Workers send back their HOG forest pickled with persistent references: genomes, taxonomy nodes and extant genes are
+referred to by their position in the taxonomy or their unique id, and are bound to the parent's objects when
+unpickled. The state of the extant genes (parent HOG, duplication, LOFT id) and the HOGs added to each ancestral
+genome are merged in file order, so the result is the same as a sequential parse. The only exception are the
+duplication branch indices minted for paralogs without any real id (see
+:obj:`pyham.parsers.OrthoXMLParser._assign_duplication_branch_ids`), which are unique within their family but depend
+on the chunking.
+"""
+
+import concurrent.futures
+import io
+import logging
+import pickle
+
+from ete4 import Tree
+from tqdm import tqdm
+
+from . import abstractgene
+from .family_index import FamilyIndex
+from .genome import Genome
+
+logger = logging.getLogger(__name__)
+
+CHUNKS_PER_PROCESS = 4
+
+# pickled Taxonomy shared by all the tasks of a worker process, a fresh copy is unpickled for each chunk.
+_worker_taxonomy = None
+
+
+def split_families(families, n_chunks):
+    """  Split a list of :obj:`pyham.family_index.FamilyRecord` in at most n_chunks contiguous chunks of similar
+    size in bytes.
+
+        Returns:
+            list of list of :obj:`pyham.family_index.FamilyRecord`.
+    """
+    total = sum(record.length for record in families)
+    target = max(1, total // max(1, n_chunks))
+    chunks, current, size = [], [], 0
+    for record in families:
+        current.append(record)
+        size += record.length
+        if size >= target:
+            chunks.append(current)
+            current, size = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class _ForestPickler(pickle.Pickler):
+
+    def __init__(self, file, nodes):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._node_pos = {id(node): pos for pos, node in enumerate(nodes)}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, abstractgene.Gene):
+            return 'gene', obj.unique_id
+        if isinstance(obj, Genome):
+            return 'genome', self._node_pos[id(obj.taxon)]
+        if isinstance(obj, Tree):
+            return 'taxon', self._node_pos[id(obj)]
+        return None
+
+
+class _ForestUnpickler(pickle.Unpickler):
+
+    def __init__(self, file, ham_object, nodes, extant_gene_map):
+        super().__init__(file)
+        self._ham = ham_object
+        self._nodes = nodes
+        self._genes = extant_gene_map
+
+    def persistent_load(self, pid):
+        kind, key = pid
+        if kind == 'gene':
+            return self._genes[key]
+        if kind == 'genome':
+            return self._ham.taxonomy.get_genome_from_taxnode(self._nodes[key])
+        if kind == 'taxon':
+            return self._nodes[key]
+        raise pickle.UnpicklingError("unsupported persistent object: {}".format(pid))
+
+
+def _init_worker(taxonomy_blob):
+    global _worker_taxonomy
+    _worker_taxonomy = taxonomy_blob
+
+
+def _parse_chunk(hog_file, header_end, tail_offset, families, id_schema, fail_fast, parser_backend, level_cache_size):
+    from .ham import ParserFilter
+    from .parsers import LevelResolutionCache, OrthoXMLParser, create_xml_parser, paused_gc
+
+    taxonomy = pickle.loads(_worker_taxonomy)
+    # the filter is already resolved by the family index.
+    filter_object = ParserFilter()
+    filter_object.geneUniqueId = {g for record in families for g in record.gene_ids}
+    filter_object.hogsId = {record.hog_id for record in families}
+    factory = OrthoXMLParser(None, taxonomy=taxonomy, filterObject=filter_object, id_schema=id_schema,
+                             fail_fast=fail_fast, level_cache=LevelResolutionCache(level_cache_size))
+    parser = create_xml_parser(factory, parser_backend)
+    index = FamilyIndex(hog_file, header_end, tail_offset, families)
+    with paused_gc():
+        for chunk in index.iter_chunks(families):
+            parser.feed(chunk)
+        parser.close()
+
+    nodes = list(taxonomy.tree.traverse('preorder'))
+    ancestral_genes = [(pos, node.props['genome'].genes) for pos, node in enumerate(nodes)
+                       if not node.is_leaf and node.props.get('genome') is not None]
+    gene_states = {uid: gene.__getstate__() for uid, gene in factory.extant_gene_map.items()}
+
+    buffer = io.BytesIO()
+    _ForestPickler(buffer, nodes).dump(
+        (factory.toplevel_hogs, ancestral_genes, gene_states, factory.taxonomic_conflicts,
+         factory.level_cache.cache_info()))
+    return buffer.getvalue()
+
+
+def parse_families_in_parallel(ham_object, index, families, processes, header_filter=None):
+    """  Build the HOGs of the given families with a pool of worker processes.
+
+        Args:
+            | ham_object (:obj:`pyham.ham.Ham`): Ham object to feed, its taxonomy must already be built.
+            | index (:obj:`pyham.family_index.FamilyIndex`): index of ham_object.hog_file.
+            | families (:obj:`list`): :obj:`pyham.family_index.FamilyRecord` to parse, in file order.
+            | processes (:obj:`int`): number of worker processes.
+            | header_filter (:obj:`pyham.ham.ParserFilter`, optional): resolved filter restricting the genes built
+            from the header. Defaults to None.
+
+        Returns:
+            :obj:`dict` of top level hog id with their :obj:`HOG`, :obj:`dict` of unique id with their :obj:`Gene`,
+            :obj:`dict` of external id with their list of unique ids, :obj:`list` of
+            :obj:`pyham.abstractgene.TaxonomicConflict`.
+    """
+    from .parsers import OrthoXMLParser, create_xml_parser, paused_gc
+
+    if ham_object.taxonomy is None:
+        raise TypeError("Parsing with several processes requires a species tree (tree_file).")
+
+    chunks = split_families(families, processes * CHUNKS_PER_PROCESS)
+    taxonomy_blob = pickle.dumps(ham_object.taxonomy, protocol=pickle.HIGHEST_PROTOCOL)
+    logger.info('Parse {} families in {} chunks with {} processes.'.format(len(families), len(chunks), processes))
+
+    toplevel_hogs = {}
+    conflicts = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                                initargs=(taxonomy_blob,)) as executor:
+        futures = [executor.submit(_parse_chunk, index.hog_file, index.header_end, index.tail_offset, chunk,
+                                   ham_object.id_schema, ham_object.fail_fast, ham_object.parser_backend,
+                                   ham_object.level_cache.maxsize)
+                   for chunk in chunks]
+        try:
+            with paused_gc():
+                # the species header is parsed here while the workers build the HOGs.
+                factory = OrthoXMLParser(ham_object, filterObject=header_filter, id_schema=ham_object.id_schema)
+                parser = create_xml_parser(factory, ham_object.parser_backend)
+                for chunk in index.iter_chunks([]):
+                    parser.feed(chunk)
+                parser.close()
+
+                nodes = list(ham_object.taxonomy.tree.traverse('preorder'))
+                pbar = tqdm(total=len(families), desc='Parsing HOGs') if ham_object.with_parser_progress else None
+                for future, chunk in zip(futures, chunks):
+                    hogs, ancestral_genes, gene_states, chunk_conflicts, cache_info = _ForestUnpickler(
+                        io.BytesIO(future.result()), ham_object, nodes, factory.extant_gene_map).load()
+                    for uid, state in gene_states.items():
+                        factory.extant_gene_map[uid].__setstate__(state)
+                    for pos, genes in ancestral_genes:
+                        ham_object.taxonomy.get_genome_from_taxnode(nodes[pos]).genes.extend(genes)
+                    toplevel_hogs.update(hogs)
+                    conflicts.extend(chunk_conflicts)
+                    # each chunk has its own cache (its genomes are its own), only the statistics are gathered.
+                    ham_object.level_cache.hits += cache_info.hits
+                    ham_object.level_cache.misses += cache_info.misses
+                    if pbar is not None:
+                        pbar.update(len(chunk))
+                if pbar is not None:
+                    pbar.close()
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    return toplevel_hogs, factory.extant_gene_map, factory.external_id_mapper, conflicts
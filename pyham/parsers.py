@@ -1,15 +1,22 @@
 from . import abstractgene
 from .genome import ExtantGenome
-from .taxonomy import build_taxon_node, Taxonomy
+from .taxonomy import Taxonomy, TaxonomyCore
+import contextlib
+import gc
 import logging
 logger = logging.getLogger(__name__)
-from collections import defaultdict
+from collections import defaultdict, deque, namedtuple, OrderedDict
 from tqdm.auto import tqdm
+from xml.etree.ElementTree import ParseError, XMLParser
 from . import id_formats
 
+PARSER_BACKENDS = ('etree', 'lxml')
+
 
 def _label_and_species(node):
     """Return a (label, species_names) pair describing an AbstractGene for conflict reporting."""
+    if isinstance(node, _Group):
+        return node.label_and_species()
     if isinstance(node, abstractgene.HOG):
         species = [g.genome.name for g in node.get_all_descendant_genes()]
         return node.hog_id, species
@@ -59,6 +66,190 @@ def format_taxonomic_conflicts(conflicts: list, cap: int = 20) -> str:
     return report
 
 
+CacheInfo = abstractgene.CacheInfo
+
+# level of an orthologGroup resolved from its claimed level and the genomes of its children:
+#   tax_node: taxon of the ancestral genome of the HOG.
+#   same_level: name of the level if the HOG has a child at its own level (SameLevelHOGError), else None.
+#   claim_property, claim_value: claim (TaxRange or taxid) that some children contradict, else None.
+#   failing_genomes: frozenset of the child genomes not below tax_node (taxonomic conflicts).
+LevelResolution = namedtuple('LevelResolution', ['tax_node', 'same_level', 'claim_property', 'claim_value',
+                                                 'failing_genomes'])
+
+
+class LevelResolutionCache(object):
+    """
+    Bounded LRU cache of the ancestral level resolutions of :obj:`OrthoXMLParser` (and of the classification of the
+    taxonomic conflicts). The resolution of an orthologGroup only depends on its claimed level and the genomes of
+    its children, and the same few combinations repeat across the families of a file.
+
+    Attributes:
+        | maxsize (:obj:`int`): maximum number of entries, 0 disables the cache.
+        | hits (:obj:`int`): number of lookups answered by the cache.
+        | misses (:obj:`int`): number of lookups that had to be computed.
+    """
+
+    def __init__(self, maxsize=1 << 14):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, compute):
+        """  Return the value cached for key, computing it with compute() (and caching it) if it isn't."""
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            if self.maxsize > 0:
+                self._entries[key] = value
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            return value
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def cache_info(self):
+        """  Return the statistics of the cache.
+
+            Returns:
+                :obj:`CacheInfo` (hits, misses, maxsize, currsize).
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        """  Remove all the entries and reset the statistics."""
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+
+class MissingLevelBuilder(object):
+    """
+    Creates the HOGs of the taxonomic levels that the species tree implies in between a HOG and its children but
+    that the orthoxml file doesn't explicitly encode.
+
+    In lazy mode, the levels missing between a HOG and its children are first recorded as implicit edges: the
+    children concerned are kept on the HOG and the HOG is registered in the ancestral genomes of the skipped taxa.
+    The HOGs of these levels are created when the HOG children or the parent of one of these children are accessed
+    (e.g. by :obj:`HOG.visit` or :obj:`HOG.get_at_level`) or when the genes of one of the skipped ancestral genomes
+    are (see :obj:`pyham.genome.AncestralGenome.genes`).
+
+    Attributes:
+        | taxonomy (:obj:`pyham.taxonomy.Taxonomy`): species tree used to find the missing levels.
+        | id_schema (:obj:`str`): HOG id scheme used to synthesize the ids of the created HOGs.
+        | conflicted_children (:obj:`set`): children flagged as taxonomic conflicts, left untouched.
+        | lazy (:obj:`Boolean`): whether the missing levels are only recorded until they are accessed.
+    """
+
+    def __init__(self, taxonomy, id_schema, conflicted_children, lazy=False):
+        self.taxonomy = taxonomy
+        self.id_schema = id_schema
+        self.conflicted_children = conflicted_children
+        self.lazy = lazy
+
+    def add_missing_levels(self, parent: abstractgene.HOG, children: list):
+        """Insert (or record in lazy mode) the missing levels between `parent` and `children`."""
+        if not self.lazy:
+            self.resolve_missing_levels(parent, children)
+            return
+
+        edges = []
+        skipped = set()
+        for child in children:
+            if child in self.conflicted_children:
+                continue
+            if parent.genome.taxon.props["depth"] != child.genome.taxon.props["depth"] - 1:
+                edges.append(child)
+                skipped.update(self.taxonomy.get_path_up(child.genome.taxon, parent.genome.taxon))
+        if edges:
+            parent._implicit_levels = (self, edges)
+            for taxon in skipped:
+                self.taxonomy.get_genome_from_taxnode(taxon)._implicit_hogs.append(parent)
+
+    def materialize(self, parent: abstractgene.HOG, edges: list):
+        """Create the HOGs of the implicit edges recorded by `add_missing_levels` for `parent`."""
+        self.resolve_missing_levels(parent, [child for child in edges if child.parent is parent])
+
+    def create_missing_hogs(self, child: abstractgene.AbstractGene, parent: abstractgene.HOG):
+        """Create missing HOGs between a child and a parent genome.
+        Returns the oldest created HOG, or the child if no HOG was created."""
+        if child == parent:
+            raise ValueError("Child and parent genomes are the same, cannot create missing HOGs.")
+
+        missing_taxons = self.taxonomy.get_path_up(child.genome.taxon, parent.genome.taxon)
+        if len(missing_taxons) > 0:
+            # the youngest hog is removed from the oldest hog's children.
+            parent.remove_child(child)
+            # Then for each intermediate level in between the two hogs...
+            current_child = child
+            anchor_id = child.hog_id if hasattr(child, 'hog_id') else parent.hog_id
+            for tax in missing_taxons:
+                # ... we get the related ancestral genome of this level...
+                ancestral_genome = self.taxonomy.get_genome_from_taxnode(tax)
+
+                # ... we create the related hog and add it to the ancestral genome...
+                hog_id = id_formats.make_missing_hog_id(self.id_schema, anchor_id, ancestral_genome.taxon)
+                hog = abstractgene.HOG(id=hog_id)
+                setattr(hog, '_missing_in_xml', parent.genome)
+                ancestral_genome.add_gene(hog)
+
+                # ... we check if taxon correspond to child parent taxon ...
+                if ancestral_genome.taxon is not current_child.genome.taxon.up:
+                    raise TypeError(
+                        "HOG taxon {} is different than child parent taxon {}".format(ancestral_genome.taxon,
+                                                                                      current_child.genome.taxon.up))
+                # ... we add the child if everything is fine.
+                hog.add_child(current_child)
+                current_child = hog
+            parent.add_child(current_child)
+        logger.debug(f"Created {len(missing_taxons)} missing HOGs between {child} and {parent}.")
+        return current_child if len(missing_taxons) > 0 else child
+
+    def resolve_missing_levels(self, parent: abstractgene.HOG, children: list):
+        """Insert missing intermediate HOG levels between `parent` and `children`.
+
+        If several children are missing the same intermediate taxon (i.e. the
+        reference species tree resolves this part of the taxonomy more finely
+        than the HOGs were built/augmented at), a single shared ancestral HOG is
+        created for all of them instead of one redundant HOG per child. Children
+        that are missing no shared level are delegated to `create_missing_hogs`.
+
+        Children already flagged as a taxonomic conflict are skipped entirely:
+        their genome doesn't actually sit below `parent` in the given tree, so
+        there is no valid path to insert missing levels along.
+        """
+        children = [c for c in children if c not in self.conflicted_children]
+        change = {}
+        for child in children:
+            if parent.genome.taxon.props["depth"] != child.genome.taxon.props["depth"] - 1:
+                change[child] = self.taxonomy.get_path_up(child.genome.taxon, parent.genome.taxon)
+        if not change:
+            return
+
+        groups = defaultdict(list)
+        for child, missing in change.items():
+            # missing[-1] is the taxon immediately below `parent`; children sharing
+            # any ancestor on the path back to `parent` necessarily share this one too.
+            groups[missing[-1]].append(child)
+
+        for tax_node, group_children in groups.items():
+            if len(group_children) == 1:
+                self.create_missing_hogs(group_children[0], parent)
+            else:
+                shared_genome = self.taxonomy.get_genome_from_taxnode(tax_node)
+                shared_hog_id = id_formats.make_missing_hog_id(self.id_schema, parent.hog_id, tax_node)
+                shared_hog = abstractgene.HOG(id=shared_hog_id)
+                setattr(shared_hog, "_missing_in_xml", parent.genome)
+                shared_genome.add_gene(shared_hog)
+                parent.add_child(shared_hog)
+                for child in group_children:
+                    parent.remove_child(child)
+                    shared_hog.add_child(child)
+                self.resolve_missing_levels(shared_hog, group_children)
+
+
 class OrthoXMLParser:
 
     """
@@ -87,14 +278,18 @@ class OrthoXMLParser:
         Reset at each top level hog change.
         in_paralogGroup (:obj:`int`): last position in the stack where a duplication  occured.
         skip_this_hog (:obj:`Boolean`): Boolean to skip the current hog or not (used when filtering option is set).     
+        completed_families (:obj:`deque`): top level hogs completed and not yet consumed (only used in streaming mode).
     """
 
     def __init__(self, ham_object, taxonomy=None, filterObject=None, id_schema: str = None, with_progress: bool = False,
-                 fail_fast: bool = False):
+                 fail_fast: bool = False, streaming: bool = False, lazy_missing_levels: bool = False,
+                 level_cache=None):
 
         """
         Args:
-            ham_object (:obj:`Ham`): Ham object to feed with created objects.
+            ham_object (:obj:`Ham`): Ham object to feed with created objects, or None if taxonomy is given.
+            taxonomy (:obj:`Taxonomy`, optional): species taxonomy, defaults to the one of ham_object (None if the
+            taxonomy is built from the orthoxml file).
             filterObject (:obj:`FilterParser`, optional): FilterParser object used to restrict the parsed information.
             with_progress (:bool:, optional): Whether to display a tqdm progress bar whilst parsing.
             Defaults to None.
@@ -105,22 +300,35 @@ class OrthoXMLParser:
             :obj:`pyham.id_formats.SCHEMES`), used to synthesize ids for HOG levels inserted because the
             species tree implies them but the file doesn't. Defaults to :obj:`pyham.id_formats.GENERIC`
             (no synthesis) if not given.
+            streaming (:bool:, optional): If True, completed top level hogs are appended to `completed_families`
+            for the caller to consume instead of being kept in `toplevel_hogs`. Defaults to False.
+            lazy_missing_levels (:bool:, optional): If True, the levels missing between a HOG and its children are
+            only created when accessed (see :obj:`MissingLevelBuilder`). Defaults to False.
+            level_cache (:obj:`LevelResolutionCache`, optional): cache of the ancestral level resolutions. Defaults
+            to the `level_cache` attribute of ham_object if it has one, else to a new cache.
         """
         self.ham_object = ham_object
         self.filterObj = filterObject
-        self.taxonomy = ham_object.taxonomy
+        self.taxonomy = ham_object.taxonomy if taxonomy is None and ham_object is not None else taxonomy
         self._id_schema = id_schema if id_schema is not None else id_formats.GENERIC
+        self.level_cache = level_cache if level_cache is not None else getattr(ham_object, 'level_cache', None)
+        if self.level_cache is None:
+            self.level_cache = LevelResolutionCache()
 
         # usefull information
         self.extant_gene_map = {}
         self.external_id_mapper = defaultdict(list)
         self.toplevel_hogs = {}
+        self.streaming = streaming
+        self.completed_families = deque()
 
         # On the fly variable
         self.cpt = 0
         self.hog_stack = []
         self.paralog_stack = []
         self.taxon_stack = []
+        # parent, name and id of the <taxon> elements of an embedded taxonomy, in document order.
+        self.taxon_parents, self.taxon_names, self.taxon_ids = [], [], []
         self.current_species = None
         self.in_paralogGroup = None
         self.paralogyNode = None
@@ -132,6 +340,10 @@ class OrthoXMLParser:
         self.taxonomic_conflicts = []
         self._conflicted_children = set()
 
+        # HOGs of the levels implied by the species tree but missing in the file
+        self.missing_levels = MissingLevelBuilder(self.taxonomy, self._id_schema, self._conflicted_children,
+                                                  lazy=lazy_missing_levels)
+
         # counter for freshly-minted duplication-branch indices (see
         # _assign_duplication_branch_ids) -- seeded far above any realistic real index so
         # it can never collide with one; only needs to be distinct from other
@@ -180,55 +392,76 @@ class OrthoXMLParser:
 
     def _assign_ancestral_genome(self, hog):
         """This method determines the ancestral genome for a HOG based on its children."""
-        child_genomes = [child.genome for child in hog.children]
+        genome = self.taxonomy.get_genome_from_taxnode(self._resolve_ancestral_level(hog))
+        genome.add_gene(hog)
+        logger.debug("Added %s to ancestral genome %s", hog, genome.name)
+
+    def _resolve_ancestral_level(self, hog):
+        """Return the taxon node of the ancestral genome of a HOG, reporting the taxonomic conflicts between its
+        claimed level and its children (raises :obj:`abstractgene.SameLevelHOGError` if it has a child at its own
+        level)."""
+        child_genomes = frozenset(child.genome for child in hog.children)
+        claims = tuple((key, hog._properties[key]) for key in ('TaxRange', 'taxid') if key in hog._properties)
+        resolution = self.level_cache.get((hog.taxon_id, claims, child_genomes),
+                                          lambda: self._resolve_level(hog.taxon_id, claims, child_genomes))
+
+        if resolution.same_level is not None:
+            raise abstractgene.SameLevelHOGError(f"HOG '{hog.hog_id}' at {resolution.same_level} has child at same level: {hog.children[0]}.")
+
+        if resolution.failing_genomes:
+            failing = [(child, child.genome) for child in hog.children if child.genome in resolution.failing_genomes]
+            for conflict in self._build_taxonomic_conflicts(hog, resolution.claim_property, resolution.claim_value,
+                                                            resolution.tax_node, failing):
+                self._report_taxonomic_conflict(conflict)
+            for child, _ in failing:
+                self._conflicted_children.add(child)
+
+        return resolution.tax_node
+
+    def _report_taxonomic_conflict(self, conflict):
+        if self.fail_fast:
+            raise abstractgene.TaxonomicConflictError(format_taxonomic_conflicts([conflict]), [conflict])
+        self.taxonomic_conflicts.append(conflict)
+
+    def _resolve_level(self, taxon_id, claims, child_genomes):
+        """Resolve the level of an orthologGroup from its taxonId attribute, its claims ((property, value) pairs
+        of its TaxRange/taxid properties) and the genomes of its children.
+
+        Returns a :obj:`LevelResolution`."""
         tax_node = None
-        if hog.taxon_id is not None:
+        if taxon_id is not None:
             # If the HOG has a taxon_id, we can directly assign the ancestral genome based on the taxon.
-            tax_nodes = list(self.taxonomy.nodes_by_attr(id=hog.taxon_id))
+            tax_nodes = list(self.taxonomy.nodes_by_attr(id=taxon_id))
             if len(tax_nodes) == 1:
                 tax_node = tax_nodes[0]
-                if len(set(child_genomes)) == 1 and child_genomes[0].taxon == tax_node:
-                    raise abstractgene.SameLevelHOGError(f"HOG '{hog.hog_id}' at {tax_node.name} has child at same level: {hog.children[0]}.")
+                if len(child_genomes) == 1 and next(iter(child_genomes)).taxon == tax_node:
+                    return LevelResolution(tax_node, tax_node.name, None, None, frozenset())
         # let's check if we can map it using the TaxRange or taxid property
         if tax_node is None:
-            for key in ('TaxRange', 'taxid'):
+            for key, tax_value in claims:
                 try:
-                    tax_value = hog[key]
                     tax_node = self.taxonomy.get_node_by_name(tax_value)
                 except (KeyError, AttributeError):
-                    pass
-                else:
-                    failing = [(child, child.genome) for child in hog.children
-                               if not self.taxonomy.is_child_recursive(child.genome.taxon, tax_node)]
-                    if not failing:
-                        break
-
-                    if len(set(child_genomes)) == 1 and failing[0][1].taxon == tax_node:
-                        raise abstractgene.SameLevelHOGError(f"HOG '{hog.hog_id}' at {tax_node.name} has child at same level: {failing[0][1]}.")
-
-                    for conflict in self._build_taxonomic_conflicts(hog, key, tax_value, tax_node, failing):
-                        if self.fail_fast:
-                            raise abstractgene.TaxonomicConflictError(format_taxonomic_conflicts([conflict]), [conflict])
-                        self.taxonomic_conflicts.append(conflict)
-                    for child, _ in failing:
-                        self._conflicted_children.add(child)
+                    continue
+                failing = frozenset(genome for genome in child_genomes
+                                    if not self.taxonomy.is_child_recursive(genome.taxon, tax_node))
+                if not failing:
                     break
+                if len(child_genomes) == 1 and next(iter(failing)).taxon == tax_node:
+                    return LevelResolution(tax_node, tax_node.name, None, None, frozenset())
+                return LevelResolution(tax_node, None, key, str(tax_value), failing)
 
         # if not, let's try with the children genomes
         if tax_node is None:
-            if len(set(child_genomes)) == 1:
-                try:
-                    tax_range = hog['TaxRange']
-                    if hog['TaxRange'] == hog.children[0].genome.name:
-                        raise abstractgene.SameLevelHOGError(f"HOG '{hog.hog_id}' at {tax_range} has child at same level: {hog.children[0]}.")
-                except (KeyError, AttributeError):
-                    pass
-                tax_node = child_genomes[0].taxon.up
+            if len(child_genomes) == 1:
+                child_genome = next(iter(child_genomes))
+                tax_range = dict(claims).get('TaxRange')
+                if tax_range is not None and tax_range == child_genome.name:
+                    return LevelResolution(child_genome.taxon, tax_range, None, None, frozenset())
+                tax_node = child_genome.taxon.up
             else:
                 tax_node = self.taxonomy.get_mrca_taxnode(*(g.taxon for g in child_genomes))
-        genome = self.taxonomy.get_genome_from_taxnode(tax_node)
-        genome.add_gene(hog)
-        logger.debug(f"Added {hog} to ancestral genome {genome.name}")
+        return LevelResolution(tax_node, None, None, None, frozenset())
 
     def _classify_conflict(self, child, child_node, tax_node):
         """Classify why `child_node` doesn't sit below `tax_node`, and build a human-readable reason.
@@ -270,7 +503,11 @@ class OrthoXMLParser:
 
         by_kind = defaultdict(list)
         for child, child_genome in failing:
-            kind, detail = self._classify_conflict(child, child_genome.taxon, tax_node)
+            own_claim = next(((key, child._properties[key]) for key in ('TaxRange', 'taxid')
+                              if key in child._properties), None)
+            kind, detail = self.level_cache.get(
+                ('conflict', own_claim, child_genome.taxon, tax_node),
+                lambda: self._classify_conflict(child, child_genome.taxon, tax_node))
             label, species = _label_and_species(child)
             by_kind[kind].append((label, species, detail))
 
@@ -289,83 +526,6 @@ class OrthoXMLParser:
             for kind, members in by_kind.items()
         ]
 
-    def _create_missing_hogs(self, child: abstractgene.AbstractGene, parent: abstractgene.HOG):
-        """Create missing HOGs between a child and a parent genome.
-        Returns the oldest created HOG, or the child if no HOG was created."""
-        if child == parent:
-            raise ValueError("Child and parent genomes are the same, cannot create missing HOGs.")
-
-        missing_taxons = self.taxonomy.get_path_up(child.genome.taxon, parent.genome.taxon)
-        if len(missing_taxons) > 0:
-            # the youngest hog is removed from the oldest hog's children.
-            parent.remove_child(child)
-            # Then for each intermediate level in between the two hogs...
-            current_child = child
-            anchor_id = child.hog_id if hasattr(child, 'hog_id') else parent.hog_id
-            for tax in missing_taxons:
-                # ... we get the related ancestral genome of this level...
-                ancestral_genome = self.taxonomy.get_genome_from_taxnode(tax)
-
-                # ... we create the related hog and add it to the ancestral genome...
-                hog_id = id_formats.make_missing_hog_id(self._id_schema, anchor_id, ancestral_genome.taxon)
-                hog = abstractgene.HOG(id=hog_id)
-                setattr(hog, '_missing_in_xml', parent.genome)
-                ancestral_genome.add_gene(hog)
-
-                # ... we check if taxon correspond to child parent taxon ...
-                if ancestral_genome.taxon is not current_child.genome.taxon.up:
-                    raise TypeError(
-                        "HOG taxon {} is different than child parent taxon {}".format(ancestral_genome.taxon,
-                                                                                      current_child.genome.taxon.up))
-                # ... we add the child if everything is fine.
-                hog.add_child(current_child)
-                current_child = hog
-            parent.add_child(current_child)
-        logger.debug(f"Created {len(missing_taxons)} missing HOGs between {child} and {parent}.")
-        return current_child if len(missing_taxons) > 0 else child
-
-    def _resolve_missing_levels(self, parent: abstractgene.HOG, children: list):
-        """Insert missing intermediate HOG levels between `parent` and `children`.
-
-        If several children are missing the same intermediate taxon (i.e. the
-        reference species tree resolves this part of the taxonomy more finely
-        than the HOGs were built/augmented at), a single shared ancestral HOG is
-        created for all of them instead of one redundant HOG per child. Children
-        that are missing no shared level are delegated to `_create_missing_hogs`.
-
-        Children already flagged as a taxonomic conflict are skipped entirely:
-        their genome doesn't actually sit below `parent` in the given tree, so
-        there is no valid path to insert missing levels along.
-        """
-        children = [c for c in children if c not in self._conflicted_children]
-        change = {}
-        for child in children:
-            if parent.genome.taxon.props["depth"] != child.genome.taxon.props["depth"] - 1:
-                change[child] = self.taxonomy.get_path_up(child.genome.taxon, parent.genome.taxon)
-        if not change:
-            return
-
-        groups = defaultdict(list)
-        for child, missing in change.items():
-            # missing[-1] is the taxon immediately below `parent`; children sharing
-            # any ancestor on the path back to `parent` necessarily share this one too.
-            groups[missing[-1]].append(child)
-
-        for tax_node, group_children in groups.items():
-            if len(group_children) == 1:
-                self._create_missing_hogs(group_children[0], parent)
-            else:
-                shared_genome = self.taxonomy.get_genome_from_taxnode(tax_node)
-                shared_hog_id = id_formats.make_missing_hog_id(self._id_schema, parent.hog_id, tax_node)
-                shared_hog = abstractgene.HOG(id=shared_hog_id)
-                setattr(shared_hog, "_missing_in_xml", parent.genome)
-                shared_genome.add_gene(shared_hog)
-                parent.add_child(shared_hog)
-                for child in group_children:
-                    parent.remove_child(child)
-                    shared_hog.add_child(child)
-                self._resolve_missing_levels(shared_hog, group_children)
-
     def _assign_duplication_branch_ids(self, parent_hog: abstractgene.HOG, duplication, children: list):
         """Give every duplication branch in `children` (direct children of `parent_hog`,
         all flagged as arising from `duplication`) its own distinguishing LOFT dot-chain
@@ -443,7 +603,7 @@ class OrthoXMLParser:
             parent_hog.remove_child(child)
             wrapper.add_child(child)
             parent_hog.add_child(wrapper)
-            self._create_missing_hogs(child, wrapper)
+            self.missing_levels.create_missing_hogs(child, wrapper)
 
             duplication.remove_child(child)
             duplication.add_child(wrapper)
@@ -469,7 +629,7 @@ class OrthoXMLParser:
                 # we have a directly nested paralog group. use the same DuplicationNode
                 dNode = self.paralog_stack[-1]['node']
             else:
-                dNode = abstractgene.DuplicationNode(self, id=attrib.get('og', None))
+                dNode = abstractgene.DuplicationNode(id=attrib.get('og', None))
 
             self.paralog_stack.append({'depth': cur_depth, 'node': dNode})
 
@@ -508,10 +668,10 @@ class OrthoXMLParser:
             self.hog_stack[-1].score(attrib['id'], float(attrib['value']))
 
         elif tag == "{http://orthoXML.org/2011/}taxon":
-            taxon = build_taxon_node(**attrib)
-            self.taxon_stack.append(taxon)
-            if len(self.taxon_stack) > 1:
-                self.taxon_stack[-2].add_child(child=taxon)
+            self.taxon_parents.append(self.taxon_stack[-1] if self.taxon_stack else -1)
+            self.taxon_names.append(attrib.get("name"))
+            self.taxon_ids.append(int(attrib["id"]))
+            self.taxon_stack.append(len(self.taxon_ids) - 1)
 
         elif tag == "{http://orthoXML.org/2011/}groups":
             if self.taxonomy is None:
@@ -526,11 +686,12 @@ class OrthoXMLParser:
             self.current_species = None
 
         elif tag == "{http://orthoXML.org/2011/}taxon":
-            taxonomy = self.taxon_stack.pop()
+            self.taxon_stack.pop()
             if len(self.taxon_stack) == 0:
                 # we are at the root of the taxonomy tree. if no taxonomy is provided upfront, we create it.
                 if self.taxonomy is None:
-                    self.taxonomy = Taxonomy(taxonomy)
+                    self.taxonomy = Taxonomy(TaxonomyCore(self.taxon_parents, self.taxon_names, self.taxon_ids))
+                    self.missing_levels.taxonomy = self.taxonomy
                     # add all extant genomes to the taxonomy tree
                     for genome in self._genomes_to_add:
                         taxon = self.taxonomy.get_extant_taxa_by_name(genome.name)
@@ -541,7 +702,7 @@ class OrthoXMLParser:
 
         elif tag == "{http://orthoXML.org/2011/}paralogGroup" and self.skip_this_hog is False:
             ln = self.paralog_stack.pop()
-            ln['node'].set_MRCA()
+            ln['node'].set_MRCA(self.taxonomy)
             if len(self.paralog_stack) > 0:
                 self.in_paralogGroup = self.paralog_stack[-1]['depth']
                 self.paralogyNode = self.paralog_stack[-1]['node']
@@ -618,7 +779,7 @@ class OrthoXMLParser:
 
                     # add missing levels if any, grouping children that are
                     # missing the same intermediate ancestor under one shared HOG
-                    self._resolve_missing_levels(mrca_hog, remaining)
+                    self.missing_levels.resolve_missing_levels(mrca_hog, remaining)
 
                     duplication.set_parent(mrca_hog)
                     for x in list(duplication.children):
@@ -638,17 +799,21 @@ class OrthoXMLParser:
                     for child_direct in children:
                         if child_direct in wrapped:
                             continue
-                        new_direct_child = self._create_missing_hogs(child_direct, hog)
+                        new_direct_child = self.missing_levels.create_missing_hogs(child_direct, hog)
                         duplication.remove_child(child_direct)
                         duplication.add_child(new_direct_child)
 
             # insert any remaining missing intermediate levels, grouping children
             # that are missing the same intermediate ancestor under one shared HOG
-            self._resolve_missing_levels(hog, list(hog.children))
+            # (only recorded for now in lazy mode)
+            self.missing_levels.add_missing_levels(hog, list(hog.children))
 
             if len(self.hog_stack) == 0:
-                hog_id = hog.hog_id.split('_')[0]
-                self.toplevel_hogs[hog_id] = hog
+                if self.streaming:
+                    self.completed_families.append(hog)
+                else:
+                    hog_id = hog.hog_id.split('_')[0]
+                    self.toplevel_hogs[hog_id] = hog
                 self.cpt += 1
                 if self.cpt % 500 == 0:
                     logger.info("{} HOGs parsed. ".format(self.cpt))
@@ -666,6 +831,190 @@ class OrthoXMLParser:
         return
 
 
+class _Group(object):
+    """
+    Light stand-in of a HOG (or, without children, of a Gene) used by :obj:`ConflictCheckParser`: it only holds what
+    the level resolution and the conflict records need.
+    """
+
+    __slots__ = ('hog_id', 'taxon_id', '_properties', 'children', 'genome', 'label')
+
+    def __init__(self, hog_id=None, taxon_id=None, genome=None, label=None):
+        self.hog_id = hog_id
+        self.taxon_id = taxon_id
+        self._properties = {}
+        self.children = abstractgene.ChildList()
+        self.genome = genome
+        self.label = label
+
+    def __getitem__(self, item):
+        return self._properties[item]
+
+    def __repr__(self):
+        return "Group({})".format(self.hog_id if self.label is None else self.label)
+
+    def label_and_species(self):
+        if self.label is not None:
+            return self.label, [self.genome.name]
+        species = []
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            if node.label is not None:
+                species.append(node.genome.name)
+            else:
+                stack.extend(reversed(node.children))
+        return self.hog_id, species
+
+
+class ConflictCheckParser(OrthoXMLParser):
+    """
+    Parser target only checking the level claimed by each orthologGroup (TaxRange/taxid property) against the
+    species tree, as done while building the HOGs, and passing each :obj:`abstractgene.TaxonomicConflict` found to
+    on_conflict. No Gene, HOG, missing level or duplication is built: the genes are kept as (label, genome) pairs and
+    the current family as a tree of :obj:`_Group`, released once the family is checked.
+
+    Attributes:
+        on_conflict (:obj:`function`): called with each :obj:`abstractgene.TaxonomicConflict` found.
+        families (:obj:`int`): number of checked families.
+        hogs (:obj:`int`): number of checked orthologGroups.
+        n_conflicts (:obj:`int`): number of conflicts found.
+    """
+
+    def __init__(self, ham_object, on_conflict, with_progress=False, taxonomy=None, level_cache=None):
+        super(ConflictCheckParser, self).__init__(ham_object, taxonomy=taxonomy, with_progress=with_progress,
+                                                  level_cache=level_cache)
+        self.on_conflict = on_conflict
+        self.families = 0
+        self.hogs = 0
+        self.n_conflicts = 0
+
+    def _build_gene(self, attrib):
+        self.extant_gene_map[attrib['id']] = (attrib.get('protId') or attrib.get('geneId') or attrib['id'],
+                                              self.current_species)
+
+    def _report_taxonomic_conflict(self, conflict):
+        self.n_conflicts += 1
+        self.on_conflict(conflict)
+
+    def start(self, tag, attrib):
+        if tag == "{http://orthoXML.org/2011/}orthologGroup":
+            if self.with_progress and len(self.hog_stack) == 0:
+                self._update_progress_bar(tag)
+            group = _Group(attrib.get('id'), int(attrib['taxonId']) if 'taxonId' in attrib else None)
+            if len(self.hog_stack) > 0:
+                self.hog_stack[-1].children.append(group)
+            self.hog_stack.append(group)
+
+        elif tag == "{http://orthoXML.org/2011/}geneRef":
+            label, genome = self.extant_gene_map[attrib['id']]
+            self.hog_stack[-1].children.append(_Group(genome=genome, label=label))
+
+        elif tag == "{http://orthoXML.org/2011/}property":
+            self.hog_stack[-1]._properties[attrib["name"]] = attrib["value"]
+
+        elif tag not in ("{http://orthoXML.org/2011/}paralogGroup", "{http://orthoXML.org/2011/}score"):
+            super(ConflictCheckParser, self).start(tag, attrib)
+
+    def end(self, tag):
+        if tag == "{http://orthoXML.org/2011/}orthologGroup":
+            group = self.hog_stack.pop()
+            try:
+                group.genome = self.taxonomy.get_genome_from_taxnode(self._resolve_ancestral_level(group))
+            except abstractgene.SameLevelHOGError as e:
+                # removed from the hierarchy as when building the HOGs.
+                logger.info(str(e))
+                if len(self.hog_stack) > 0:
+                    self.hog_stack[-1].children.remove(group)
+                    self.hog_stack[-1].children.extend(group.children)
+            self.hogs += 1
+            if len(self.hog_stack) == 0:
+                self.families += 1
+                self._conflicted_children.clear()
+
+        elif tag != "{http://orthoXML.org/2011/}paralogGroup":
+            super(ConflictCheckParser, self).end(tag)
+
+
+class LxmlTargetParser(object):
+    """
+    Drop-in replacement of :obj:`xml.etree.ElementTree.XMLParser` that drives a parser target (start/end/data/close
+    methods) with lxml's parser. lxml calls the target straight from its C tokenizer, no element tree is built so
+    the memory doesn't grow with the size of the file, and huge text nodes and deeply nested files are accepted.
+
+    lxml only reports most syntax errors once the document is closed, so close() must be called after the last
+    block. Syntax errors are raised as :obj:`xml.etree.ElementTree.ParseError`, like the etree backend does.
+
+    Attributes:
+        target: parser target fed with start(tag, attrib), end(tag) and data(text) calls.
+    """
+
+    def __init__(self, target):
+        from lxml import etree
+        self.target = target
+        self._syntax_error = etree.XMLSyntaxError
+        self._parser = etree.XMLParser(target=target, huge_tree=True, remove_comments=True, remove_pis=True)
+
+    def _parse_error(self, error):
+        parse_error = ParseError(str(error))
+        parse_error.code, parse_error.position = error.code, error.position
+        return parse_error
+
+    def feed(self, data):
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        try:
+            self._parser.feed(data)
+        except self._syntax_error as e:
+            raise self._parse_error(e) from e
+
+    def close(self):
+        try:
+            return self._parser.close()
+        except self._syntax_error as e:
+            raise self._parse_error(e) from e
+
+
+def create_xml_parser(target, backend='etree'):
+    """  Create a parser feeding the given target (start/end/data/close methods) with the given backend.
+
+        Args:
+            | target: parser target, e.g. :obj:`OrthoXMLParser`.
+            | backend (:obj:`str`, optional): 'etree' for :obj:`xml.etree.ElementTree.XMLParser` or 'lxml' for
+            :obj:`LxmlTargetParser`. Defaults to 'etree'.
+
+        Returns:
+            parser with feed and close methods, close must be called after the last block to check that the
+            document is complete.
+
+        Raises:
+            TypeError: if the backend is unknown.
+    """
+    if backend == 'etree':
+        return XMLParser(target=target)
+    elif backend == 'lxml':
+        return LxmlTargetParser(target)
+    raise TypeError("{} is not a valid parser backend. Available options: {}."
+                    .format(backend, ', '.join(PARSER_BACKENDS)))
+
+
+@contextlib.contextmanager
+def paused_gc():
+    """  Context manager disabling the cyclic garbage collector while HOGs and genes are built.
+
+    The HOGs, genes, genomes and duplications of a file are tens of millions of objects linked in cycles (parent and
+    children, genome and genes) that are all kept: each collection triggered by their allocation scans them again
+    for nothing. The collector is enabled again on exit if it was enabled before.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
 class IDSchemeSniffer:
     """Lightweight OrthoXML parser target used to sample HOG ids for id-scheme
     auto-detection (see :obj:`pyham.id_formats.detect_id_scheme`), without paying for a
@@ -719,56 +1068,75 @@ class FilterOrthoXMLParser(object):
         - In the Groups section, it creates the HOGs with their hierarchy (parent/children links) and their related
         AncestralGenomes.
 
+    Once no queried gene is left to be found, a family is selected on its id only: the geneRefs of the families
+    that are not selected are not collected. Once all queried hogs and genes have been found, `done` is set and the
+    rest of the file doesn't need to be parsed.
 
     Attributes:
         filterObj (:obj:`FilterParser`): Filter object with all the filtering information.
 
-        geneUniqueId (:obj:`list`): list of unique gene ids to store for the OrthoXMLParser.
+        geneUniqueId (:obj:`set`): set of unique gene ids to store for the OrthoXMLParser.
         hogsId (:obj:`list`): list of hogs ids to store for the OrthoXMLParser.
+        done (:obj:`Boolean`): True once all the queried hogs and genes have been found.
 
         current_hog (:obj:`int`): Current hog id.
         hog_stack (:obj:`list`): Stack of hogs currently parsed. Reset at each top level hog change.
         hog_generef (:obj:`list`): list of unique gene ids contained into the current parsed hog.
         add_this_hog (:obj:`Boolean`): Boolean to know if we keep the current hog for the OrthoXMLParser.
+        skip_this_hog (:obj:`Boolean`): Boolean to know if the geneRefs of the current hog can be ignored.
     """
 
     def __init__(self, filterO):
 
         self.filterObj = filterO
 
-        self.geneUniqueId = []
+        self.geneUniqueId = set()
         self.hogsId = []
+        self.done = False
 
         self.current_hog = None
         self.hog_stack = []
         self.hog_generef = []
         self.add_this_hog = False
+        self.skip_this_hog = False
+
+        # queries not found yet
+        self._pending_hogs = set(self.filterObj.HOGId_filter)
+        self._pending_genes = set()
+        self._in_groups = False
+
+    def _update_done(self):
+        self.done = self._in_groups and not self._pending_hogs and not self._pending_genes
 
     def start(self, tag, attrib):
 
         if tag == "{http://orthoXML.org/2011/}gene":
-            if self.filterObj.GeneIntId_filter:
-                if attrib['id'] in self.filterObj.GeneIntId_filter:
-                    self.geneUniqueId.append(attrib['id'])
-
-            if self.filterObj.GeneExtId_filter:
-                for xtid in attrib.values():
-                    if xtid in self.filterObj.GeneExtId_filter:
-                        self.geneUniqueId.append(attrib['id'])
+            if attrib['id'] in self.filterObj.GeneIntId_filter or (
+                    self.filterObj.GeneExtId_filter and not self.filterObj.GeneExtId_filter.isdisjoint(attrib.values())):
+                self.geneUniqueId.add(attrib['id'])
+                self._pending_genes.add(attrib['id'])
 
         elif tag == "{http://orthoXML.org/2011/}geneRef":
-            self.hog_generef.append(attrib['id'])
-            if attrib['id'] in self.geneUniqueId:
-                self.add_this_hog = True
+            if not self.skip_this_hog:
+                self.hog_generef.append(attrib['id'])
+                if attrib['id'] in self.geneUniqueId:
+                    self.add_this_hog = True
 
         elif tag == "{http://orthoXML.org/2011/}orthologGroup":
             if len(self.hog_stack) == 0:
                 self.current_hog = attrib["id"]
                 if self.current_hog in self.filterObj.HOGId_filter:
                     self.add_this_hog = True
+                elif not self._pending_genes:
+                    # no queried gene left to find: this family can't be selected by its genes
+                    self.skip_this_hog = True
 
             self.hog_stack.append(1)
 
+        elif tag == "{http://orthoXML.org/2011/}groups":
+            self._in_groups = True
+            self._update_done()
+
     def end(self, tag):
 
         if tag == "{http://orthoXML.org/2011/}orthologGroup":
@@ -778,12 +1146,16 @@ class FilterOrthoXMLParser(object):
             if len(self.hog_stack) == 0:
 
                 if self.add_this_hog:
-                    self.geneUniqueId = self.geneUniqueId + self.hog_generef
+                    self.geneUniqueId.update(self.hog_generef)
                     self.hogsId.append(self.current_hog)
+                    self._pending_hogs.discard(self.current_hog)
+                    self._pending_genes.difference_update(self.hog_generef)
+                    self._update_done()
 
                 self.current_hog = None
                 self.hog_generef = []
                 self.add_this_hog = False
+                self.skip_this_hog = False
 
     def data(self, data):
         # Ignore data inside nodes
@@ -794,6 +1166,156 @@ class FilterOrthoXMLParser(object):
         return
 
 
+class SinglePassOrthoXMLParser(object):
+    """
+    OrthoXML parser target that fuses the filtering (:obj:`FilterOrthoXMLParser`), id-scheme sniffing
+    (:obj:`IDSchemeSniffer`) and HOG construction (:obj:`OrthoXMLParser`) stages in a single read of the file.
+
+    Every event is forwarded to the filter and sniffer targets as the file is read. The events of each top-level
+    orthologGroup are buffered until the family is closed, at which point the filter decides whether it is kept.
+    Kept families are replayed into the wrapped :obj:`OrthoXMLParser` as soon as the id scheme is known; with a
+    filter, the header (species/genes/taxonomy) is replayed together with them once the filter is complete, so the
+    wrapped parser sees exactly the event stream it would have seen in the three-pass setup.
+
+    The genes selected by a filter are only known once every family has been read (a HOG id query selects all the
+    genes of its family), so with a filter each event of the header is kept in memory until the end of the
+    <groups> element: the memory used grows with the number of genes of the file, not only with the kept ones.
+
+    Attributes:
+        factory (:obj:`OrthoXMLParser`): parser building the HOGs, Genes and Genomes. It must be created without
+        a filter object, the filter is handed over once it is complete.
+        filterObj (:obj:`pyham.ham.ParserFilter`): filter object to fill, or None.
+        sniffer (:obj:`IDSchemeSniffer`): sniffer used to detect the id scheme, or None if the scheme is known.
+        id_schema (:obj:`str`): id scheme used by the factory (detected one if sniffing).
+    """
+
+    _GROUPS = "{http://orthoXML.org/2011/}groups"
+    _HOG = "{http://orthoXML.org/2011/}orthologGroup"
+
+    def __init__(self, factory, filterObject=None, sniff_id_schema=False):
+
+        self.factory = factory
+        self.filterObj = filterObject
+        self.filter_factory = FilterOrthoXMLParser(filterObject) if filterObject is not None else None
+        self.sniffer = IDSchemeSniffer() if sniff_id_schema else None
+        self.id_schema = factory._id_schema
+
+        self._in_groups = False
+        self._depth = 0
+        self._header = []  # events before <groups>, only buffered when filtering
+        self._family = []  # events of the top-level orthologGroup being read
+        self._pending = []  # families kept but not yet replayed into the factory
+
+    def _forward(self, events):
+        for event in events:
+            if len(event) == 3:
+                self.factory.start(event[1], event[2])
+            else:
+                self.factory.end(event[1])
+
+    def _sniffing(self):
+        return self.sniffer is not None and not self.sniffer.done
+
+    def _set_id_schema(self):
+        self.id_schema = id_formats.detect_id_scheme(self.sniffer.samples)
+        self.factory._id_schema = self.id_schema
+        self.factory.missing_levels.id_schema = self.id_schema
+        self.sniffer = None
+        logger.info('Auto-detected HOG id scheme: {}'.format(self.id_schema))
+
+    def _close_family(self):
+        family, self._family = self._family, []
+
+        if self.filter_factory is not None:
+            kept = len(self.filter_factory.hogsId) > self._nbr_kept
+            self._nbr_kept = len(self.filter_factory.hogsId)
+            if not kept:
+                return
+
+        if self.sniffer is not None or self.filter_factory is not None:
+            self._pending.append(family)
+        else:
+            self._forward(family)
+
+        if self.sniffer is not None and self.sniffer.done:
+            self._set_id_schema()
+            if self.filter_factory is None:
+                for pending_family in self._pending:
+                    self._forward(pending_family)
+                self._pending = []
+
+    def start(self, tag, attrib):
+
+        if self.filter_factory is not None:
+            self.filter_factory.start(tag, attrib)
+
+        if not self._in_groups:
+            if tag == self._GROUPS:
+                self._in_groups = True
+                self._nbr_kept = 0
+            if self.filter_factory is not None:
+                self._header.append((True, tag, attrib))
+            else:
+                self.factory.start(tag, attrib)
+            return
+
+        if self._sniffing():
+            self.sniffer.start(tag, attrib)
+
+        if tag == self._HOG:
+            self._depth += 1
+        self._family.append((True, tag, attrib))
+
+    def end(self, tag):
+
+        if self.filter_factory is not None:
+            self.filter_factory.end(tag)
+
+        if not self._in_groups:
+            if self.filter_factory is not None:
+                self._header.append((False, tag))
+            else:
+                self.factory.end(tag)
+            return
+
+        if tag == self._GROUPS:
+            self._finish()
+            self._in_groups = False
+            self.factory.end(tag)
+            return
+
+        if self._sniffing():
+            self.sniffer.end(tag)
+
+        self._family.append((False, tag))
+        if tag == self._HOG:
+            self._depth -= 1
+            if self._depth == 0:
+                self._close_family()
+
+    def _finish(self):
+        """Flush everything still buffered once the end of the <groups> element is reached."""
+        if self.sniffer is not None:
+            self._set_id_schema()
+
+        if self.filter_factory is not None:
+            self.filterObj.geneUniqueId = set(self.filter_factory.geneUniqueId)
+            self.filterObj.hogsId = set(self.filter_factory.hogsId)
+            self.factory.filterObj = self.filterObj
+            self._forward(self._header)
+            self._header = []
+
+        for family in self._pending:
+            self._forward(family)
+        self._pending = []
+
+    def data(self, data):
+        # Ignore data inside nodes
+        pass
+
+    def close(self):
+        # Nothing special to do here
+        return
 
 
 class PhyloXMLToETE:
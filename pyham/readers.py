@@ -0,0 +1,253 @@
+"""Readers feeding the XML parsers with an OrthoXML document in large blocks.
+
+A reader is a context manager iterating over the blocks of a document, each block being fed as is to a parser.
+Plain files are memory-mapped and the blocks are zero-copy views on the mapping, gzip compressed files are inflated
+by a background thread so that decompression overlaps with parsing, and in-memory documents (:obj:`str`,
+:obj:`bytes`, :obj:`bytearray` or :obj:`memoryview`) are sliced without copying the bytes-like ones.
+
+Blocks are :obj:`str` for a :obj:`str` document, else bytes-like objects. Memory views are only valid until the
+next block is requested.
+"""
+
+import gzip
+import logging
+import mmap
+import queue
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 1 << 20
+
+# number of inflated blocks the background thread can hold in advance.
+_PREFETCH = 4
+
+BYTES_LIKE = (bytes, bytearray, memoryview)
+
+
+def open_hog_file(source, in_memory=False, block_size=BLOCK_SIZE):
+    """  Open an OrthoXML document for reading by blocks.
+
+        Args:
+            | source: path to the file (gzip compressed if its name ends with '.gz') or, if in_memory is set, the
+            document itself as :obj:`str` or bytes-like object.
+            | in_memory (:obj:`Boolean`, optional): whether source is the document itself. Defaults to False.
+            | block_size (:obj:`int`, optional): size of the blocks. Defaults to 1 MiB.
+
+        Returns:
+            :obj:`BlockReader`
+    """
+
+    if in_memory:
+        return MemoryReader(source, block_size=block_size)
+    elif str(source).endswith('.gz'):
+        return GzipReader(source, block_size=block_size)
+    return MmapReader(source, block_size=block_size)
+
+
+def as_searchable(block):
+    """ Return block as :obj:`str` or :obj:`bytes` (copying it only if it is another bytes-like object)."""
+    if isinstance(block, (str, bytes)):
+        return block
+    return bytes(block)
+
+
+def find(block, marker):
+    """ Index of the first occurrence of marker in block, or -1. Bytes-like blocks are searched in place (the re
+    module accepts any buffer) instead of being copied to :obj:`bytes` first."""
+    if isinstance(block, (str, bytes)):
+        return block.find(marker)
+    match = re.search(re.escape(marker), block)
+    return -1 if match is None else match.start()
+
+
+def iter_until(blocks, marker):
+    """  Yield the parts of the blocks before the first occurrence of marker.
+
+        A marker cut by the end of a block is found by keeping the last len(marker) - 1 characters of each block
+        apart, so only these few characters are copied and the rest of the blocks is yielded as is.
+
+        Args:
+            | blocks: iterator of blocks (:obj:`str` or bytes-like objects).
+            | marker (:obj:`str`): text to look for, encoded for the bytes-like blocks.
+
+        Returns:
+            generator returning, once exhausted, the part of the block starting with the marker (or None if the
+            marker is not found). The other blocks are left in the iterator.
+    """
+
+    held = None  # end of the previous block, not yielded yet.
+    for block in blocks:
+        if not isinstance(block, str) and isinstance(marker, str):
+            marker = marker.encode()
+        keep = len(marker) - 1
+        if held:
+            idx = (held + as_searchable(block[:keep])).find(marker)
+            if idx != -1:
+                yield held[:idx]
+                return held[idx:] + as_searchable(block)
+        idx = find(block, marker)
+        if idx != -1:
+            if held:
+                yield held
+            yield block[:idx]
+            return block[idx:]
+        if len(block) >= keep:
+            if held:
+                yield held
+            yield block[:len(block) - keep]
+            held = as_searchable(block[len(block) - keep:])
+        else:
+            # short block: the marker could start in the previous one.
+            held = (held or as_searchable(block[:0])) + as_searchable(block)
+            if len(held) > keep:
+                yield held[:len(held) - keep]
+                held = held[len(held) - keep:]
+    if held:
+        yield held
+    return None
+
+
+def close_mapping(mm):
+    """ Close a memory mapping, unless memory views on it are still referenced.
+
+    This happens when a parser raises an error while it is fed a block: the traceback keeps the block alive while
+    the reader is closed. The mapping is then released with the last view instead of raising a :obj:`BufferError`
+    that would hide the error of the parser.
+    """
+    try:
+        mm.close()
+    except BufferError:
+        pass
+
+
+def skip_until(blocks, marker):
+    """  Consume the blocks up to the first occurrence of marker, see :obj:`iter_until`.
+
+        Returns:
+            the part of the block starting with the marker, or None if the marker is not found.
+    """
+    parts = iter_until(blocks, marker)
+    while True:
+        try:
+            next(parts)
+        except StopIteration as stop:
+            return stop.value
+
+
+class BlockReader(object):
+    """
+    Base class of the readers: iterating over a reader yields the blocks of the document, closing it (or leaving
+    its context) stops the iteration and releases the underlying resources.
+
+    Attributes:
+        | source: document or path to the document to read.
+        | block_size (:obj:`int`): size of the blocks.
+    """
+
+    def __init__(self, source, block_size=BLOCK_SIZE):
+        self.source = source
+        self.block_size = block_size
+        self._blocks = None
+
+    def _iter_blocks(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        if self._blocks is None:
+            self._blocks = self._iter_blocks()
+        return self._blocks
+
+    def close(self):
+        if self._blocks is not None:
+            self._blocks.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MemoryReader(BlockReader):
+    """
+    Reader of a document held in memory: :obj:`str` documents are yielded by :obj:`str` slices, bytes-like
+    documents by memory views on them.
+    """
+
+    def _iter_blocks(self):
+        if isinstance(self.source, str):
+            for start in range(0, len(self.source), self.block_size):
+                yield self.source[start:start + self.block_size]
+            return
+
+        with memoryview(self.source).cast('B') as view:
+            for start in range(0, len(view), self.block_size):
+                with view[start:start + self.block_size] as block:
+                    yield block
+
+
+class MmapReader(BlockReader):
+    """
+    Reader of a plain file, memory-mapped and yielded by memory views on the mapping.
+    """
+
+    def _iter_blocks(self):
+        with open(self.source, 'rb') as fh:
+            try:
+                mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                return
+            try:
+                with memoryview(mm) as view:
+                    for start in range(0, len(view), self.block_size):
+                        with view[start:start + self.block_size] as block:
+                            yield block
+            finally:
+                close_mapping(mm)
+
+
+class GzipReader(BlockReader):
+    """
+    Reader of a gzip compressed file. The file is inflated by a background thread (zlib releases the GIL) which
+    stays at most a few blocks ahead of the parser.
+    """
+
+    def _iter_blocks(self):
+        blocks = queue.Queue(maxsize=_PREFETCH)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    blocks.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def inflate():
+            try:
+                with gzip.open(self.source, 'rb') as fh:
+                    while not stop.is_set():
+                        block = fh.read(self.block_size)
+                        put(block)
+                        if not block:
+                            return
+            except BaseException as e:
+                put(e)
+
+        thread = threading.Thread(target=inflate, name='pyham-gzip-reader', daemon=True)
+        thread.start()
+        try:
+            while True:
+                block = blocks.get()
+                if isinstance(block, BaseException):
+                    raise block
+                if not block:
+                    return
+                yield block
+        finally:
+            stop.set()
+            thread.join()
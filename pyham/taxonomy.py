@@ -3,17 +3,47 @@ import warnings
 import gzip
 import re
 import collections
+import hashlib
 from os import PathLike
 from typing import Union, Optional
 from xml.etree.ElementTree import XMLParser
+import numpy as np
 from ete4 import Tree
 
 from .genome import ExtantGenome, AncestralGenome, Genome
+from .id_formats import taxid_for_taxon
 
 logger = logging.getLogger(__name__)
 
+# schemes of the names generated for the internal nodes when the internal names of the species tree are not used.
+INTERNAL_NAME_SCHEMES = ('concat', 'compact')
 
-def create_tree_from_newick(tree: Union[str, PathLike], tree_format: Optional[str] = None, use_internal_name: bool = False, quoted_node_names: bool = True):
+
+def name_internal_nodes(tree, scheme='concat'):
+    """  Name the internal nodes of a tree after their children, in post-order.
+
+    With the 'concat' scheme a node is named by joining the names of its children with '/', i.e. of all the leaves of
+    its subtree: the total length of the names grows with the number of leaves times the depth of the tree. With the
+    'compact' scheme it is named 'clade_' followed by a digest of the names of its children, as stable as the
+    concatenated name (it only depends on the subtree) but of constant length; the concatenated name is still
+    available with :obj:`Taxonomy.get_full_label` and can be used to search the node.
+
+        Args:
+            | tree (:obj:`ete4 Tree`): tree to name.
+            | scheme (:obj:`str`, optional): 'concat' or 'compact'. Defaults to 'concat'.
+    """
+    if scheme not in INTERNAL_NAME_SCHEMES:
+        raise ValueError("internal_name_scheme must be one of {}, got {}".format(', '.join(INTERNAL_NAME_SCHEMES), scheme))
+    for node in tree.traverse("postorder"):
+        if not node.is_leaf:
+            if scheme == 'concat':
+                node.name = '/'.join(child.name for child in node.get_children())
+            else:
+                digest = hashlib.blake2b('\0'.join(child.name for child in node.get_children()).encode(), digest_size=8)
+                node.name = 'clade_' + digest.hexdigest()
+
+
+def create_tree_from_newick(tree: Union[str, PathLike], tree_format: Optional[str] = None, use_internal_name: bool = False, quoted_node_names: bool = True, internal_name_scheme: str = 'concat'):
     if tree_format is None:
         tree_format = 'newick_string' if isinstance(tree, str) and tree.strip().startswith('(') else 'newick'
     if tree_format == 'newick_string':
@@ -29,15 +59,13 @@ def create_tree_from_newick(tree: Union[str, PathLike], tree_format: Optional[st
         raise ValueError("tree_format must be 'newick' or 'newick_string'")
 
     if not use_internal_name:
-        # Generate internal node names by concatenating children names
-        for node in tree.traverse("postorder"):
-            if not node.is_leaf:
-                node.name = '/'.join(child.name for child in node.get_children())
+        # Generate internal node names from the children names
+        name_internal_nodes(tree, internal_name_scheme)
 
     return tree
 
 
-def create_tree_from_phyloxml(tree: Union[str, PathLike], phyloxml_leaf_name_tag='clade_name', phyloxml_internal_name_tag='clade_name', use_internal_name=True):
+def create_tree_from_phyloxml(tree: Union[str, PathLike], phyloxml_leaf_name_tag='clade_name', phyloxml_internal_name_tag='clade_name', use_internal_name=True, internal_name_scheme='concat'):
     from .parsers import PhyloXMLToETE
     factory = PhyloXMLToETE()
     parser = XMLParser(target=factory)
@@ -46,6 +74,7 @@ def create_tree_from_phyloxml(tree: Union[str, PathLike], phyloxml_leaf_name_tag
     with open_(tree, 'rt') as fh:
         for line in fh:
             parser.feed(line)
+    parser.close()
 
     def set_leaf_name(node):
         attr = phyloxml_leaf_name_tag.split('_', 1)[-1]
@@ -54,25 +83,244 @@ def create_tree_from_phyloxml(tree: Union[str, PathLike], phyloxml_leaf_name_tag
             raise KeyError(f"Node {node} in the phyloxml file {tree} has no {phyloxml_leaf_name_tag} attribute to populate the species name")
 
     def set_internal_name(node):
-        if not use_internal_name:
-            # Generate internal node names by concatenating children names
-            node.name = '/'.join(child.name for child in node.get_children())
-        else:
-            attr = phyloxml_internal_name_tag.split('_', 1)[-1]
-            node.name = node.props.get(attr, None)
-            if node.name is None:
-                raise KeyError(f"Node {node} in the phyloxml file {tree} has no {phyloxml_internal_name_tag} attribute to populate the species name")
+        attr = phyloxml_internal_name_tag.split('_', 1)[-1]
+        node.name = node.props.get(attr, None)
+        if node.name is None:
+            raise KeyError(f"Node {node} in the phyloxml file {tree} has no {phyloxml_internal_name_tag} attribute to populate the species name")
 
     for node in factory.root.traverse("postorder"):
         # assign name to extant species
         if node.is_leaf:
             set_leaf_name(node)
-        else:
+        elif use_internal_name:
             set_internal_name(node)
 
+    if not use_internal_name:
+        # Generate internal node names from the children names
+        name_internal_nodes(factory.root, internal_name_scheme)
+
     return factory.root
 
 
+def _as_taxid(value):
+    """Numeric taxid of a genome (e.g. its NCBITaxId attribute), None if it has none."""
+    try:
+        taxid = int(value)
+    except (TypeError, ValueError):
+        return None
+    return taxid if taxid >= 0 else None
+
+
+def _sum_to_root(parent, weight):
+    """  Sum of the weights of each node and of all its ancestors, by pointer jumping (log2(depth) passes)."""
+    total = np.array(weight, dtype=np.int64)
+    up = np.array(parent, dtype=np.int64)
+    pending = np.flatnonzero(up >= 0)
+    for _ in range(len(parent).bit_length() + 1):
+        if not len(pending):
+            return total
+        ancestors = up[pending]
+        total[pending] += total[ancestors]
+        up[pending] = up[ancestors]
+        pending = pending[up[pending] >= 0]
+    raise ValueError("The parent array of the taxonomy has a cycle.")
+
+
+def _subtree_sizes(parent, depth):
+    """  Number of nodes of the subtree of each node, summed level by level from the deepest one."""
+    size = np.ones(len(parent), dtype=np.int64)
+    order = np.argsort(depth, kind='stable')
+    bounds = np.searchsorted(depth[order], np.arange(depth.max() + 2))
+    for d in range(len(bounds) - 2, 0, -1):
+        level = order[bounds[d]:bounds[d + 1]]
+        np.add.at(size, parent[level], size[level])
+    return size
+
+
+class TaxonomyCore(object):
+    """
+    TaxonomyCore is the array representation of a species tree used by :obj:`Taxonomy` for its ancestry and MRCA
+    queries. The nodes are numbered in pre-order (the root is 0), node i has the name names[i] and its children are
+    children[child_offsets[i]:child_offsets[i + 1]].
+
+    It is built without any ete4 object, e.g. from the taxonomy embedded in an OrthoXML file or from the parent
+    array of an NCBI-scale taxonomy, and :obj:`TaxonomyCore.as_ete` builds the ete4 tree used for rendering and
+    export.
+
+    Attributes:
+        | parent (:obj:`numpy.ndarray`): parent of each node, -1 for the root.
+        | child_offsets (:obj:`numpy.ndarray`): offsets of the children of each node in children, n + 1 values.
+        | children (:obj:`numpy.ndarray`): children of all the nodes, grouped by parent.
+        | depth (:obj:`numpy.ndarray`): depth of each node, 0 for the root.
+        | post (:obj:`numpy.ndarray`): post-order number of each node.
+        | names (:obj:`list`): name of each node.
+        | taxids (:obj:`numpy.ndarray`): numeric taxon id of each node, -1 if it has none.
+
+    A node is an ancestor of another one if its pre-order number is lower and its post-order number higher. For two
+    nodes numbered i < j, their MRCA is the parent of the shallowest node numbered in (i, j], found in constant time
+    with a sparse table of the shallowest node of each range of 2^k numbers; the table (n log2(n) int32) is only
+    built at the first MRCA query.
+
+    """
+
+    __slots__ = ('parent', 'child_offsets', 'children', 'depth', 'post', 'names', 'taxids', '_sparse')
+
+    def __init__(self, parent, names, taxids=None):
+        """
+        Args:
+            | parent (array-like of :obj:`int`): parent of each node, -1 for the root. The nodes are renumbered in
+            pre-order, the children of a node keep the order of their numbers.
+            | names (:obj:`list`): name of each node.
+            | taxids (array-like of :obj:`int`, optional): numeric taxon id of each node, -1 if it has none.
+        """
+        parent = np.asarray(parent, dtype=np.int64)
+        n = len(parent)
+        if n == 0:
+            raise ValueError("A taxonomy needs at least one node.")
+        if len(names) != n or (taxids is not None and len(taxids) != n):
+            raise ValueError("Expect a name and a taxid for each of the {} nodes.".format(n))
+        if parent.min() < -1 or parent.max() >= n:
+            raise ValueError("Parent out of range of the {} nodes of the taxonomy.".format(n))
+        roots = np.flatnonzero(parent < 0)
+        if len(roots) != 1:
+            raise ValueError("Expect a single root in the taxonomy, got {}.".format(len(roots)))
+
+        depth = _sum_to_root(parent, parent >= 0)
+        size = _subtree_sizes(parent, depth)
+
+        # pre-order number: parent's number + 1 + the sizes of the preceding siblings, summed from the root.
+        by_parent = np.argsort(parent, kind='stable')
+        preceding = np.cumsum(size[by_parent]) - size[by_parent]
+        first_sibling = np.searchsorted(parent[by_parent], parent[by_parent])
+        step = np.empty(n, dtype=np.int64)
+        step[by_parent] = preceding - preceding[first_sibling] + 1
+        step[roots] = 0
+        pre = _sum_to_root(parent, step)
+
+        taxids = np.full(n, -1, dtype=np.int64) if taxids is None else np.asarray(taxids, dtype=np.int64)
+        if (pre != np.arange(n)).any():
+            order = np.empty(n, dtype=np.int64)
+            order[pre] = np.arange(n)
+            parent = np.where(parent[order] >= 0, pre[parent[order]], -1)
+            depth, size, taxids = depth[order], size[order], taxids[order]
+            names = [names[i] for i in order.tolist()]
+
+        self.parent = parent.astype(np.int32)
+        self.depth = depth.astype(np.int32)
+        self.post = (np.arange(n) + size - 1 - depth).astype(np.int32)
+        self.names = list(names)
+        self.taxids = taxids
+        self.child_offsets = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(np.bincount(parent[1:], minlength=n), out=self.child_offsets[1:])
+        self.children = (np.argsort(parent[1:], kind='stable') + 1).astype(np.int32)
+        self._sparse = None
+
+    @classmethod
+    def from_ete(cls, tree):
+        """  Create a TaxonomyCore from an ete4 tree, numbered like tree.traverse('preorder').
+
+        Args:
+            | tree (:obj:`ete4 Tree`): species tree.
+
+        Returns:
+            :obj:`TaxonomyCore`.
+        """
+        return cls._from_ete_nodes(list(tree.traverse('preorder')))
+
+    @classmethod
+    def _from_ete_nodes(cls, nodes):
+        node_index = {node: i for i, node in enumerate(nodes)}
+        parent = np.fromiter((node_index.get(node.up, -1) for node in nodes), dtype=np.int64, count=len(nodes))
+        taxids = [taxid_for_taxon(node) for node in nodes]
+        return cls(parent, [node.name for node in nodes], [-1 if taxid is None else taxid for taxid in taxids])
+
+    def __len__(self):
+        return len(self.parent)
+
+    def as_ete(self):
+        """  Build the ete4 tree of the taxonomy, for rendering and export. The nodes have the name and, if they have
+        one, the numeric taxon id as 'id' property.
+
+        Returns:
+            :obj:`ete4 Tree` root of the tree.
+        """
+        return self._ete_nodes()[0]
+
+    def _ete_nodes(self):
+        """  ete4 nodes of the taxonomy, in pre-order."""
+        nodes = [Tree({'name': name}) if taxid < 0 else Tree({'name': name, 'id': taxid})
+                 for name, taxid in zip(self.names, self.taxids.tolist())]
+        for i, parent in enumerate(self.parent[1:].tolist(), 1):
+            nodes[parent].add_child(nodes[i])
+        return nodes
+
+    def get_children(self, i):
+        """  Children of the node numbered i."""
+        return self.children[self.child_offsets[i]:self.child_offsets[i + 1]]
+
+    def get_subtree(self, i):
+        """  Numbers of the nodes of the subtree rooted at the node numbered i (itself included)."""
+        return range(i, i + int(self.post[i]) - i + int(self.depth[i]) + 1)
+
+    def is_ancestor(self, i, j):
+        """  True if the node numbered i is a strict ancestor of the node numbered j."""
+        return i < j and self.post[i] > self.post[j]
+
+    def mrca(self, i, j):
+        """  Number of the MRCA of the nodes numbered i and j."""
+        if i > j:
+            i, j = j, i
+        elif i == j:
+            return i
+        sparse = self._sparse
+        if sparse is None:
+            sparse = self._build_sparse()
+        i += 1
+        level = (j - i + 1).bit_length() - 1
+        a = sparse[level, i]
+        b = sparse[level, j - (1 << level) + 1]
+        return int(self.parent[a if self.depth[a] <= self.depth[b] else b])
+
+    def mrca_many(self, first, second=None):
+        """  Numbers of the MRCA of many pairs or sets of nodes, see :obj:`Taxonomy.mrca_many`."""
+        n = len(self.parent)
+        first = np.asarray(first, dtype=np.int64)
+        if second is None:
+            if first.ndim != 2 or first.shape[1] == 0:
+                raise ValueError("Expect a 2-d array with at least one node per row, got shape {}".format(first.shape))
+            low, high = first.min(axis=1), first.max(axis=1)
+        else:
+            first, second = np.broadcast_arrays(first, np.asarray(second, dtype=np.int64))
+            low, high = np.minimum(first, second), np.maximum(first, second)
+        if low.size and (low.min() < 0 or high.max() >= n):
+            raise IndexError("Node index out of range of the {} nodes of the taxonomy".format(n))
+
+        sparse = self._sparse
+        if sparse is None:
+            sparse = self._build_sparse()
+        same = low == high
+        start = np.where(same, low, low + 1)
+        level = np.frexp(high - start + 1)[1] - 1
+        a = sparse[level, start]
+        b = sparse[level, high - (1 << level) + 1]
+        shallowest = np.where(self.depth[a] <= self.depth[b], a, b)
+        return np.where(same, low, self.parent[shallowest])
+
+    def _build_sparse(self):
+        """  Row k of the sparse table holds for each number i the shallowest node numbered in [i, i + 2^k)."""
+        n, depth = len(self.parent), self.depth
+        sparse = np.empty((n.bit_length(), n), dtype=np.int32)
+        sparse[0] = np.arange(n, dtype=np.int32)
+        for k in range(1, len(sparse)):
+            half = 1 << (k - 1)
+            a, b = sparse[k - 1, :n - half], sparse[k - 1, half:]
+            sparse[k, :n - half] = np.where(depth[a] <= depth[b], a, b)
+            # ranges running past the last node are never queried.
+            sparse[k, n - half:] = sparse[k - 1, n - half:]
+        self._sparse = sparse
+        return sparse
+
+
 class Taxonomy(object):
     """
     Taxonomy is a class to wrap the ete4 tree used as reference species tree by Ham.
@@ -82,18 +330,39 @@ class Taxonomy(object):
         | tree (:obj:`ete4 Tree`): species ete4 Tree tree.
         | internal_nodes (:obj:`set`): Set of Tree node that contained a AncestralGenome.
         | leaves (:obj:`set`): Set of Tree node that contained a ExtantGenome.
+        | core (:obj:`TaxonomyCore`): arrays of the tree, numbered like tree.traverse('preorder').
+
+    The nodes are numbered in pre-order when the Taxonomy is built (see :obj:`Taxonomy.get_node_index`) and the
+    ancestry and MRCA queries are answered from the arrays of its :obj:`TaxonomyCore`; the MRCA of k nodes is the one
+    of the first and the last of them in pre-order.
 
     """
+
+    # node attributes indexed for all the nodes when the Taxonomy is built.
+    _indexed_attrs = frozenset(('name', 'id', 'taxon_id', 'taxid'))
+
     def __init__(self, tree, **kwargs):
         """
         Args:
-            | tree_file (:obj:`str`): Path to the file that contained the taxonomy information.
+            | tree_file (:obj:`str`): Path to the file that contained the taxonomy information, or the species tree as
+            an :obj:`ete4 Tree` or a :obj:`TaxonomyCore`.
             | tree_format (:obj:`str`): type of inputted tree file. Defaults to newick_string. Can be 'newick', 'phyloxml, 'newick_string'.
             | use_internal_name (:obj:`Boolean`, optional): Specify wheter using the given internal node name or use the
             | concatenatation of the children name. Defaults to False.
             | quoted_node_names (:obj:'Boolean', optional): Specify whether newick file has quoted node names.
+            | internal_name_scheme (:obj:`str`, optional): names generated for the internal nodes when the internal
+            names are not used, see :obj:`name_internal_nodes`. With 'compact', the nodes can also be searched by
+            their concatenated name. Defaults to 'concat'.
         """
-        if not isinstance(tree, Tree):
+        internal_name_scheme = kwargs.pop('internal_name_scheme', 'concat')
+        if internal_name_scheme not in INTERNAL_NAME_SCHEMES:
+            raise ValueError("internal_name_scheme must be one of {}, got {}".format(', '.join(INTERNAL_NAME_SCHEMES),
+                                                                                    internal_name_scheme))
+        core = nodes = None
+        if isinstance(tree, TaxonomyCore):
+            core, nodes = tree, tree._ete_nodes()
+            self.tree = nodes[0]
+        elif not isinstance(tree, Tree):
             # old style API
             warnings.warn("Taxonomy should be constructed from Taxonomy.from_newick or Taxonomy.from_phyloxml", DeprecationWarning)
             tree_format = kwargs.pop('tree_format', 'newick_string')
@@ -101,7 +370,8 @@ class Taxonomy(object):
                 quoted_node_names = kwargs.pop('quoted_node_names', True)
                 use_internal_name = kwargs.get('use_internal_name', False)
                 self.tree = create_tree_from_newick(
-                    tree, tree_format=tree_format, use_internal_name=use_internal_name, quoted_node_names=quoted_node_names
+                    tree, tree_format=tree_format, use_internal_name=use_internal_name, quoted_node_names=quoted_node_names,
+                    internal_name_scheme=internal_name_scheme
                 )
             elif tree_format == 'phyloxml':
                 phyloxml_leaf_name_tag = kwargs.pop('phyloxml_leaf_name_tag', 'clade_name')
@@ -111,27 +381,33 @@ class Taxonomy(object):
                     tree,
                     phyloxml_leaf_name_tag=phyloxml_leaf_name_tag,
                     phyloxml_internal_name_tag=phyloxml_internal_name_tag,
-                    use_internal_name=use_internal_name
+                    use_internal_name=use_internal_name,
+                    internal_name_scheme=internal_name_scheme
                 )
+            if use_internal_name:
+                internal_name_scheme = 'concat'
         else:
             # new style API: tree is already an Tree object
             self.tree = tree
 
-        # lookup table for attr, value pairs
-        self._node_lookup = {}
+        self.internal_name_scheme = internal_name_scheme
 
         # check unicity of leaves name.
         self._check_consistency_names()
 
-        # add depth to each node of the tree.
-        self._add_depth(self.tree.root, depth=0)
+        # lookup table for attr, value pairs
+        self._build_node_lookup()
+
+        # pre-order numbering of the nodes and their arrays (depth, parent, ...) for the ancestry and MRCA queries.
+        self._build_node_index(core, nodes)
 
         # tracker for Genome created.
         self.internal_nodes = set()
         self.leaves = set()
 
     @classmethod
-    def from_newick(cls, tree: Union[str, PathLike], use_internal_name=False, quoted_node_names=True):
+    def from_newick(cls, tree: Union[str, PathLike], use_internal_name=False, quoted_node_names=True,
+                    internal_name_scheme='concat'):
         """  Create a Taxonomy object from a newick file or string.
 
         Args:
@@ -139,12 +415,15 @@ class Taxonomy(object):
             | use_internal_name (:obj:`Boolean`, optional): Specify whether using the given internal node name or use the
             | concatenatation of the children name. Defaults to False.
             | quoted_node_names (:obj:'Boolean', optional): Specify whether the newick tree has quoted node names. Defaults to True.
+            | internal_name_scheme (:obj:`str`, optional): 'concat' or 'compact', see :obj:`name_internal_nodes`.
+            Defaults to 'concat'.
 
         Returns:
             obj:`Taxonomy`: Taxonomy object with the ete3 tree.
         """
-        tree_inst = create_tree_from_newick(tree, quoted_node_names=quoted_node_names, use_internal_name=use_internal_name)
-        return cls(tree_inst)
+        tree_inst = create_tree_from_newick(tree, quoted_node_names=quoted_node_names, use_internal_name=use_internal_name,
+                                            internal_name_scheme=internal_name_scheme)
+        return cls(tree_inst, internal_name_scheme='concat' if use_internal_name else internal_name_scheme)
 
     @classmethod
     def from_phyloxml(cls, tree: Union[str, PathLike], phyloxml_leaf_name_tag='clade_name', phyloxml_internal_name_tag='clade_name'):
@@ -155,20 +434,49 @@ class Taxonomy(object):
     def from_ete_tree(cls, tree: Tree):
         return cls(tree)
 
+    @classmethod
+    def from_core(cls, core):
+        """  Create a Taxonomy object from a :obj:`TaxonomyCore`, its ete4 tree is built with :obj:`TaxonomyCore.as_ete`.
+
+        Args:
+            | core (:obj:`TaxonomyCore`): arrays of the species tree.
+
+        Returns:
+            obj:`Taxonomy`: Taxonomy object sharing the given core.
+        """
+        return cls(core)
+
     @property
     def tree_str(self):
         return self.tree.write(parser=8, format_root_node=True)
 
     def nodes_by_attr(self, **kwargs):
+        """Yield the nodes whose attributes have all the given values, e.g. nodes_by_attr(name='Primates').
+
+        The name, the orthoxml 'id', the phyloxml 'taxon_id' and the numeric 'taxid' (see
+        :obj:`Taxonomy.get_node_by_taxid`) of all nodes are indexed when the Taxonomy is built. The nodes are
+        searched for any other attribute (or an unhashable value), without caching as the node properties can change.
+        With the 'compact' internal_name_scheme, a name can also be the concatenated name of an internal node (see
+        :obj:`Taxonomy.get_full_label`).
+        """
         nodes = None
         for key, val in kwargs.items():
-            if (key, val) not in self._node_lookup:
-                self._node_lookup[(key, val)] = set(self.tree.search_nodes(**{key: val}))
+            found = None
+            if key in self._indexed_attrs:
+                try:
+                    found = self._node_lookup.get((key, val), ())
+                except TypeError:
+                    pass
+                else:
+                    if not found and key == 'name':
+                        found = self._nodes_by_full_label(val)
+            if found is None:
+                found = tuple(self.tree.search_nodes(**{key: val}))
             if nodes is None:
-                nodes = self._node_lookup[(key, val)].copy()
+                nodes = found
             else:
-                nodes &= self._node_lookup[(key, val)]
-        yield from nodes
+                nodes = [node for node in nodes if node in found]
+        yield from nodes or ()
 
     def get_node_by_name(self, name):
         """Return the node with the given name.
@@ -179,13 +487,64 @@ class Taxonomy(object):
             Returns:
                 :obj:`ete4.TreeNode`: node with the given name.
         """
-        node = list(self.nodes_by_attr(name=name))
+        node = self._node_lookup.get(('name', name))
+        if node is None:
+            node = self._nodes_by_full_label(name)
         if not node:
             raise KeyError("Node with name '{}' not found in the taxonomy".format(name))
         if len(node) > 1:
             raise KeyError("Multiple nodes with name '{}' found in the taxonomy".format(name))
         return node[0]
 
+    def get_node_by_taxid(self, taxid):
+        """Return the node with the given numeric taxon id: the orthoxml 'id' or phyloxml 'taxon_id' of the node, or
+        the NCBI taxid of the extant genome attached to it.
+
+            Args:
+                | taxid (:obj:`int`): taxon id of the node to search.
+
+            Returns:
+                :obj:`ete4.TreeNode`: node with the given taxon id.
+        """
+        node = self._node_lookup.get(('taxid', taxid), ())
+        if not node:
+            raise KeyError("Node with taxid '{}' not found in the taxonomy".format(taxid))
+        if len(node) > 1:
+            raise KeyError("Multiple nodes with taxid '{}' found in the taxonomy".format(taxid))
+        return node[0]
+
+    def get_full_label(self, node):
+        """Return the concatenated name of a node: the names of the leaves of its subtree in pre-order joined with
+        '/', which is the name of the internal nodes with the 'concat' internal_name_scheme.
+
+            Args:
+                | node (:obj:`ete4.TreeNode`): node of the taxonomy.
+
+            Returns:
+                :obj:`str`, the name of the node for a leaf.
+        """
+        subtree = self.core.get_subtree(self._node_index[node])
+        subtree = np.arange(subtree.start, subtree.stop)
+        offsets, names = self.core.child_offsets, self.core.names
+        leaves = subtree[offsets[subtree] == offsets[subtree + 1]]
+        return '/'.join(names[i] for i in leaves.tolist())
+
+    def _nodes_by_full_label(self, label):
+        """  Nodes whose concatenated name is label with the 'compact' internal_name_scheme, cached in the lookup."""
+        if self.internal_name_scheme != 'compact' or not isinstance(label, str) or '/' not in label:
+            return ()
+        leaves = []
+        for name in label.split('/'):
+            leaf = [node for node in self._node_lookup.get(('name', name), ()) if node.is_leaf]
+            if not leaf:
+                return ()
+            leaves.append(self._node_index[leaf[0]])
+        mrca = self.core.mrca(min(leaves), max(leaves))
+        if self.get_full_label(self._nodes[mrca]) != label:
+            return ()
+        found = self._node_lookup[('name', label)] = (self._nodes[mrca],)
+        return found
+
     def get_extant_taxa_by_name(self, name):
         """Return the extant taxa with the given name.
 
@@ -195,6 +554,10 @@ class Taxonomy(object):
             Returns:
                 :obj:`ete4.TreeNode`: node with the given name.
         """
+        leaves = [node for node in self._node_lookup.get(('name', name), ()) if node.is_leaf]
+        if len(leaves) == 1:
+            # the internal nodes with a single child get the concatenated name of their leaf.
+            return leaves[0]
         node = self.get_node_by_name(name=name)
         if len(node.children) > 0:
             cand = []
@@ -224,6 +587,7 @@ class Taxonomy(object):
 
         if isinstance(genome, ExtantGenome):
             self.leaves.add(node)
+            self._index_node(node, 'taxid', _as_taxid(genome.taxid))
         elif isinstance(genome, AncestralGenome):
             genome.name = node.name
             self.internal_nodes.add(node)
@@ -250,7 +614,47 @@ class Taxonomy(object):
 
     def get_mrca_taxnode(self, *tax_nodes):
         """  return the most recent common ancestor of the given tax nodes."""
-        return self.tree.common_ancestor(tax_nodes)
+        if not tax_nodes:
+            raise ValueError("At least one node is required to get a MRCA.")
+        node_index = self._node_index
+        indexes = [node_index[node] for node in tax_nodes]
+        return self._nodes[self.core.mrca(min(indexes), max(indexes))]
+
+    def get_node_index(self, node):
+        """  return the pre-order number of a node of the taxonomy, used by :obj:`Taxonomy.mrca_many`.
+
+            Args:
+                | node (:obj:`node`): node of the taxonomy.
+
+            Returns:
+                :obj:`int`, 0 for the root.
+        """
+        return self._node_index[node]
+
+    def get_node_by_index(self, index):
+        """  return the node of the taxonomy with the given pre-order number.
+
+            Args:
+                | index (:obj:`int`): pre-order number, see :obj:`Taxonomy.get_node_index`.
+
+            Returns:
+                :obj:`node`.
+        """
+        return self._nodes[index]
+
+    def mrca_many(self, first, second=None):
+        """  return the MRCA of many pairs or sets of nodes given by their pre-order numbers (see
+        :obj:`Taxonomy.get_node_index`).
+
+            Args:
+                | first (array-like of :obj:`int`): first node of each pair, or if second is None a 2-d array with a
+                set of nodes per row.
+                | second (array-like of :obj:`int`, optional): second node of each pair, broadcast against first.
+
+            Returns:
+                :obj:`numpy.ndarray` of the pre-order numbers of the MRCAs.
+        """
+        return self.core.mrca_many(first, second)
 
     def get_path_up(self, lowest_node, ancestor_node):
         """
@@ -262,17 +666,14 @@ class Taxonomy(object):
                 | ancestor_node (:obj:`node`): Oldest node.
                 
             Returns:
-                list of node sorted from most recent to oldest.
+                :obj:`tuple` of node sorted from most recent to oldest.
 
         """
-        intermediate_level = []
-        for tax in lowest_node.ancestors():
-            if tax == ancestor_node:
-                break
-            intermediate_level.append(tax)
-        else:
+        i, ancestor = self._node_index[lowest_node], self._node_index[ancestor_node]
+        if not self.core.is_ancestor(ancestor, i):
             raise ValueError(f"lowest_node ({lowest_node} is not a child of {ancestor_node}")
-        return intermediate_level
+        depth = self.core.depth
+        return self._get_lineage(i)[:depth[i] - depth[ancestor] - 1]
 
     def is_child_recursive(self, node, ancestor_node):
         """  Check if the node is a child of the ancestor node.
@@ -284,10 +685,7 @@ class Taxonomy(object):
             Returns:
                 obj:`bool` True if the node is a child of the ancestor node.
         """
-        for tax in node.ancestors():
-            if tax == ancestor_node:
-                return True
-        return False
+        return self.core.is_ancestor(self._node_index[ancestor_node], self._node_index[node])
 
     def get_newick_from_tree(self, node):
         """  return the newick tree string (format 8: all names) rooted at the given node.
@@ -318,9 +716,6 @@ class Taxonomy(object):
             else:
                 int_names.append(node.name)
 
-            self._node_lookup[('name', node.name)] = {node}
-            if 'id' in node.props:
-                self._node_lookup[('id', node.props['id'])] = {node}
 
 
         # check for leave names
@@ -335,13 +730,56 @@ class Taxonomy(object):
             dupl = [k for k, c in dupl.items() if c > 1]
             raise KeyError(f"Internal Names are not unique. The following internal names appear multiple times: {dupl}.")
 
-    def _add_depth(self, node:Tree, depth=0):
-        """  
-        Recursive function to add depth to each node of a Etree.
+    def _build_node_lookup(self):
+        """
+        Index the nodes (in level order) by the value of each of their indexed attributes: name, id, taxon_id and
+        the numeric taxid derived from the two latter.
+        """
+        self._node_lookup = {}
+        for node in self.tree.traverse():
+            self._index_node(node, 'name', node.name)
+            for key in ('id', 'taxon_id'):
+                if key in node.props:
+                    self._index_node(node, key, node.props[key])
+            self._index_node(node, 'taxid', taxid_for_taxon(node))
+
+    def _index_node(self, node, key, value):
+        if value is None and key != 'name':
+            return
+        nodes = self._node_lookup.get((key, value), ())
+        if node not in nodes:
+            self._node_lookup[(key, value)] = nodes + (node,)
+
+    def _build_node_index(self, core=None, nodes=None):
+        """
+        Number the nodes in pre-order, build their :obj:`TaxonomyCore` (unless the Taxonomy is built from one) and
+        add its depth to each node of the tree.
         """
-        node.add_prop("depth", depth)
-        for n in node.get_children():
-            self._add_depth(n, depth + 1)
+        if core is None:
+            nodes = list(self.tree.traverse('preorder'))
+            core = TaxonomyCore._from_ete_nodes(nodes)
+        self.core = core
+        self._nodes = nodes
+        self._node_index = {node: i for i, node in enumerate(nodes)}
+        # ancestors of the nodes, from their parent to the root, for the nodes queried so far.
+        self._lineages = {}
+        for node, depth in zip(nodes, core.depth.tolist()):
+            node.add_prop("depth", depth)
+
+    def _get_lineage(self, i):
+        """  Ancestors of the node numbered i, from its parent to the root, as a tuple (cached)."""
+        lineage = self._lineages.get(i)
+        if lineage is None:
+            parent, nodes, ancestors = self.core.parent, self._nodes, []
+            j = int(parent[i])
+            while j >= 0:
+                ancestors.append(nodes[j])
+                j = int(parent[j])
+            lineage = tuple(ancestors)
+            if len(self._lineages) >= 1 << 14:
+                self._lineages.clear()
+            self._lineages[i] = lineage
+        return lineage
 
 
 def build_taxon_node(id, name=None, **kwargs):
@@ -0,0 +1,21 @@
+from pyham.abstractgene import HOG
+
+
+def _label(gene):
+    return gene.hog_id if isinstance(gene, HOG) else gene.unique_id
+
+
+def ham_content(ham_analysis):
+    """ Content of a Ham analysis, in order, to check that two ways of building it give the same analysis: the
+    AbstractGenes of each genome (with their parent and duplications), the top level HOGs, the gene maps and the
+    id schema."""
+    genomes = []
+    for node in ham_analysis.taxonomy.tree.traverse('preorder'):
+        genome = node.props.get('genome')
+        if genome is None:
+            continue
+        genomes.append((genome.name, [(_label(g), _label(g.parent) if g.parent is not None else None,
+                                       bool(g.arose_by_duplication), len(getattr(g, 'duplications', [])))
+                                      for g in genome.genes]))
+    return (genomes, list(ham_analysis.top_level_hogs), list(ham_analysis.extant_gene_map),
+            {key: list(value) for key, value in ham_analysis.external_id_mapper.items()}, ham_analysis.id_schema)
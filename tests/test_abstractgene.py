@@ -1,7 +1,10 @@
 import unittest
-from pyham import Gene, HOG, AbstractGene, AncestralGenome, ExtantGenome, utils, ham
-from pyham.abstractgene import EvolutionaryConceptError as ECE
+from pyham import Gene, HOG, AbstractGene, AncestralGenome, ExtantGenome, utils, ham, abstractgene
+from pyham.abstractgene import EvolutionaryConceptError as ECE, DuplicationNode
 import os
+import pickle
+import weakref
+import sys
 
 class GeneTest(unittest.TestCase):
 
@@ -57,14 +60,43 @@ class HogTest(unittest.TestCase):
         b = HOG(id="b")
         c = HOG(id="b")
 
-        self.assertListEqual(a.children, [])
+        self.assertEqual(a.children, [])
 
         a.add_child(b)
         a.add_child(c)
-        self.assertListEqual(a.children, [b,c])
+        self.assertEqual(a.children, [b,c])
 
         a.remove_child(b)
-        self.assertListEqual(a.children, [c])
+        self.assertEqual(a.children, [c])
+        with self.assertRaises(ValueError):
+            a.remove_child(b)
+
+    def test_children_of_large_family(self):
+        a = HOG(id="a")
+        genes = [Gene(str(i)) for i in range(100)]
+        for gene in genes:
+            a.add_child(gene)
+        self.assertIsInstance(a.children, abstractgene.ChildList)
+
+        for gene in genes[::2]:
+            a.remove_child(gene)
+        self.assertEqual(a.children, genes[1::2])
+        self.assertEqual(len(a.children), 50)
+        self.assertNotIn(genes[0], a.children)
+        self.assertIn(genes[1], a.children)
+        self.assertIs(a.children[0], genes[1])
+        self.assertIs(a.children[-1], genes[-1])
+        self.assertEqual(list(reversed(a.children)), genes[:0:-2])
+        self.assertEqual(a.children.index(genes[5]), 2)
+        self.assertIsNone(genes[0].parent)
+
+        a.add_child(genes[0])
+        self.assertIs(a.children[-1], genes[0])
+        with self.assertRaises(ValueError):
+            a.remove_child(genes[2])
+        copy = pickle.loads(pickle.dumps(a))
+        self.assertEqual([gene.unique_id for gene in copy.children], [gene.unique_id for gene in a.children])
+        self.assertTrue(all(gene.parent is copy for gene in copy.children))
 
     def test_only_one_genome_possible(self):
         h = HOG()
@@ -104,6 +136,74 @@ class HogTest(unittest.TestCase):
         with self.assertRaises(KeyError):
             a.score('testscore')
 
+    def test_compact_layout(self):
+        a, b = HOG(id="a"), HOG(id="b")
+        g = Gene(id="1")
+        for obj in (a, b, g):
+            self.assertFalse(hasattr(obj, '__dict__'))
+            self.assertIs(weakref.ref(obj)(), obj)
+            with self.assertRaises(AttributeError):
+                obj.foo = 1
+        duplication = DuplicationNode()
+        self.assertIs(weakref.ref(duplication)(), duplication)
+        self.assertIs(a._properties, b._properties)
+        self.assertFalse(hasattr(a, 'scores'))
+        self.assertFalse(hasattr(g, 'hog_id'))
+        with self.assertRaises(KeyError):
+            a['TaxRange']
+
+        a.add_property('TaxRange', 'Mammalia')
+        self.assertEqual(a['TaxRange'], 'Mammalia')
+        self.assertEqual(len(b._properties), 0)
+        a.add_child(b)
+        b.add_child(g)
+        self.assertEqual(a.duplications, [])
+
+        c = pickle.loads(pickle.dumps(a))
+        self.assertEqual(c['TaxRange'], 'Mammalia')
+        self.assertEqual(c.children[0].hog_id, 'b')
+        self.assertIs(c.children[0].parent, c)
+        self.assertIs(c.children[0]._properties, b._properties)
+        self.assertEqual(c.children[0].children[0].unique_id, '1')
+        self.assertFalse(hasattr(c.children[0].children[0], 'hog_id'))
+
+
+class FamilyTest(unittest.TestCase):
+
+    def test_family_follows_the_parent_links(self):
+        top, mid, other = HOG(id="top"), HOG(id="mid"), HOG(id="other")
+        genes = [Gene(id=str(i)) for i in range(4)]
+        top.add_child(mid)
+        mid.add_child(genes[0])
+        mid.add_child(genes[1])
+        other.add_child(genes[2])
+
+        # the handle is shared as the family is built, no walk up is needed.
+        family = top.get_family()
+        self.assertIs(genes[0]._family, family)
+        self.assertIs(genes[1].get_top_level_hog(), top)
+        self.assertIs(genes[2].get_top_level_hog(), other)
+        self.assertIs(genes[3].get_top_level_hog(), genes[3])
+
+        # a family attached below another one is merged into it.
+        epoch = family.epoch
+        mid.add_child(other)
+        self.assertIs(genes[2].get_top_level_hog(), top)
+        self.assertIs(genes[2].get_family(), family)
+        self.assertGreater(family.epoch, epoch)
+
+        # a family losing a subtree is split.
+        top.remove_child(mid)
+        self.assertFalse(family.valid)
+        self.assertIs(genes[2].get_top_level_hog(), mid)
+        self.assertIs(genes[0].get_top_level_hog(), mid)
+        self.assertIs(top.get_top_level_hog(), top)
+        self.assertIsNot(top.get_family(), mid.get_family())
+
+        # the handles are rebuilt for an unpickled family.
+        copy = pickle.loads(pickle.dumps(mid))
+        self.assertIs(copy.children[0].get_top_level_hog(), copy)
+
 
 class AbstractGeneTest(unittest.TestCase):
 
@@ -195,6 +295,151 @@ class AbstractGeneTest(unittest.TestCase):
         gal_2 = hog3.get_at_level(euarch)
         self.assertEqual(len(gal_2), 2)
 
+    def test_traversal_order_and_pruning(self):
+        hog3 = self.h.get_hog_by_id("3")
+
+        order = []
+        hog3.visit(order, function_extant_gene=lambda hog, gene, elem: elem.append(gene) or elem,
+                   function_prefix=lambda hog, elem: elem.append(hog) or elem)
+        self.assertEqual(list(hog3.traverse()), order)
+        self.assertEqual(list(hog3.iter_hogs()), [node for node in order if isinstance(node, HOG)])
+        self.assertEqual(list(hog3.iter_genes()), [node for node in order if isinstance(node, Gene)])
+        self.assertEqual(list(hog3.iter_levels()), [hog.genome for hog in hog3.iter_hogs()])
+        self.assertIs(next(hog3.iter_hogs()), hog3)
+
+        # pruned HOGs are yielded but not their children.
+        top_only = list(hog3.traverse(prune=lambda hog: hog is not hog3))
+        self.assertEqual(top_only, [hog3] + hog3.children)
+        self.assertEqual(list(hog3.iter_genes(prune=lambda hog: True)), [])
+
+        # postfix callbacks come after the visit of the child, with the elem of the parent.
+        events = []
+        hog3.visit(events, function_postfix=lambda hog, child, elem: elem.append((hog, child)) or elem)
+        self.assertEqual(events[-1], (hog3, hog3.children[-1]))
+        self.assertEqual(len(events), len(order) - len(hog3.get_all_descendant_genes()) - 1)
+
+    def test_deep_hierarchy(self):
+        top = HOG(id="deep")
+        current = top
+        for i in range(3 * sys.getrecursionlimit()):
+            child = HOG(id=current.hog_id + ".1")
+            current.add_child(child)
+            current = child
+        current.add_child(Gene(id="leaf"))
+
+        self.assertEqual([gene.unique_id for gene in top.get_all_descendant_genes()], ["leaf"])
+        self.assertEqual(len(top.get_all_descendant_hogs()), 3 * sys.getrecursionlimit() + 1)
+        self.assertEqual(top.visit([], function_prefix=lambda hog, elem: elem.append(hog) or elem)[-1], current)
+        self.assertIs(top.find_by_id(current.hog_id), current)
+        self.assertIsNone(top.find_by_id("other"))
+
+    def test_family_numbering(self):
+        def walk_up(node, genome):
+            paralog = node.arose_by_duplication
+            while node.parent is not None:
+                node = node.parent
+                if node.genome == genome:
+                    return node, paralog
+                if node.arose_by_duplication:
+                    paralog = True
+            return None, paralog
+
+        genes = list(self.h.get_list_extant_genes())
+        hogs = [hog for top in self.h.get_list_top_level_hogs() for hog in top.get_all_descendant_hogs()]
+        for node in genes + hogs:
+            for genome in self.h.get_list_ancestral_genomes():
+                self.assertEqual(node.search_ancestor_hog_in_ancestral_genome(genome), walk_up(node, genome))
+            for hog in hogs:
+                ancestors = []
+                current = node.parent
+                while current is not None:
+                    ancestors.append(current)
+                    current = current.parent
+                self.assertEqual(node.is_descendant_of(hog), hog in ancestors)
+
+    def test_family_numbering_follows_changes(self):
+        hog3 = self.h.get_hog_by_id("3")
+        gene2 = self.h.get_gene_by_id("2")
+        hog2 = gene2.get_top_level_hog()
+        self.assertFalse(gene2.is_descendant_of(hog3))
+        numbering2, numbering3 = hog2._get_numbering(), hog3._get_numbering()
+
+        # moving a gene marks the families it leaves and joins as modified.
+        gene2.parent.remove_child(gene2)
+        self.assertFalse(numbering2.valid)
+        self.assertTrue(numbering3.valid)
+        self.assertFalse(gene2.is_descendant_of(hog2))
+        hog3.add_child(gene2)
+        self.assertFalse(numbering3.valid)
+        self.assertTrue(gene2.is_descendant_of(hog3))
+        self.assertEqual(gene2.search_ancestor_hog_in_ancestral_genome(hog3.genome), (hog3, False))
+
+    def test_family_numbering_follows_duplications(self):
+        top, mid, gene = HOG(id="t"), HOG(id="t.1"), Gene(id="g")
+        top.set_genome(AncestralGenome())
+        mid.set_genome(AncestralGenome())
+        gene.set_genome(ExtantGenome("HUMAN", "1"))
+        top.add_child(mid)
+        mid.add_child(gene)
+        self.assertEqual(gene.search_ancestor_hog_in_ancestral_genome(top.genome), (top, False))
+
+        duplication = DuplicationNode(None)
+        duplication.add_child(mid)
+        self.assertEqual(gene.search_ancestor_hog_in_ancestral_genome(top.genome), (top, True))
+        self.assertEqual(gene.search_ancestor_hog_in_ancestral_genome(mid.genome), (mid, False))
+        duplication.remove_child(mid)
+        self.assertEqual(gene.search_ancestor_hog_in_ancestral_genome(top.genome), (top, False))
+
+    def test_members_by_level(self):
+        for top in self.h.get_list_top_level_hogs():
+            for hog in top.get_all_descendant_hogs():
+                expected = {}
+                for node in hog.traverse():
+                    expected.setdefault(node.genome, []).append(node)
+                self.assertEqual(hog.get_members_by_level(), expected)
+                self.assertEqual(hog.get_level_counts(), {genome: len(nodes) for genome, nodes in expected.items()})
+
+    def test_family_numbering_cache_is_bounded(self):
+        cache = abstractgene.family_numberings
+        maxsize = cache.maxsize
+        cache.clear()
+        try:
+            cache.maxsize = 2
+            tops = list(self.h.get_list_top_level_hogs())
+            numberings = [top._get_numbering() for top in tops]
+            self.assertEqual(cache.cache_info(), (0, 3, 2, 2))
+            # the least recently used family is released and numbered again when queried.
+            self.assertFalse(numberings[0].valid)
+            self.assertIsNone(numberings[0].nodes)
+            self.assertTrue(numberings[2].valid)
+            euarch = self.h.get_ancestral_genome_by_name("Euarchontoglires")
+            self.assertEqual(tops[0].get_at_level(euarch), [node for node in tops[0].traverse()
+                                                              if node.genome == euarch])
+            self.assertEqual(cache.cache_info(), (0, 4, 2, 2))
+            tops[0].get_level_counts()
+            self.assertEqual(cache.cache_info().hits, 1)
+        finally:
+            cache.maxsize = maxsize
+            cache.clear()
+
+    def test_ancestral_clustering_outlives_numbering_eviction(self):
+        cache = abstractgene.family_numberings
+        maxsize = cache.maxsize
+        cache.clear()
+        try:
+            # a single numbered family at a time: the genes of a family are still listed once for all the genomes.
+            cache.maxsize = 1
+            family_genes = {}
+            for genome in self.h.get_list_ancestral_genomes():
+                for hog, genes in genome.get_ancestral_clustering().items():
+                    self.assertEqual(list(genes), hog.get_all_descendant_genes())
+                    self.assertIs(family_genes.setdefault(hog.get_top_level_hog(), genes.genes), genes.genes)
+            self.assertGreater(len(family_genes), 1)
+            self.assertEqual(cache.cache_info().misses, len(family_genes))
+        finally:
+            cache.maxsize = maxsize
+            cache.clear()
+
     def test_get_number_losses(self):
         hog1 = self.h.get_hog_by_id("1")
         hog2 = self.h.get_hog_by_id("2")
@@ -2,9 +2,10 @@ import unittest
 import pytest
 from pyham import utils
 from pyham import ham
-from pyham.abstractgene import TaxonomicConflictError
+from pyham.abstractgene import TaxonomicConflictError, HOG
 from pathlib import Path
 import os
+import json
 
 @pytest.fixture(params=[
     ("tom.orthoxml", None),
@@ -23,6 +24,19 @@ def test_ancestral_genome(tomato_ham):
     assert len(anc_genome.genes) == 262, "Ancestral genome should have genes"
 
 
+def test_ancestral_clustering_shares_family_genes(tomato_ham):
+    family_genes = {}
+    for genome in tomato_ham.get_list_ancestral_genomes():
+        clustering = genome.get_ancestral_clustering()
+        assert len(clustering) == len(genome.genes)
+        for hog, genes in clustering.items():
+            assert list(genes) == hog.get_all_descendant_genes()
+            # a single list of genes per family, whatever the genome.
+            assert family_genes.setdefault(id(hog.get_top_level_hog()), genes.genes) is genes.genes
+    with pytest.raises(KeyError):
+        clustering[tomato_ham.get_list_extant_genes()[0]]
+
+
 def test_fetch_subhog_by_id(tomato_ham):
     query_hog_id = "HOG:0027790.3c.9ba.5i.8ai_69"
     subhog = tomato_ham.get_hog_by_id(query_hog_id)
@@ -158,15 +172,108 @@ def test_inverted_level_conflict():
     assert {label for label, species in conflict.sibling_members} == {"SP1_1", "SP2_1"}
 
 
+####
+# tests for Ham.validate, which only runs the taxonomic conflict checks
+def test_validate_reports_same_conflicts_as_build():
+    orthoxml_path = os.path.join(os.path.dirname(__file__), './data/hog_1074943.augmented.orthoxml')
+    tree_path = os.path.join(os.path.dirname(__file__), './data/hog_1074943.nwk')
+    with pytest.raises(TaxonomicConflictError) as exc:
+        _hog_1074943_with_external_tree()
+
+    report = ham.Ham.validate(tree_file=tree_path, hog_file=orthoxml_path, tree_format="newick",
+                              use_internal_name=True)
+    assert not report.is_valid
+    assert report.families == 1
+    assert report.n_conflicts == 2
+    assert report.conflicts == exc.value.conflicts
+
+
+def test_validate_writes_conflicts_to_jsonl_sink(tmp_path):
+    orthoxml_path = os.path.join(os.path.dirname(__file__), './data/inverted_level.orthoxml')
+    tree_path = os.path.join(os.path.dirname(__file__), './data/inverted_level.nwk')
+    sink = tmp_path / 'conflicts.jsonl'
+
+    report = ham.Ham.validate(tree_file=tree_path, hog_file=orthoxml_path, tree_format="newick",
+                              use_internal_name=True, sink=str(sink), parser_backend='lxml')
+    assert report.n_conflicts == 1
+    assert report.conflicts is None
+    records = [json.loads(line) for line in sink.read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]["kind"] == "inverted"
+    assert records[0]["hog_id"] == "HOG:0000001_sub"
+    assert records[0]["offending_members"] == [["HOG:0000001_family_inner", ["SP3"], None]]
+
+
+def test_validate_consistent_file():
+    orthoxml_path = os.path.join(os.path.dirname(__file__), './data/tom.orthoxml')
+    tree_path = os.path.join(os.path.dirname(__file__), './data/tomato.nwk')
+    for tree in (tree_path, None):
+        report = ham.Ham.validate(tree_file=tree, hog_file=orthoxml_path, tree_format="newick",
+                                  use_internal_name=True)
+        assert report.is_valid
+        assert report.conflicts == []
+        assert report.families == 1
+
+
+####
+# tests for the cache of ancestral level resolutions shared by the families of a file
+def _genome_content(ham_analysis):
+    return {node.name: sorted(hog.hog_id or repr(hog) for hog in node.props['genome'].genes)
+            for node in ham_analysis.taxonomy.tree.traverse()
+            if not node.is_leaf and node.props.get('genome') is not None}
+
+
+def test_level_cache_gives_same_content():
+    orthoxml_path = os.path.join(os.path.dirname(__file__), './data/tom.orthoxml')
+    tree_path = os.path.join(os.path.dirname(__file__), './data/tomato.nwk')
+    cached = ham.Ham(tree_file=tree_path, hog_file=orthoxml_path, tree_format="newick", use_internal_name=True)
+    uncached = ham.Ham(tree_file=tree_path, hog_file=orthoxml_path, tree_format="newick", use_internal_name=True,
+                       level_cache_size=0)
+
+    assert _genome_content(cached) == _genome_content(uncached)
+    info = cached.get_level_cache_info()
+    assert info.hits > 0
+    assert info.currsize <= info.maxsize
+    assert uncached.get_level_cache_info().hits == 0
+    assert uncached.get_level_cache_info().currsize == 0
+    assert info.hits + info.misses == uncached.get_level_cache_info().misses
+
+
+@pytest.mark.parametrize("level_cache_size", [0, 1, 1 << 14])
+def test_level_cache_keeps_conflicts(level_cache_size):
+    orthoxml_path = os.path.join(os.path.dirname(__file__), './data/inverted_level.orthoxml')
+    tree_path = os.path.join(os.path.dirname(__file__), './data/inverted_level.nwk')
+
+    with pytest.raises(TaxonomicConflictError) as exc:
+        ham.Ham(tree_file=tree_path, hog_file=orthoxml_path, tree_format="newick", use_internal_name=True,
+                level_cache_size=level_cache_size)
+    assert [c.kind for c in exc.value.conflicts] == ["inverted"]
+    assert exc.value.conflicts[0].hog_id == "HOG:0000001_sub"
+
+
+def test_level_resolution_cache_evicts_least_recently_used():
+    from pyham.parsers import LevelResolutionCache
+    cache = LevelResolutionCache(maxsize=2)
+    assert cache.get('a', lambda: 1) == 1
+    assert cache.get('b', lambda: 2) == 2
+    assert cache.get('a', lambda: None) == 1
+    assert cache.get('c', lambda: 3) == 3
+    assert cache.get('b', lambda: 4) == 4
+    assert cache.cache_info() == (1, 4, 2, 2)
+    cache.clear()
+    assert cache.cache_info() == (0, 0, 2, 0)
+
+
 ####
 # tests for HOG children that share a missing intermediate taxonomic level, i.e.
 # the reference species tree resolves part of the taxonomy more finely than the
 # orthoxml's own HOG structure (regression test for the shared_missing_level fixture)
-@pytest.fixture
-def shared_missing_level_ham():
+@pytest.fixture(params=[False, True], ids=["eager", "lazy"])
+def shared_missing_level_ham(request):
     orthoxml_path = os.path.join(os.path.dirname(__file__), './data/shared_missing_level.orthoxml')
     tree_path = os.path.join(os.path.dirname(__file__), './data/shared_missing_level.nwk')
-    return ham.Ham(tree_file=tree_path, hog_file=orthoxml_path, tree_format="newick", use_internal_name=True)
+    return ham.Ham(tree_file=tree_path, hog_file=orthoxml_path, tree_format="newick", use_internal_name=True,
+                   lazy_missing_levels=request.param)
 
 
 def test_shared_missing_level_creates_single_shared_hog(shared_missing_level_ham):
@@ -205,6 +312,87 @@ def test_shared_missing_level_follows_species_tree(shared_missing_level_ham):
             hog = hog.parent
 
 
+def test_shared_missing_level_with_concatenated_names():
+    # DeepB has the single child SP5, so both are named "SP5" when the internal names are not used.
+    orthoxml_path = os.path.join(os.path.dirname(__file__), './data/shared_missing_level.orthoxml')
+    tree_path = os.path.join(os.path.dirname(__file__), './data/shared_missing_level.nwk')
+    h = ham.Ham(tree_file=tree_path, hog_file=orthoxml_path, tree_format="newick")
+
+    sp5 = h.get_extant_genome_by_name("SP5")
+    assert sp5.taxon.is_leaf
+    deep_b_hog = sp5.genes[0].parent
+    assert deep_b_hog.genome.taxon is sp5.taxon.up
+    assert not deep_b_hog.genome.taxon.is_leaf
+    for gene in h.get_list_extant_genes():
+        hog = gene
+        while hog.parent:
+            assert hog.genome.taxon.parent == hog.parent.genome.taxon
+            hog = hog.parent
+
+
+####
+# tests for lazy_missing_levels: the missing levels are only recorded while parsing and the same HOGs are created
+# once they are accessed.
+def _ham_with_data(oxml, nwk=None, **kwargs):
+    data = os.path.join(os.path.dirname(__file__), 'data')
+    return ham.Ham(tree_file=os.path.join(data, nwk) if nwk else None, hog_file=os.path.join(data, oxml),
+                   tree_format="newick", use_internal_name=True, **kwargs)
+
+
+def _levels_content(h):
+    def label(g):
+        return str(g.hog_id if isinstance(g, ham.abstractgene.HOG) else g.unique_id)
+    return {taxon.name: sorted((label(g), label(g.parent) if g.parent else '', bool(g.arose_by_duplication))
+                               for g in taxon.props['genome'].genes)
+            for taxon in h.taxonomy.tree.traverse() if taxon.props.get('genome') is not None}
+
+
+@pytest.mark.parametrize("oxml, nwk", [
+    ("shared_missing_level.orthoxml", "shared_missing_level.nwk"),
+    ("tom.orthoxml", "tomato.nwk"),
+    ("birds.orthoxml", "birds.nwk"),
+    ("loft_taxid_gap.orthoxml", None),
+    ("nested_duplication_without_ids.orthoxml", None),
+])
+def test_lazy_missing_levels_same_hogs_as_eager(oxml, nwk):
+    lazy = _ham_with_data(oxml, nwk, lazy_missing_levels=True)
+    assert _levels_content(lazy) == _levels_content(_ham_with_data(oxml, nwk))
+
+
+def test_lazy_missing_levels_created_on_access():
+    h = _ham_with_data("shared_missing_level.orthoxml", "shared_missing_level.nwk", lazy_missing_levels=True)
+    family_hog = h.get_list_top_level_hogs()[0]
+    deep_a = h.get_ancestral_genome_by_name("DeepA")
+    clade = h.get_ancestral_genome_by_name("Clade")
+    assert deep_a._genes == [] and clade._genes == []
+    assert family_hog._implicit_levels is not None
+
+    # walking up from a gene creates the levels above it
+    gene = h.get_extant_genome_by_name("SP1").genes[0]
+    found, _ = gene.search_ancestor_hog_in_ancestral_genome(deep_a)
+    assert found is not None and found.genome is deep_a
+    assert len(deep_a._genes) == 1 and len(clade._genes) == 1
+
+    sp5 = h.get_extant_genome_by_name("SP5").genes[0]
+    assert sp5.get_at_level(h.get_ancestral_genome_by_name("DeepB"))[0].genome.name == "DeepB"
+
+
+def test_lazy_missing_levels_vertical_map():
+    def events(h):
+        vertical = h.compare_genomes_vertically(h.get_extant_genome_by_name("SP1"),
+                                                h.get_ancestral_genome_by_name("DeepA"))
+        return {name: len(getattr(vertical, 'get_' + name)()) for name in ('retained', 'lost', 'gained', 'duplicated')}
+
+    eager = _ham_with_data("shared_missing_level.orthoxml", "shared_missing_level.nwk")
+    lazy = _ham_with_data("shared_missing_level.orthoxml", "shared_missing_level.nwk", lazy_missing_levels=True)
+    assert events(lazy) == events(eager)
+
+
+def test_lazy_missing_levels_not_with_processes():
+    with pytest.raises(TypeError):
+        _ham_with_data("simpleEx.orthoxml", "simpleEx.nwk", lazy_missing_levels=True, processes=2)
+
+
 ####
 # tests for HOG id scheme auto-detection and missing-level id synthesis under LOFT_TAXID
 # (regression test for pyham/id_formats.py). `loft_taxid_gap.orthoxml` embeds its own
@@ -254,6 +442,35 @@ def test_loft_taxid_missing_levels_get_distinct_resolvable_ids():
         assert h.get_hog_by_id(hog_id).hog_id == hog_id
 
 
+def test_get_hogs_by_ids_matches_tree_search():
+    orthoxml_path = os.path.join(os.path.dirname(__file__), './data/loft_taxid_gap.orthoxml')
+    h = ham.Ham(hog_file=orthoxml_path, use_internal_name=True)
+    hogs = _all_hogs(h)
+
+    queries = [hog.hog_id for hog in hogs] + ["HOG:0000005.1a", "HOG:0000005.9z_100", "HOG:0000005_1", "unknown"]
+    found, misses = h.get_hogs_by_ids(queries)
+    assert misses == ["HOG:0000005.9z_100", "HOG:0000005_1", "unknown"]
+    for hog in hogs:
+        assert found[hog.hog_id] is hog
+
+    # the id index of a family answers like the search through its sub-HOGs.
+    for top in h.get_list_top_level_hogs():
+        child = next(child for child in top.children if isinstance(child, HOG))
+        for query in queries:
+            base, _, suffix = query.partition('_')
+            for taxid in (None, int(suffix) if suffix.isdigit() else None, 100):
+                expected = None
+                for hog in top.iter_hogs():
+                    if hog.hog_id.split('_')[0] == base and (taxid is None or hog.taxon_id == taxid
+                                                             or hog.hog_id == "{}_{}".format(base, taxid)):
+                        expected = hog
+                        break
+                assert top.find_by_id(base, taxid) is expected
+                if expected is None or expected is top or not expected.is_descendant_of(child):
+                    continue
+                assert child.find_by_id(base, taxid) is expected
+
+
 def test_get_hog_by_id_resolves_bare_fam_taxid_id():
     # regression test: get_hog_by_id used to only delegate to the taxid-aware
     # HOG.find_by_id when the queried id had a dot-chain (`subhog`); a bare
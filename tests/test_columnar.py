@@ -0,0 +1,82 @@
+import unittest
+import os
+import numpy as np
+from pyham import ham, utils, HOG
+
+
+class ColumnarForestTest(unittest.TestCase):
+
+    def setUp(self):
+        nwk_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.nwk')
+        nwk_str = utils.get_newick_string(nwk_path, type="nwk")
+        orthoxml_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.orthoxml')
+        self.h = ham.Ham(nwk_str, orthoxml_path, use_internal_name=True)
+        self.forest = self.h.to_columnar(keep_objects=True)
+
+    def test_rows_mirror_the_objects(self):
+        forest = self.forest
+        n_hogs = sum(len(hog.get_all_descendant_hogs()) for hog in self.h.get_list_top_level_hogs())
+        n_genes = sum(len(hog.get_all_descendant_genes()) for hog in self.h.get_list_top_level_hogs())
+        self.assertEqual(len(forest), n_hogs + n_genes)
+        self.assertEqual(int(forest.is_gene.sum()), n_genes)
+        self.assertEqual(len(forest.roots), len(self.h.top_level_hogs))
+
+        row_of = {id(obj): row for row, obj in enumerate(forest.objects)}
+        for row, obj in enumerate(forest.objects):
+            parent = forest.parent[row]
+            self.assertEqual(parent, row_of[id(obj.parent)] if obj.parent is not None else -1)
+            self.assertIs(forest.taxa[forest.taxon[row]], obj.genome.taxon)
+            self.assertEqual(forest.duplication[row] >= 0, bool(obj.arose_by_duplication))
+            node = forest.node(row)
+            self.assertIs(node.obj, obj)
+            self.assertEqual(node.id, str(obj.unique_id if node.is_gene else obj.hog_id))
+            self.assertIs(node.genome, obj.genome)
+            if isinstance(obj, HOG):
+                self.assertEqual([child.obj for child in node.children], obj.children)
+                self.assertEqual([gene.obj for gene in node.get_all_descendant_genes()],
+                                 obj.get_all_descendant_genes())
+
+    def test_pre_and_post_order(self):
+        forest = self.forest
+        for a in range(len(forest)):
+            for b in range(len(forest)):
+                in_subtree = a <= b < forest.end[a]
+                self.assertEqual(in_subtree, forest.pre[a] <= forest.pre[b] and forest.post[a] >= forest.post[b])
+        self.assertEqual(sorted(forest.post.tolist()), list(range(len(forest))))
+
+    def test_ancestors_at_level(self):
+        forest = self.forest
+        genes = np.flatnonzero(forest.is_gene)
+        for genome in self.h.get_list_ancestral_genomes():
+            ancestors = forest.get_ancestors_at_level(genes, genome)
+            for gene_row, ancestor in zip(genes, ancestors):
+                expected, _ = forest.objects[gene_row].search_ancestor_hog_in_ancestral_genome(genome)
+                self.assertIs(forest.objects[ancestor] if ancestor >= 0 else None, expected)
+            self.assertEqual(forest.get_level_counts()[forest.get_taxon_index(genome)], len(genome.genes))
+
+        gene = next(node for node in map(forest.node, forest.get_rows_by_id(1)) if node.is_gene)
+        self.assertIs(gene.get_ancestor_at_level("Primates").obj, self.h.get_gene_by_id("1").parent)
+        self.assertIsNone(gene.get_ancestor_at_level("Rodents"))
+
+    def test_rows_by_id(self):
+        forest = self.forest
+        rows = forest.get_rows_by_id(2)
+        self.assertEqual([forest.objects[row] for row in rows if not forest.is_gene[row]][0],
+                         self.h.get_hog_by_id(2))
+        self.assertEqual(len(forest.get_rows_by_id("unknown")), 0)
+        with self.assertRaises(KeyError):
+            forest.get_taxon_index("unknown")
+
+    def test_snapshot_of_streamed_families(self):
+        orthoxml_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.orthoxml')
+        nwk_str = utils.get_newick_string(os.path.join(os.path.dirname(__file__), './data/simpleEx.nwk'), type="nwk")
+        streamed = ham.Ham(nwk_str, orthoxml_path, use_internal_name=True, streaming=True)
+        forest = streamed.to_columnar(streamed.iter_families())
+        self.assertIsNone(forest.objects)
+        for column in ('parent', 'taxon', 'is_gene', 'ids', 'pre', 'post', 'end'):
+            np.testing.assert_array_equal(getattr(forest, column), getattr(self.forest, column))
+        self.assertEqual(forest.id_strings, self.forest.id_strings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import gzip
+import os
+import shutil
+import tempfile
+from pyham import utils
+from pyham import ham
+from pyham.family_index import FamilyIndex
+from helpers import ham_content
+
+
+class FamilyIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        nwk_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.nwk')
+        self.nwk_str = utils.get_newick_string(nwk_path, type="nwk")
+        self.tmp_dir = tempfile.mkdtemp()
+        self.orthoxml_path = os.path.join(self.tmp_dir, 'simpleEx.orthoxml')
+        shutil.copy(os.path.join(os.path.dirname(__file__), './data/simpleEx.orthoxml'), self.orthoxml_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _filter(self):
+        f = ham.ParserFilter()
+        f.add_hogs_via_hogId([2])
+        f.add_hogs_via_GeneExtId(['XENTR3'])
+        return f
+
+    def test_build(self):
+        index = FamilyIndex.build(self.orthoxml_path)
+        self.assertEqual([r.hog_id for r in index.families], ['1', '2', '3'])
+        self.assertEqual(index.get_family('3').gene_ids, ['53', '23', '33', '3', '13', '34', '14'])
+
+        with open(self.orthoxml_path, 'rb') as fh:
+            data = fh.read()
+        self.assertTrue(data[index.header_end:].lstrip().startswith(b'<orthologGroup id="1">'))
+        self.assertTrue(data[index.tail_offset:].startswith(b'</groups>'))
+        for record in index.families:
+            family = data[record.offset:record.offset + record.length].rstrip()
+            self.assertTrue(family.startswith(b'<orthologGroup'))
+            self.assertTrue(family.endswith(b'</orthologGroup>'))
+
+    def test_sidecar_file(self):
+        index = FamilyIndex.for_file(self.orthoxml_path)
+        sidecar = self.orthoxml_path + FamilyIndex.SUFFIX
+        self.assertTrue(os.path.exists(sidecar))
+
+        loaded = FamilyIndex.for_file(self.orthoxml_path)
+        self.assertEqual(loaded.families, index.families)
+        self.assertEqual((loaded.header_end, loaded.tail_offset), (index.header_end, index.tail_offset))
+
+        # an outdated index is rebuilt
+        with open(self.orthoxml_path, 'a') as fh:
+            fh.write('\n')
+        self.assertFalse(loaded.is_up_to_date())
+        rebuilt = FamilyIndex.for_file(self.orthoxml_path)
+        self.assertTrue(rebuilt.is_up_to_date())
+
+    def test_filter_with_index(self):
+        h = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, filter_object=self._filter())
+        f = self._filter()
+        hi = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, filter_object=f, family_index=True)
+        self.assertIsInstance(hi.family_index, FamilyIndex)
+        self.assertEqual(ham_content(h), ham_content(hi))
+        self.assertEqual(set(hi.top_level_hogs), {'2', '3'})
+        self.assertEqual(set(f.hogsId), set(h.filter_obj.hogsId))
+        self.assertEqual(set(f.geneUniqueId), set(h.filter_obj.geneUniqueId))
+
+    def test_streaming_with_index(self):
+        h = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, filter_object=self._filter())
+        hs = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, filter_object=self._filter(),
+                     family_index=True, streaming=True)
+        self.assertEqual([hog.hog_id for hog in hs.iter_families()], list(h.top_level_hogs))
+
+    def test_filter_with_index_gzip(self):
+        gz_path = self.orthoxml_path + '.gz'
+        with open(self.orthoxml_path, 'rb') as fin, gzip.open(gz_path, 'wb') as fout:
+            fout.write(fin.read())
+        h = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, filter_object=self._filter())
+        hi = ham.Ham(self.nwk_str, gz_path, use_internal_name=True, filter_object=self._filter(),
+                     family_index=FamilyIndex.build(gz_path))
+        self.assertEqual(ham_content(h), ham_content(hi))
+
+    def test_given_index_is_checked(self):
+        index = FamilyIndex.build(self.orthoxml_path)
+
+        # the index of another file is rejected
+        other_path = os.path.join(self.tmp_dir, 'other.orthoxml')
+        shutil.copy(self.orthoxml_path, other_path)
+        with self.assertRaises(ValueError):
+            ham.Ham(self.nwk_str, other_path, use_internal_name=True, filter_object=self._filter(),
+                    family_index=index)
+
+        # an outdated index is rebuilt
+        with open(self.orthoxml_path, 'rb') as fh:
+            data = fh.read()
+        with open(self.orthoxml_path, 'wb') as fh:
+            fh.write(data.replace(b'<groups>', b'<groups>\n\n\n', 1))
+        h = ham.Ham(self.nwk_str, other_path, use_internal_name=True, filter_object=self._filter())
+        hi = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, filter_object=self._filter(),
+                     family_index=index)
+        self.assertIsNot(hi.family_index, index)
+        self.assertTrue(hi.family_index.is_up_to_date())
+        self.assertEqual(ham_content(h), ham_content(hi))
+
+    def test_index_with_orthoxml_string(self):
+        with open(self.orthoxml_path) as fh:
+            data = fh.read()
+        with self.assertRaises(TypeError):
+            ham.Ham(self.nwk_str, data, use_internal_name=True, orthoXML_as_string=True, family_index=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
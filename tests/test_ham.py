@@ -1,8 +1,13 @@
 import unittest
 from pyham import utils
 from pyham import ham
+from pyham import abstractgene
+from pyham import parsers
 from ete4.parser.newick import NewickError
 import os
+import gc
+import weakref
+from helpers import ham_content
 
 
 # This helps to convert elements of list/dictionary to string in order to make easier assertEqual test.
@@ -52,6 +57,18 @@ class HAMTestSetUp(unittest.TestCase):
             ham.Ham(use_data_from = 'oma')
     '''
 
+    def test_compact_internal_names(self):
+
+        with self.assertRaises(TypeError):
+            ham.Ham(self.nwk_str, self.orthoxml_path, internal_name_scheme='short')
+
+        h = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=False, internal_name_scheme='compact')
+        rodents = h.get_taxon_by_name("MOUSE/RATNO")
+        self.assertTrue(rodents.name.startswith('clade_'))
+        self.assertEqual(h.taxonomy.get_full_label(rodents), "MOUSE/RATNO")
+        self.assertIs(h.get_ancestral_genome_by_name("MOUSE/RATNO").taxon, rodents)
+        self.assertEqual(len(h.get_list_top_level_hogs()), 3)
+
     def test_wrong_newick_str(self):
 
         with self.assertRaises(KeyError):
@@ -89,6 +106,43 @@ class HAMTestSetUp(unittest.TestCase):
         with self.assertRaises(IOError):
             self.ham_analysis = ham.Ham(tree_file=self.nwk_str, hog_file=self.orthoxml_string, type_hog_file='orthoxml')
 
+    def test_garbage_collector_during_build(self):
+        self.assertTrue(gc.isenabled())
+        gc.disable()
+        try:
+            ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True)
+            self.assertFalse(gc.isenabled())
+        finally:
+            gc.enable()
+
+        frozen = gc.get_freeze_count()
+        try:
+            ham_analysis = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, gc_freeze=True)
+            self.assertTrue(gc.isenabled())
+            self.assertGreater(gc.get_freeze_count(), frozen)
+        finally:
+            gc.unfreeze()
+
+        # the duplications don't keep the parser alive.
+        duplications = [dup for genome in ham_analysis.get_list_ancestral_genomes() for hog in genome.genes
+                        for dup in hog.duplications]
+        self.assertGreater(len(duplications), 0)
+        for duplication in duplications:
+            self.assertFalse(any(isinstance(obj, parsers.OrthoXMLParser) for obj in gc.get_referents(duplication)))
+
+    def test_discarded_ham_is_freed(self):
+        ham_analysis = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True)
+        tops = ham_analysis.get_list_top_level_hogs()
+        for top in tops:
+            for gene in top.get_all_descendant_genes():
+                self.assertTrue(gene.is_descendant_of(top))
+        self.assertGreater(abstractgene.family_numberings.cache_info().currsize, 0)
+
+        refs = [weakref.ref(top) for top in tops]
+        del ham_analysis, tops, top, gene
+        gc.collect()
+        self.assertTrue(all(ref() is None for ref in refs))
+
 
 class HAMTest(unittest.TestCase):
 
@@ -239,6 +293,36 @@ class HAMTestQuery(unittest.TestCase):
                 gene = self.hf.get_gene_by_id(gene_id)
                 self.hf.get_hog_by_gene(gene)
 
+    def test_get_families_for_genes(self):
+        gene_ids = list(self.h.extant_gene_map)
+        families = self.h.get_families_for_genes(gene_ids + ["unknown"])
+        for gene_id, family in zip(gene_ids, families):
+            gene = self.h.get_gene_by_id(gene_id)
+            self.assertEqual(family, None if gene.is_singleton() else self.h.get_hog_by_gene(gene).hog_id)
+        self.assertIsNone(families[-1])
+        self.assertEqual(list(self.h.get_families_for_genes([3, "3"])), ["3", "3"])
+
+        # the arrays follow the changes of the HOGs, only the modified families are taken again.
+        snapshots = dict(self.h._family_genes)
+        gene3 = self.h.get_gene_by_id("3")
+        self.assertTrue(gene3.is_descendant_of(self.h.get_hog_by_id("3")))
+        self.assertIs(gene3.get_top_level_hog(), self.h.get_hog_by_id("3"))
+        gene3.parent.remove_child(gene3)
+        self.h.get_hog_by_id("1").add_child(gene3)
+        self.assertEqual(list(self.h.get_families_for_genes(["3"])), ["1"])
+        self.assertIs(gene3.get_top_level_hog(), self.h.get_hog_by_id("1"))
+        self.assertIs(self.h._family_genes["2"], snapshots["2"])
+        self.assertIsNot(self.h._family_genes["1"], snapshots["1"])
+        self.assertIsNot(self.h._family_genes["3"], snapshots["3"])
+
+        # the changes of the HOGs of another analysis don't outdate the arrays.
+        arrays = self.h._gene_families
+        other_gene3 = self.hpx.get_gene_by_id("3")
+        other_gene3.parent.remove_child(other_gene3)
+        self.hpx.get_hog_by_id("1").add_child(other_gene3)
+        self.h.get_families_for_genes(["3"])
+        self.assertIs(self.h._gene_families, arrays)
+
     def test_get_list_top_level_hogs(self):
         hogs = self.h.get_list_top_level_hogs()
         self.assertSetEqual(_str_array(hogs), {"<HOG(id=2;level=Mammalia)>", "<HOG(id=1;level=Vertebrata)>", "<HOG(id=3;level=Vertebrata)>"})
@@ -451,6 +535,34 @@ class HAMTestQuery(unittest.TestCase):
         mouse = self.hpx.get_taxon_by_name("MOUSE")
         self.assertEqual(mouse.name, "MOUSE")
 
+    def test_taxonomy_node_lookup(self):
+
+        # the NCBITaxId of the extant genomes are indexed once attached to their leaf
+        human = self.h.taxonomy.get_node_by_taxid(9601)
+        self.assertIs(human, self.h.get_taxon_by_name("HUMAN"))
+        self.assertEqual(list(self.h.taxonomy.nodes_by_attr(taxid=10090, name="MOUSE")),
+                         [self.h.get_taxon_by_name("MOUSE")])
+        self.assertEqual(list(self.h.taxonomy.nodes_by_attr(taxid=10090, name="HUMAN")), [])
+
+        with self.assertRaises(KeyError):
+            self.h.taxonomy.get_node_by_taxid(123456789)
+
+        with self.assertRaises(KeyError):
+            self.h.taxonomy.get_node_by_name("abc")
+
+        # not indexed attributes are searched each time, as the node properties can change
+        mammals = self.h.get_taxon_by_name("Mammalia")
+        depth = mammals.props["depth"]
+        self.assertIn(mammals, list(self.h.taxonomy.nodes_by_attr(depth=depth)))
+        self.assertNotIn(('depth', depth), self.h.taxonomy._node_lookup)
+        mammals.add_prop('clade', ['vertebrates'])
+        self.assertEqual(list(self.h.taxonomy.nodes_by_attr(clade=['vertebrates'])), [mammals])
+        mammals.add_prop('clade', ['mammals'])
+        self.assertEqual(list(self.h.taxonomy.nodes_by_attr(clade=['vertebrates'])), [])
+
+        # an unhashable value of an indexed attribute matches no node
+        self.assertEqual(list(self.h.taxonomy.nodes_by_attr(name=['Mammalia'])), [])
+
     # AncestralGenome
 
     def test_get_ancestral_genome_by_taxon(self):
@@ -563,5 +675,112 @@ class HAMTestPrivate(unittest.TestCase):
         f.add_hogs_via_hogId([2])
         self.hf = ham.Ham(nwk_str, orthoxml_path, filter_object=f)
 
+
+class HAMTestSinglePass(unittest.TestCase):
+
+    def setUp(self):
+        nwk_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.nwk')
+        self.nwk_str = utils.get_newick_string(nwk_path, type="nwk")
+        self.orthoxml_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.orthoxml')
+
+    def _filter(self):
+        f = ham.ParserFilter()
+        f.add_hogs_via_hogId([2])
+        f.add_hogs_via_GeneExtId(['XENTR3'])
+        return f
+
+    def test_same_content_as_three_pass(self):
+        h = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True)
+        hs = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, single_pass=True)
+        self.assertEqual(ham_content(h), ham_content(hs))
+
+    def test_same_content_as_three_pass_with_filter(self):
+        h = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, filter_object=self._filter())
+        fs = self._filter()
+        hs = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, filter_object=fs, single_pass=True)
+        self.assertEqual(ham_content(h), ham_content(hs))
+        self.assertEqual(set(hs.top_level_hogs), {'2', '3'})
+        self.assertEqual(fs.hogsId, h.filter_obj.hogsId)
+        self.assertEqual(fs.geneUniqueId, h.filter_obj.geneUniqueId)
+
+    def test_id_schema_detected_in_single_pass(self):
+        orthoxml_path = os.path.join(os.path.dirname(__file__), './data/loft_taxid_gap.orthoxml')
+        h = ham.Ham(hog_file=orthoxml_path, use_internal_name=True)
+        hs = ham.Ham(hog_file=orthoxml_path, use_internal_name=True, single_pass=True)
+        self.assertEqual(hs.id_schema, "LOFT_TAXID")
+        self.assertEqual(ham_content(h), ham_content(hs))
+
+
+
+def _family_content(hog):
+    def label(gene):
+        return getattr(gene, 'hog_id', None) or gene.unique_id
+    return [(label(h), h.genome.name, [label(c) for c in h.children], bool(h.arose_by_duplication))
+            for h in hog.get_all_descendant_hogs()]
+
+
+class HAMTestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        nwk_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.nwk')
+        self.nwk_str = utils.get_newick_string(nwk_path, type="nwk")
+        self.orthoxml_path = os.path.join(os.path.dirname(__file__), './data/simpleEx_complexParalogs.orthoxml')
+
+    def test_same_families_as_non_streaming(self):
+        h = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True)
+        expected = [_family_content(hog) for hog in h.iter_families()]
+        self.assertEqual(len(expected), len(h.top_level_hogs))
+
+        hs = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, streaming=True)
+        self.assertEqual(hs.top_level_hogs, {})
+        self.assertEqual(set(hs.extant_gene_map), set(h.extant_gene_map))
+        self.assertEqual([_family_content(hog) for hog in hs.iter_families()], expected)
+
+        # can be iterated again
+        self.assertEqual([_family_content(hog) for hog in hs.iter_families()], expected)
+
+    def test_families_are_released(self):
+        hs = ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, streaming=True)
+        for hog in hs.iter_families():
+            self.assertIn(hog, hog.genome.genes)
+            genes = hog.get_all_descendant_genes()
+        self.assertTrue(all(gene.parent is None for gene in genes))
+        for genome in hs.get_list_ancestral_genomes():
+            self.assertEqual(genome.genes, [])
+
+    def test_families_are_released_on_break(self):
+        orthoxml_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.orthoxml')
+        hs = ham.Ham(self.nwk_str, orthoxml_path, use_internal_name=True, streaming=True)
+        for hog in hs.iter_families():
+            self.assertGreater(sum(len(g.genes) for g in hs.get_list_ancestral_genomes()), 0)
+            break
+        self.assertEqual(sum(len(g.genes) for g in hs.get_list_ancestral_genomes()), 0)
+        self.assertTrue(all(gene.parent is None for gene in hs.extant_gene_map.values()))
+
+    def test_single_pass_not_allowed(self):
+        with self.assertRaises(TypeError):
+            ham.Ham(self.nwk_str, self.orthoxml_path, use_internal_name=True, streaming=True, single_pass=True)
+
+    def test_streaming_with_filter(self):
+        def _filter():
+            f = ham.ParserFilter()
+            f.add_hogs_via_hogId([2])
+            f.add_hogs_via_GeneExtId(['XENTR3'])
+            return f
+
+        orthoxml_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.orthoxml')
+        h = ham.Ham(self.nwk_str, orthoxml_path, use_internal_name=True, filter_object=_filter())
+        hs = ham.Ham(self.nwk_str, orthoxml_path, use_internal_name=True, filter_object=_filter(), streaming=True)
+        self.assertEqual([_family_content(hog) for hog in hs.iter_families()],
+                         [_family_content(hog) for hog in h.iter_families()])
+
+    def test_conflicts_raised_after_iteration(self):
+        tree_path = os.path.join(os.path.dirname(__file__), './data/inverted_level.nwk')
+        orthoxml_path = os.path.join(os.path.dirname(__file__), './data/inverted_level.orthoxml')
+        hs = ham.Ham(tree_path, orthoxml_path, tree_format="newick", use_internal_name=True, streaming=True)
+        with self.assertRaises(abstractgene.TaxonomicConflictError):
+            list(hs.iter_families())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,11 +1,16 @@
 import collections
+import shutil
+import tempfile
 import unittest
+from xml.etree.ElementTree import ParseError
 from pyham import ham
+from pyham import parsers
 from pyham import abstractgene
 from pyham import utils
 import os
 import numpy as np
 from unittest import skip
+from helpers import ham_content
 
 
 class OrthoXMLParserTest(unittest.TestCase):
@@ -51,6 +56,19 @@ class OrthoXMLParserTest(unittest.TestCase):
             observed_cnts[g.genome.name] += 1
         self.assertDictEqual(observed_cnts, expected_cnts)
 
+    def test_without_ham_object(self):
+        data = os.path.join(os.path.dirname(__file__), 'data')
+        taxonomy = ham.tax.Taxonomy.from_newick(os.path.join(data, 'simpleEx.nwk'), use_internal_name=True)
+        level_cache = ham.parsers.LevelResolutionCache()
+        factory = ham.parsers.OrthoXMLParser(None, taxonomy=taxonomy, level_cache=level_cache)
+        parser = ham.parsers.create_xml_parser(factory, 'etree')
+        with open(os.path.join(data, 'simpleEx.orthoxml'), 'rb') as fh:
+            parser.feed(fh.read())
+        self.assertIs(factory.level_cache, level_cache)
+        self.assertGreater(level_cache.cache_info().misses, 0)
+        self.assertEqual(set(factory.toplevel_hogs), set(self.hogs))
+        self.assertEqual(set(factory.extant_gene_map), set(self.genes))
+
     def test_number_hog_per_ancestral_genome(self):
         ags = self.ham_analysis.get_list_ancestral_genomes()
         expected_numbers = {'Vertebrata': 2, 'Mammalia': 3, 'Euarchontoglires': 4, 'Rodents': 4, 'Primates': 4}
@@ -166,6 +184,117 @@ class OrthoXMLParserTest(unittest.TestCase):
                 self._check_children_consistency(primates, ["14"])
 
 
+class FilterOrthoXMLParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.orthoxml_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.orthoxml')
+
+    def _parse(self, filter_obj):
+        from xml.etree.ElementTree import XMLParser
+        factory = ham.parsers.FilterOrthoXMLParser(filter_obj)
+        parser = XMLParser(target=factory)
+        with open(self.orthoxml_path) as fh:
+            for line in fh:
+                parser.feed(line)
+        return factory
+
+    def test_filter_by_hog_id(self):
+        f = ham.ParserFilter()
+        f.add_hogs_via_hogId([2])
+        factory = self._parse(f)
+        self.assertEqual(factory.hogsId, ['2'])
+        self.assertEqual(factory.geneUniqueId, {'2', '12', '22', '32'})
+        self.assertTrue(factory.done)
+
+    def test_filter_by_gene_ids(self):
+        f = ham.ParserFilter()
+        f.add_hogs_via_GeneExtId(['XENTR3'])
+        f.add_hogs_via_GeneIntId(['5'])
+        factory = self._parse(f)
+        self.assertEqual(factory.hogsId, ['3'])
+        self.assertIn('53', factory.geneUniqueId)
+        # gene 5 is in no family, so the parser never knows it is done
+        self.assertIn('5', factory.geneUniqueId)
+        self.assertFalse(factory.done)
+
+    def test_stop_once_all_queries_found(self):
+        f = ham.ParserFilter()
+        f.add_hogs_via_hogId([1])
+        f.add_hogs_via_GeneIntId(['2'])
+        factory = ham.parsers.FilterOrthoXMLParser(f)
+        from xml.etree.ElementTree import XMLParser
+        parser = XMLParser(target=factory)
+        with open(self.orthoxml_path) as fh:
+            for line in fh:
+                parser.feed(line)
+                if factory.done:
+                    break
+            self.assertNotEqual(fh.read(), '')
+        self.assertEqual(factory.hogsId, ['1', '2'])
+
+
+class LxmlBackendTest(unittest.TestCase):
+
+    def _compare(self, tree_file, orthoxml, **kwargs):
+        data = os.path.join(os.path.dirname(__file__), 'data')
+        kwargs.update(tree_file=os.path.join(data, tree_file) if tree_file else None,
+                      hog_file=os.path.join(data, orthoxml), use_internal_name=True)
+        if tree_file:
+            kwargs.setdefault('tree_format', 'newick')
+        etree_ham = ham.Ham(**kwargs)
+        lxml_ham = ham.Ham(parser_backend='lxml', **kwargs)
+        self.assertEqual(ham_content(lxml_ham), ham_content(etree_ham))
+        return lxml_ham
+
+    def test_same_hogs(self):
+        self._compare('simpleEx.nwk', 'simpleEx.orthoxml')
+        self._compare('simpleEx.nwk', 'simpleEx_complexParalogs.orthoxml')
+        self._compare('birds.nwk', 'birds.orthoxml')
+        self._compare('tomato.nwk', 'tom.orthoxml')
+
+    def test_taxonomy_from_orthoxml(self):
+        self._compare(None, 'nested_duplication_without_ids.orthoxml')
+
+    def test_with_filter(self):
+        f = ham.ParserFilter()
+        f.add_hogs_via_GeneExtId(['XENTR3'])
+        h = self._compare('simpleEx.nwk', 'simpleEx.orthoxml', filter_object=f)
+        self.assertEqual(list(h.top_level_hogs), ['3'])
+
+    def test_malformed_file(self):
+        data = os.path.join(os.path.dirname(__file__), 'data')
+        with open(os.path.join(data, 'simpleEx.orthoxml'), 'rb') as fh:
+            content = fh.read()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        f = ham.ParserFilter()
+        f.add_hogs_via_GeneExtId(['XENTR3'])
+
+        for name, malformed in (('bad', content + b'<<<bad'),
+                                ('truncated', content[:content.rfind(b'</orthologGroup>')])):
+            path = os.path.join(tmp_dir, name + '.orthoxml')
+            with open(path, 'wb') as fh:
+                fh.write(malformed)
+            for backend in parsers.PARSER_BACKENDS:
+                for kwargs in ({}, {'single_pass': True}, {'filter_object': f}, {'family_index': True},
+                               {'streaming': True, 'id_schema': 'GENERIC'}):
+                    with self.subTest(name=name, backend=backend, **{k: str(v) for k, v in kwargs.items()}):
+                        with self.assertRaises(ParseError):
+                            h = ham.Ham(os.path.join(data, 'simpleEx.nwk'), path, tree_format='newick',
+                                        use_internal_name=True, parser_backend=backend, **kwargs)
+                            list(h.iter_families())
+                with self.subTest(name=name, backend=backend, validate=True):
+                    with self.assertRaises(ParseError):
+                        ham.Ham.validate(os.path.join(data, 'simpleEx.nwk'), path, tree_format='newick',
+                                         use_internal_name=True, parser_backend=backend)
+
+    def test_invalid_backend(self):
+        with self.assertRaises(TypeError):
+            ham.Ham(tree_file=os.path.join(os.path.dirname(__file__), 'data', 'simpleEx.nwk'),
+                    hog_file=os.path.join(os.path.dirname(__file__), 'data', 'simpleEx.orthoxml'),
+                    tree_format='newick', parser_backend='sax')
+
+
 class OrthoXMLParserTest_complexParalogs(unittest.TestCase):
     def _get_identifier(self, item):
         if isinstance(item, ham.abstractgene.Gene):
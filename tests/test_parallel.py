@@ -0,0 +1,69 @@
+import os
+import pytest
+from pyham import ham
+from pyham.abstractgene import TaxonomicConflictError
+from pyham.parallel import split_families
+from pyham.family_index import FamilyIndex
+from helpers import ham_content
+
+
+def _data(name):
+    return os.path.join(os.path.dirname(__file__), 'data', name)
+
+
+@pytest.mark.parametrize("oxml, nwk", [
+    ("simpleEx.orthoxml", "simpleEx.nwk"),
+    ("simpleEx_complexParalogs.orthoxml", "simpleEx.nwk"),
+    ("birds.orthoxml", "birds.nwk"),
+    ("tom.orthoxml", "tomato.nwk"),
+])
+def test_parallel_same_content_as_sequential(oxml, nwk):
+    kwargs = dict(tree_file=_data(nwk), hog_file=_data(oxml), tree_format='newick', use_internal_name=True)
+    sequential = ham.Ham(**kwargs)
+    in_parallel = ham.Ham(processes=3, **kwargs)
+    assert ham_content(in_parallel) == ham_content(sequential)
+
+
+def test_parallel_with_filter():
+    def _filter():
+        f = ham.ParserFilter()
+        f.add_hogs_via_hogId([2])
+        f.add_hogs_via_GeneExtId(['XENTR3'])
+        return f
+
+    kwargs = dict(tree_file=_data("simpleEx.nwk"), hog_file=_data("simpleEx.orthoxml"), tree_format='newick',
+                  use_internal_name=True)
+    sequential = ham.Ham(filter_object=_filter(), **kwargs)
+    in_parallel = ham.Ham(filter_object=_filter(), processes=2, **kwargs)
+    assert set(in_parallel.top_level_hogs) == {'2', '3'}
+    assert ham_content(in_parallel) == ham_content(sequential)
+
+
+def test_parallel_conflicts_collected():
+    kwargs = dict(tree_file=_data('inverted_level.nwk'), hog_file=_data('inverted_level.orthoxml'),
+                  tree_format="newick", use_internal_name=True)
+    with pytest.raises(TaxonomicConflictError) as sequential:
+        ham.Ham(**kwargs)
+    with pytest.raises(TaxonomicConflictError) as in_parallel:
+        ham.Ham(processes=2, **kwargs)
+    assert in_parallel.value.conflicts == sequential.value.conflicts
+
+    with pytest.raises(TaxonomicConflictError) as fail_fast:
+        ham.Ham(processes=2, fail_fast=True, **kwargs)
+    assert len(fail_fast.value.conflicts) == 1
+    assert fail_fast.value.conflicts[0].hog_id == "HOG:0000001_sub"
+
+
+def test_parallel_requires_orthoxml_file():
+    with open(_data("simpleEx.orthoxml")) as fh:
+        data = fh.read()
+    with pytest.raises(TypeError):
+        ham.Ham(tree_file=_data("simpleEx.nwk"), hog_file=data, tree_format='newick', orthoXML_as_string=True,
+                processes=2)
+
+
+def test_split_families_keeps_order():
+    index = FamilyIndex.build(_data("simpleEx_complexParalogs.orthoxml"))
+    chunks = split_families(index.families, 3)
+    assert 1 < len(chunks) <= 4
+    assert [record for chunk in chunks for record in chunk] == index.families
@@ -0,0 +1,128 @@
+import unittest
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+from xml.etree.ElementTree import ParseError
+from pyham import ham
+from pyham import readers
+from pyham import utils
+
+
+class ReadersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.orthoxml_path = os.path.join(self.tmp_dir, 'simpleEx.orthoxml')
+        shutil.copy(os.path.join(os.path.dirname(__file__), './data/simpleEx.orthoxml'), self.orthoxml_path)
+        with open(self.orthoxml_path, 'rb') as fh:
+            self.data = fh.read()
+        self.gz_path = self.orthoxml_path + '.gz'
+        with gzip.open(self.gz_path, 'wb') as fh:
+            fh.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _read(self, source, **kwargs):
+        with readers.open_hog_file(source, block_size=100, **kwargs) as reader:
+            return [readers.as_searchable(block) for block in reader]
+
+    def test_readers_yield_the_whole_document(self):
+        self.assertIsInstance(readers.open_hog_file(self.orthoxml_path), readers.MmapReader)
+        self.assertIsInstance(readers.open_hog_file(self.gz_path), readers.GzipReader)
+
+        for source, kwargs in ((self.orthoxml_path, {}), (self.gz_path, {}), (self.data, {'in_memory': True}),
+                               (bytearray(self.data), {'in_memory': True}),
+                               (memoryview(self.data), {'in_memory': True})):
+            blocks = self._read(source, **kwargs)
+            self.assertTrue(all(len(block) <= 100 for block in blocks))
+            self.assertEqual(b''.join(blocks), self.data)
+
+        text = self.data.decode('utf-8')
+        self.assertEqual(''.join(self._read(text, in_memory=True)), text)
+
+    def test_empty_file(self):
+        empty = os.path.join(self.tmp_dir, 'empty.orthoxml')
+        open(empty, 'w').close()
+        self.assertEqual(self._read(empty), [])
+
+    def test_gzip_reader_stops_when_closed(self):
+        with readers.open_hog_file(self.gz_path, block_size=10) as reader:
+            next(iter(reader))
+        self.assertFalse(any(t.name == 'pyham-gzip-reader' for t in threading.enumerate()))
+
+    def test_gzip_reader_raises_errors(self):
+        with self.assertRaises(OSError):
+            self._read(self.orthoxml_path + '.missing.gz')
+
+    def test_groups_marker_across_blocks(self):
+        for size in (1, 2, 3, 7, 100):
+            blocks = [self.data[i:i + size] for i in range(0, len(self.data), size)]
+            header = b''.join(ham.Ham._iter_header(blocks))
+            self.assertEqual(header, self.data[:self.data.find(b'<groups')] + b'</orthoXML>')
+            groups = b''.join(ham.Ham._iter_groups_section(blocks))
+            self.assertEqual(groups, b'<orthoXML xmlns="http://orthoXML.org/2011/">' +
+                             self.data[self.data.find(b'<groups'):])
+
+            # memory views on the blocks are searched in place, they are only valid until the next block.
+            with readers.open_hog_file(self.data, in_memory=True, block_size=size) as reader:
+                header = b''.join([bytes(part) for part in ham.Ham._iter_header(reader)])
+            self.assertEqual(header, self.data[:self.data.find(b'<groups')] + b'</orthoXML>')
+            with readers.open_hog_file(self.orthoxml_path, block_size=size) as reader:
+                groups = b''.join([bytes(part) for part in ham.Ham._iter_groups_section(reader)])
+            self.assertEqual(groups, b'<orthoXML xmlns="http://orthoXML.org/2011/">' +
+                             self.data[self.data.find(b'<groups'):])
+
+            text = self.data.decode('utf-8')
+            parts = ham.Ham._iter_header([text[i:i + size] for i in range(0, len(text), size)])
+            self.assertEqual(''.join(parts), text[:text.find('<groups')] + '</orthoXML>')
+
+    def test_find(self):
+        for block in (self.data, bytearray(self.data), memoryview(self.data)):
+            self.assertEqual(readers.find(block, b'<groups'), self.data.find(b'<groups'))
+            self.assertEqual(readers.find(block, b'<missing'), -1)
+        self.assertEqual(readers.find(self.data.decode('utf-8'), '<groups'), self.data.find(b'<groups'))
+
+    def test_streaming_a_malformed_mapped_file(self):
+        nwk_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.nwk')
+        nwk_str = utils.get_newick_string(nwk_path, type="nwk")
+        with open(self.orthoxml_path, 'ab') as fh:
+            fh.write(b'<<<bad')
+        hs = ham.Ham(nwk_str, self.orthoxml_path, use_internal_name=True, streaming=True, id_schema='GENERIC')
+        # the error of the parser is not hidden by the memory view it was fed, still alive when the file is closed.
+        with self.assertRaises(ParseError):
+            list(hs.iter_families())
+
+    def test_streaming_stopped_early_on_a_mapped_file(self):
+        nwk_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.nwk')
+        nwk_str = utils.get_newick_string(nwk_path, type="nwk")
+        hs = ham.Ham(nwk_str, self.orthoxml_path, use_internal_name=True, streaming=True)
+        families = hs.iter_families()
+        next(families)
+        families.close()
+        self.assertEqual(sum(len(genome.genes) for genome in hs.get_list_ancestral_genomes()), 0)
+
+    def test_ham_from_bytes_gzip_and_file(self):
+        nwk_path = os.path.join(os.path.dirname(__file__), './data/simpleEx.nwk')
+        nwk_str = utils.get_newick_string(nwk_path, type="nwk")
+
+        def content(hog_file, **kwargs):
+            ham_analysis = ham.Ham(nwk_str, hog_file, use_internal_name=False, **kwargs)
+            return {hog_id: str(hog.get_all_descendant_genes()) for hog_id, hog in ham_analysis.top_level_hogs.items()}
+
+        expected = content(self.orthoxml_path)
+        self.assertEqual(content(self.gz_path), expected)
+        self.assertEqual(content(self.data), expected)
+        self.assertEqual(content(memoryview(self.data)), expected)
+        self.assertEqual(content(self.data.decode('utf-8'), orthoXML_as_string=True), expected)
+        self.assertEqual(content(self.data, single_pass=True), expected)
+
+        f = ham.ParserFilter()
+        f.add_hogs_via_hogId([2])
+        self.assertEqual(content(self.data, filter_object=f), {'2': expected['2']})
+
+
+if __name__ == "__main__":
+    unittest.main()
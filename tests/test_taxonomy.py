@@ -1,5 +1,6 @@
 import unittest
 from pyham import taxonomy, EvolutionaryConceptError
+import numpy as np
 import os
 
 
@@ -111,4 +112,109 @@ class HAMTaxonomy(unittest.TestCase):
         observed_name = {node.name for node in t6.tree.traverse() if node.is_leaf}
         self.assertSetEqual(self.set_species_name, observed_name)
 
+    def test_mrca_index(self):
+        tomato = os.path.join(os.path.dirname(__file__), './data/tomato.nwk')
+        t = taxonomy.Taxonomy.from_newick(tomato, use_internal_name=True)
+        nodes = list(t.tree.traverse())
+        for a in nodes:
+            for b in nodes:
+                self.assertIs(t.get_mrca_taxnode(a, b), t.tree.common_ancestor([a, b]))
+        self.assertIs(t.get_mrca_taxnode(nodes[5]), nodes[5])
+        self.assertIs(t.get_mrca_taxnode(*nodes[10:20]), t.tree.common_ancestor(nodes[10:20]))
+        with self.assertRaises(ValueError):
+            t.get_mrca_taxnode()
+
+        rng = np.random.default_rng(1)
+        first, second = rng.integers(len(nodes), size=(2, 500))
+        expected = [t.get_node_index(t.get_mrca_taxnode(t.get_node_by_index(a), t.get_node_by_index(b)))
+                    for a, b in zip(first, second)]
+        self.assertListEqual(t.mrca_many(first, second).tolist(), expected)
+        self.assertListEqual(t.mrca_many(np.stack([first, second], axis=1)).tolist(), expected)
+        self.assertListEqual(t.mrca_many([3, 7], 3).tolist(),
+                             [3, t.get_node_index(t.get_mrca_taxnode(t.get_node_by_index(3), t.get_node_by_index(7)))])
+        with self.assertRaises(IndexError):
+            t.mrca_many([0], [len(nodes)])
+
+    def test_ancestry_index(self):
+        tomato = os.path.join(os.path.dirname(__file__), './data/tomato.nwk')
+        t = taxonomy.Taxonomy.from_newick(tomato, use_internal_name=True)
+        for node in t.tree.traverse():
+            ancestors = list(node.ancestors())
+            for other in t.tree.traverse():
+                self.assertEqual(t.is_child_recursive(node, other), other in ancestors)
+                if other in ancestors:
+                    self.assertEqual(t.get_path_up(node, other), tuple(ancestors[:ancestors.index(other)]))
+                else:
+                    with self.assertRaises(ValueError):
+                        t.get_path_up(node, other)
+
+
+
+    def test_taxonomy_core(self):
+        tomato = os.path.join(os.path.dirname(__file__), './data/tomato.nwk')
+        t = taxonomy.Taxonomy.from_newick(tomato, use_internal_name=True)
+        core = t.core
+        nodes = list(t.tree.traverse('preorder'))
+        self.assertListEqual(core.names, [node.name for node in nodes])
+        for i, node in enumerate(nodes):
+            self.assertListEqual([nodes[c] for c in core.get_children(i)], node.get_children())
+            self.assertEqual(core.depth[i], node.props['depth'])
+            self.assertListEqual([nodes[d] for d in core.get_subtree(i)], list(node.traverse('preorder')))
+
+        # the nodes of a parent array in any order are renumbered in pre-order
+        rng = np.random.default_rng(2)
+        shuffled = rng.permutation(len(core))
+        rank = np.argsort(shuffled)
+        parent = [rank[core.parent[i]] if core.parent[i] >= 0 else -1 for i in shuffled]
+        core2 = taxonomy.TaxonomyCore(parent, [core.names[i] for i in shuffled], np.arange(len(core))[shuffled])
+        self.assertSetEqual(set(core2.names), set(core.names))
+        t2 = taxonomy.Taxonomy.from_core(core2)
+        self.assertListEqual([node.name for node in t2.tree.traverse('preorder')], core2.names)
+        for node in t2.tree.traverse():
+            self.assertEqual(node.props['id'], core.names.index(node.name))
+            self.assertIs(t2.get_node_by_taxid(node.props['id']), node)
+        for a, b in rng.integers(len(core), size=(200, 2)):
+            mrca = t.get_mrca_taxnode(nodes[a], nodes[b])
+            self.assertEqual(t2.get_mrca_taxnode(t2.get_node_by_name(nodes[a].name),
+                                                 t2.get_node_by_name(nodes[b].name)).name, mrca.name)
+
+        with self.assertRaises(ValueError):
+            taxonomy.TaxonomyCore([-1, 0, -1], ['a', 'b', 'c'])
+        with self.assertRaises(ValueError):
+            taxonomy.TaxonomyCore([-1, 2, 1], ['a', 'b', 'c'])
+
+        node = taxonomy.build_taxon_node("9606", name="Homo sapiens")
+        self.assertEqual((node.name, node.props['id']), ("Homo sapiens", 9606))
+
+    def test_compact_internal_names(self):
+        concat = taxonomy.Taxonomy.from_newick(self.newick_file, use_internal_name=False)
+        compact = taxonomy.Taxonomy.from_newick(self.newick_file, use_internal_name=False,
+                                                internal_name_scheme='compact')
+        self.assertEqual(compact.internal_name_scheme, 'compact')
+        self.assertEqual(concat.internal_name_scheme, 'concat')
+
+        # names are stable across builds
+        again = taxonomy.Taxonomy.from_newick(self.newick_file, use_internal_name=False,
+                                              internal_name_scheme='compact')
+        self.assertListEqual(compact.core.names, again.core.names)
+
+        for node, compact_node in zip(concat.tree.traverse('preorder'), compact.tree.traverse('preorder')):
+            self.assertEqual(concat.get_full_label(node), node.name)
+            self.assertEqual(compact.get_full_label(compact_node), node.name)
+            if node.is_leaf:
+                self.assertEqual(compact_node.name, node.name)
+            else:
+                self.assertRegex(compact_node.name, r'^clade_[0-9a-f]{16}$')
+                # the concatenated name still finds the node
+                self.assertIs(compact.get_node_by_name(node.name), compact_node)
+                self.assertListEqual(list(compact.nodes_by_attr(name=node.name)), [compact_node])
+                self.assertIs(compact.get_node_by_name(compact_node.name), compact_node)
 
+        with self.assertRaises(KeyError):
+            compact.get_node_by_name("PANTR/HUMAN")
+        with self.assertRaises(KeyError):
+            compact.get_node_by_name("HUMAN/PANTR/MOUSE")
+        with self.assertRaises(KeyError):
+            concat.get_node_by_name("HUMAN/PANTR/MOUSE")
+        with self.assertRaises(ValueError):
+            taxonomy.Taxonomy.from_newick(self.newick_file, internal_name_scheme='short')